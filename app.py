@@ -1,32 +1,216 @@
 import os
+import json
+import time
 import uuid
+import hashlib
+import shutil
 from pathlib import Path
-from typing import Optional, Literal
+from typing import Optional, Literal, AsyncIterator, Tuple, Any, Dict, List
 
-from fastapi import FastAPI, UploadFile, File, Body, HTTPException, Request
-from fastapi.responses import FileResponse
-import httpx
+from fastapi import FastAPI, UploadFile, File, Body, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, StreamingResponse, Response, JSONResponse
+import anyio
 
-from rq import Worker
-from rq.job import Job
-from redis_queue import get_queue, get_redis
-from utils import storage_dir, safe_job_id, valid_int_env
+from rq import Worker, Queue, Retry
+from redis_queue import (
+    get_queue, get_redis, get_async_redis, scheduled_queue_name, duration_class, job_statuses, status_key,
+    set_status, STATUS_META_FIELDS,
+    transcribe_queues, segment_stream_key, LIVE_SESSIONS_KEY, live_audio_key,
+)
+from utils import storage_dir, safe_job_id, valid_int_env, probe_duration
 import worker
+import result_cache
+import webhooks
+import segments
+import metrics
+import storage
+import lifecycle
+import estimates
 
 app = FastAPI(title="Transcribe to SRT API")
+metrics.REGISTRY.register(metrics.QueueCollector())
 
-from pydantic import BaseModel
+# Ingest tuning: uploads are streamed to disk chunk by chunk so API memory stays flat
+INGEST_CHUNK_SIZE = valid_int_env("INGEST_CHUNK_SIZE", 1024 * 1024)
+# 0 = no limit
+MAX_INPUT_BYTES = valid_int_env("MAX_INPUT_BYTES", 0)
+# room for the form fields and part headers of a multipart upload
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+# stream source_type=upload files to MinIO (storage.MINIO_INPUT_BUCKET) instead
+# of the shared /data volume, so workers don't need that volume
+INGEST_TO_MINIO = os.getenv("INGEST_TO_MINIO", "false").lower() == "true"
+# media duration is probed with ffprobe at submit (duration classes, timeouts,
+# ETAs). Local uploads are always probed; url / s3 sources only with
+# PROBE_REMOTE=true, since a remote probe holds the request for up to
+# PROBE_TIMEOUT seconds
+PROBE_REMOTE = os.getenv("PROBE_REMOTE", "false").lower() == "true"
+PROBE_TIMEOUT = valid_int_env("PROBE_TIMEOUT", 15)
+# how long one blocking read of the segment stream waits before a keep-alive
+STREAM_BLOCK_MS = valid_int_env("STREAM_BLOCK_MS", 15000)
+# live sessions: how long to wait for a live worker to claim the session
+LIVE_START_TIMEOUT = valid_int_env("LIVE_START_TIMEOUT", 30)
+# audio chunks kept per session if the live worker falls behind
+LIVE_MAX_BACKLOG = valid_int_env("LIVE_MAX_BACKLOG", 3000)
+
+from pydantic import BaseModel, Field
 
 class TranscribeRequest(BaseModel):
-    source_type: Literal["url", "upload"]
+    source_type: Literal["url", "upload", "s3"]
     url: Optional[str] = None
+    # source_type=s3: object in MinIO (bucket defaults to MINIO_INPUT_BUCKET)
+    bucket: Optional[str] = None
+    key: Optional[str] = None
     language: Optional[str] = None
     task: Literal["transcribe", "translate"] = "transcribe"
-    output: Literal["srt", "vtt", "txt"] = "srt"
+    output: Literal["srt", "vtt", "txt", "json"] = "srt"
+    model: Optional[str] = None
+    priority: Literal["high", "default", "bulk"] = "default"
+    # fair-share key; falls back to the X-Tenant-ID header
+    tenant: Optional[str] = None
     diarize: bool = False
+    engine: Optional[Literal["sequential", "batched"]] = None
+    batch_size: Optional[int] = Field(None, ge=1, le=64)
     callback_url: Optional[str] = None
     db_id: Optional[str] = None
 
+class LiveRequest(BaseModel):
+    """First (text) message of a /v1/live session."""
+    format: Literal["pcm", "opus"] = "pcm"
+    # pcm = s16le; anything other than 16k mono is resampled by the live worker
+    sample_rate: int = Field(16000, ge=8000, le=48000)
+    channels: int = Field(1, ge=1, le=2)
+    language: Optional[str] = None
+    task: Literal["transcribe", "translate"] = "transcribe"
+    output: Literal["srt", "vtt", "txt", "json"] = "srt"
+
+def _too_large() -> HTTPException:
+    return HTTPException(413, f"ukuran file melebihi batas {MAX_INPUT_BYTES} bytes")
+
+@app.middleware("http")
+async def reject_oversized_upload(request: Request, call_next):
+    """Refuse a single upload by its declared Content-Length.
+
+    FastAPI reads (and spools) the whole multipart form before create_job
+    runs, so this is the only place to stop it early; _write_chunks still
+    enforces the limit on what actually arrives (e.g. chunked bodies).
+    """
+    if MAX_INPUT_BYTES and request.method == "POST" and request.url.path == "/v1/transcribe":
+        try:
+            declared = int(request.headers.get("Content-Length") or 0)
+        except ValueError:
+            declared = 0
+        if declared > MAX_INPUT_BYTES + MULTIPART_OVERHEAD_BYTES:
+            return JSONResponse(status_code=413, content={"detail": _too_large().detail})
+    return await call_next(request)
+
+async def _write_chunks(chunks: AsyncIterator[bytes], dest: Path) -> Tuple[int, float, str]:
+    """Write an async stream of chunks to dest, enforcing MAX_INPUT_BYTES.
+
+    Returns (bytes_written, bytes_per_second, sha256_hex); the digest feeds
+    the worker's result cache.
+    """
+    written = 0
+    digest = hashlib.sha256()
+    started = time.monotonic()
+    async with await anyio.open_file(dest, "wb") as f:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            written += len(chunk)
+            if MAX_INPUT_BYTES and written > MAX_INPUT_BYTES:
+                raise _too_large()
+            digest.update(chunk)
+            await f.write(chunk)
+    elapsed = max(time.monotonic() - started, 1e-6)
+    return written, written / elapsed, digest.hexdigest()
+
+async def _ingest_upload_to_minio(file: UploadFile, object_name: str) -> Tuple[int, float, str]:
+    """Stream an upload into MinIO (no copy on the shared volume)."""
+    started = time.monotonic()
+    try:
+        size, digest = await anyio.to_thread.run_sync(
+            storage.put_stream, file.file, storage.MINIO_INPUT_BUCKET, object_name, MAX_INPUT_BYTES
+        )
+    except storage.InputTooLarge:
+        raise _too_large()
+    except Exception as e:
+        print(f"[!] MinIO ingest failed ({object_name}): {e}")
+        raise HTTPException(502, "gagal menyimpan file ke object storage")
+    finally:
+        await file.close()
+    return size, size / max(time.monotonic() - started, 1e-6), digest
+
+async def _ingest_upload(file: UploadFile, dest: Path) -> Tuple[int, float, str]:
+    async def chunks():
+        while True:
+            chunk = await file.read(INGEST_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    try:
+        return await _write_chunks(chunks(), dest)
+    finally:
+        await file.close()
+
+def _tenant(params: TranscribeRequest, request: Request) -> Optional[str]:
+    return safe_job_id(params.tenant or request.headers.get("X-Tenant-ID", ""))[:64] or None
+
+def _queue_name(params: TranscribeRequest, tenant: Optional[str], duration: Optional[float] = None) -> str:
+    return scheduled_queue_name(
+        worker.model_queue_name(params.model), params.priority, tenant, duration_class(duration)
+    )
+
+def _payload(params: TranscribeRequest, job_id: str, input_path: Path, digest: Optional[str]) -> Dict[str, Any]:
+    return {
+        "job_id": job_id,
+        "input_path": str(input_path),
+        "url": params.url if params.source_type == "url" else None,
+        "s3_bucket": (params.bucket or storage.MINIO_INPUT_BUCKET) if params.source_type == "s3" else None,
+        "s3_key": params.key if params.source_type == "s3" else None,
+        "input_sha256": digest,
+        "language": params.language,
+        "task": params.task,
+        "output": params.output,
+        "diarize": params.diarize,
+        "model": params.model,
+        "engine": params.engine,
+        "batch_size": params.batch_size,
+        "callback_url": params.callback_url,
+        "db_id": params.db_id,
+    }
+
+def _job_meta(params: TranscribeRequest, tenant: Optional[str]) -> Dict[str, Any]:
+    return {
+        "db_id": params.db_id,
+        "output": params.output,
+        "priority": params.priority,
+        "tenant": tenant,
+        "model": params.model or worker.MODEL_SIZE,
+    }
+
+def _probe(params: TranscribeRequest, input_path: Path, ingested: Optional[str]) -> Optional[float]:
+    """Duration of the job's media, None if it can't be determined."""
+    if params.source_type == "upload" and not ingested:
+        return probe_duration(str(input_path), PROBE_TIMEOUT)
+    if not PROBE_REMOTE:
+        return None
+    if params.source_type == "url":
+        return probe_duration(params.url, PROBE_TIMEOUT)
+    try:
+        # ffprobe only reads the header (and seeks) through a presigned URL
+        if ingested:
+            source = storage.presigned_url(storage.MINIO_INPUT_BUCKET, ingested)
+        else:
+            source = storage.presigned_url(params.bucket or storage.MINIO_INPUT_BUCKET, params.key)
+    except Exception as e:
+        print(f"[!] Presigning for probe failed: {e}")
+        return None
+    return probe_duration(source, PROBE_TIMEOUT)
+
+def _retry() -> Optional[Retry]:
+    # a retried job resumes from its last checkpoint (see worker.CHECKPOINT_SECONDS)
+    return Retry(max=worker.JOB_RETRIES) if worker.JOB_RETRIES else None
+
 @app.post("/v1/transcribe")
 async def create_job(
     request: Request,
@@ -48,60 +232,95 @@ async def create_job(
             params = TranscribeRequest(
                 source_type=form.get("source_type"),
                 url=form.get("url"),
+                bucket=form.get("bucket") or None,
+                key=form.get("key") or None,
                 language=form.get("language"),
                 task=form.get("task", "transcribe"),
                 output=form.get("output", "srt"),
+                model=form.get("model") or None,
+                priority=form.get("priority") or "default",
+                tenant=form.get("tenant") or None,
                 diarize=form.get("diarize", "false").lower() == "true",
+                engine=form.get("engine") or None,
+                batch_size=form.get("batch_size") or None,
                 callback_url=form.get("callback_url"),
                 db_id=form.get("db_id")
             )
         except Exception as e:
             raise HTTPException(422, detail=f"Invalid Form Data: {str(e)}")
 
+    if params.model and params.model not in worker.ALLOWED_MODELS:
+        raise HTTPException(400, f"model tidak didukung, pilihan: {', '.join(worker.ALLOWED_MODELS)}")
+
+    tenant = _tenant(params, request)
+
     job_uuid = safe_job_id(str(uuid.uuid4()))
+    # the job directory is created by whoever first writes to it (the worker
+    # for url / s3 sources); on worker nodes it is local scratch space
     base = storage_dir() / "jobs" / job_uuid
-    base.mkdir(parents=True, exist_ok=True)
-
     input_path = base / "input.bin"
 
+    size, rate, digest = None, None, None
+    ingested = None
     if params.source_type == "url":
         if not params.url:
             raise HTTPException(400, "url wajib diisi untuk source_type=url")
-        # download file
-        async with httpx.AsyncClient(follow_redirects=True, timeout=600) as client:
-            r = await client.get(params.url)
-            r.raise_for_status()
-            input_path.write_bytes(r.content)
+        # download is done by the worker (see worker._fetch)
+
+    elif params.source_type == "s3":
+        if not params.key:
+            raise HTTPException(400, "key wajib diisi untuk source_type=s3")
+        if not storage.configured():
+            raise HTTPException(400, "object storage (MINIO_*) belum dikonfigurasi")
+        try:
+            size = await anyio.to_thread.run_sync(
+                storage.object_size, params.bucket or storage.MINIO_INPUT_BUCKET, params.key
+            )
+        except Exception:
+            raise HTTPException(400, "object tidak ditemukan di bucket")
+        if MAX_INPUT_BYTES and size > MAX_INPUT_BYTES:
+            raise _too_large()
+        # fetched by the worker with ranged GETs
 
     elif params.source_type == "upload":
         if file is None:
             raise HTTPException(400, "file wajib diupload untuk source_type=upload")
-        content = await file.read()
-        input_path.write_bytes(content)
+        if INGEST_TO_MINIO and storage.configured():
+            ingested = f"{storage.MINIO_INPUT_PREFIX}{job_uuid}"
+            size, rate, digest = await _ingest_upload_to_minio(file, ingested)
+        else:
+            base.mkdir(parents=True, exist_ok=True)
+            try:
+                size, rate, digest = await _ingest_upload(file, input_path)
+            except HTTPException:
+                shutil.rmtree(base, ignore_errors=True)
+                raise
+        print(f"[*] Ingested {size} bytes for {job_uuid} ({rate / 1024 / 1024:.2f} MB/s)")
     else:
         raise HTTPException(400, "source_type tidak valid")
 
-    payload = {
-        "job_id": job_uuid,
-        "input_path": str(input_path),
-        "language": params.language,
-        "task": params.task,
-        "output": params.output,
-        "diarize": params.diarize,
-        "callback_url": params.callback_url,
-        "db_id": params.db_id,
-    }
-
-    q = get_queue()
+    duration = await anyio.to_thread.run_sync(_probe, params, input_path, ingested)
+    payload = _payload(params, job_uuid, input_path, digest)
+    if ingested:
+        payload.update(s3_bucket=storage.MINIO_INPUT_BUCKET, s3_key=ingested, s3_delete=True)
+    q = get_queue(_queue_name(params, tenant, duration))
     rq_job = q.enqueue(
         worker.process_job,
         payload,
         job_id=job_uuid,
-        job_timeout=valid_int_env("JOB_TIMEOUT", 14400),
-        result_ttl=valid_int_env("JOB_TTL_SECONDS", 86400)
+        job_timeout=estimates.job_timeout(duration, params.model or worker.MODEL_SIZE),
+        result_ttl=valid_int_env("JOB_TTL_SECONDS", 86400),
+        retry=_retry(),
     )
-    rq_job.meta["db_id"] = params.db_id
+    rq_job.meta.update(_job_meta(params, tenant))
+    if duration is not None:
+        rq_job.meta["duration"] = round(duration, 3)
+    if size is not None:
+        rq_job.meta["input_bytes"] = size
+    if rate is not None:
+        rq_job.meta["ingest_bytes_per_sec"] = round(rate, 1)
     rq_job.save_meta()
+    lifecycle.track(job_uuid)
     print(f"[+] Job enqueued: {job_uuid}")
     return {
         "job_id": rq_job.id,
@@ -109,95 +328,367 @@ async def create_job(
         "result_url": f"/v1/jobs/{rq_job.id}/result"
     }
 
-@app.get("/v1/jobs/{job_id}")
-async def job_status(job_id: str):
-    job_id = safe_job_id(job_id)
-    redis = get_redis()
-    
-    job = None
-    for i in range(3):
-        try:
-            job = Job.fetch(job_id, connection=redis)
-            if job:
-                job.refresh() # Ensure we have the latest meta
-                break
-        except:
-            import asyncio
-            if i < 2: await asyncio.sleep(0.5)
-    
-    if not job:
-        raise HTTPException(404, "job tidak ditemukan")
+# jobs accepted by one POST /v1/transcribe/batch
+TRANSCRIBE_BATCH_MAX = valid_int_env("TRANSCRIBE_BATCH_MAX", 1000)
+
+class TranscribeBatchRequest(BaseModel):
+    # TranscribeRequest fields shared by every job; each job can override them
+    defaults: Dict[str, Any] = {}
+    jobs: List[Dict[str, Any]]
 
-    status = job.get_status()
-    pos = None
-    if status == "queued":
+@app.post("/v1/transcribe/batch")
+async def create_jobs_batch(body: TranscribeBatchRequest, request: Request):
+    """Submit many url / s3 jobs in one request.
+
+    Every job is validated before anything is enqueued (one bad job rejects
+    the batch), then all of them go to Redis in a single pipeline.
+    """
+    if not body.jobs:
+        raise HTTPException(400, "jobs tidak boleh kosong")
+    if len(body.jobs) > TRANSCRIBE_BATCH_MAX:
+        raise HTTPException(400, f"maksimal {TRANSCRIBE_BATCH_MAX} job per batch")
+
+    parsed, errors = [], []
+    for i, item in enumerate(body.jobs):
         try:
-            q = get_queue()
-            pos = q.get_job_position(job_id) # Returns 0-indexed position
-        except: pass
+            params = TranscribeRequest(**{"source_type": "url", **body.defaults, **item})
+        except Exception as e:
+            errors.append({"index": i, "error": str(e)})
+            continue
+        if params.source_type == "upload":
+            errors.append({"index": i, "error": "batch hanya mendukung source_type=url dan s3"})
+        elif params.source_type == "url" and not params.url:
+            errors.append({"index": i, "error": "url wajib diisi untuk source_type=url"})
+        elif params.source_type == "s3" and not params.key:
+            errors.append({"index": i, "error": "key wajib diisi untuk source_type=s3"})
+        elif params.model and params.model not in worker.ALLOWED_MODELS:
+            errors.append({"index": i, "error": f"model tidak didukung, pilihan: {', '.join(worker.ALLOWED_MODELS)}"})
+        else:
+            parsed.append((i, params))
+    s3 = [(i, params) for i, params in parsed if params.source_type == "s3"]
+    if s3 and not storage.configured():
+        errors += [{"index": i, "error": "object storage (MINIO_*) belum dikonfigurasi"} for i, _ in s3]
+    elif s3:
+        # same checks as a single s3 submit, one HEAD per key in parallel
+        sizes = await anyio.to_thread.run_sync(
+            storage.object_sizes, [(params.bucket or storage.MINIO_INPUT_BUCKET, params.key) for _, params in s3]
+        )
+        for (i, _), size in zip(s3, sizes):
+            if size is None:
+                errors.append({"index": i, "error": "object tidak ditemukan di bucket"})
+            elif MAX_INPUT_BYTES and size > MAX_INPUT_BYTES:
+                errors.append({"index": i, "error": _too_large().detail})
+    if errors:
+        errors.sort(key=lambda e: e["index"])
+        raise HTTPException(422, detail={"message": "validasi batch gagal", "errors": errors})
 
-    meta = job.meta or {}
-    
-    def fmt_time(dt):
-        return dt.isoformat() if dt else None
+    jobs_dir = storage_dir() / "jobs"
+    job_timeout = valid_int_env("JOB_TIMEOUT", 14400)
+    result_ttl = valid_int_env("JOB_TTL_SECONDS", 86400)
+    by_queue: Dict[str, List[Any]] = {}
+    metas = {}
+    for _, params in parsed:
+        # the job directory is created by the worker when it downloads the input
+        job_id = safe_job_id(str(uuid.uuid4()))
+        tenant = _tenant(params, request)
+        metas[job_id] = _job_meta(params, tenant)
+        by_queue.setdefault(_queue_name(params, tenant), []).append(Queue.prepare_data(
+            worker.process_job,
+            (_payload(params, job_id, jobs_dir / job_id / "input.bin", None),),
+            job_id=job_id,
+            timeout=job_timeout,
+            result_ttl=result_ttl,
+            meta=metas[job_id],
+            retry=_retry(),
+        ))
 
+    pipe = get_redis().pipeline()
+    for name, datas in by_queue.items():
+        get_queue(name).enqueue_many(datas, pipeline=pipe)
+    for job_id, meta in metas.items():
+        set_status(job_id, pipeline=pipe, **{k: meta[k] for k in STATUS_META_FIELDS if k in meta})
+        lifecycle.track(job_id, pipeline=pipe)
+    pipe.execute()
+
+    print(f"[+] Batch enqueued: {len(metas)} jobs in {len(by_queue)} queue(s)")
     return {
-        "job_id": job.id,
+        "count": len(metas),
+        "jobs": [
+            {"job_id": job_id, "status_url": f"/v1/jobs/{job_id}", "result_url": f"/v1/jobs/{job_id}/result"}
+            for job_id in metas
+        ],
+    }
+
+# bulk status requests larger than this are rejected
+STATUS_BATCH_MAX = valid_int_env("STATUS_BATCH_MAX", 1000)
+
+class StatusBatchRequest(BaseModel):
+    job_ids: List[str]
+
+def _job_view(st: Dict[str, Any], snap: Dict[str, Any]) -> Dict[str, Any]:
+    """Public status of a job from its status hash (see redis_queue.job_statuses)
+    and an estimates.snapshot()."""
+    status = st.get("status") or "queued"
+    pos = st.get("queue_position")
+    estimated_start, estimated_finish = estimates.estimate(st, snap)
+    return {
+        "job_id": st["job_id"],
         "status": status,
+        # 0-indexed, accounts for priorities and tenant round-robin
         "queue_position": pos if pos is not None else (0 if status == "started" else None),
-        "progress": meta.get("progress", 0),
-        "message": meta.get("message"),
-        "created_at": fmt_time(job.created_at),
-        "enqueued_at": fmt_time(job.enqueued_at),
-        "started_at": fmt_time(job.started_at),
-        "ended_at": fmt_time(job.ended_at),
-        "minio_url": meta.get("minio_url"),
-        "db_id": meta.get("db_id"),
-        "error": str(job.exc_info)[:500] if job.is_failed else None,
+        "progress": int(st.get("progress") or 0),
+        "message": st.get("message") or None,
+        "created_at": st.get("created_at") or None,
+        "enqueued_at": st.get("enqueued_at") or None,
+        "started_at": st.get("started_at") or None,
+        "ended_at": st.get("ended_at") or None,
+        # media duration in seconds when it could be probed at submit
+        "duration": float(st["duration"]) if st.get("duration") else None,
+        "estimated_start": estimated_start,
+        "estimated_finish": estimated_finish,
+        "minio_url": st.get("minio_url") or None,
+        "db_id": st.get("db_id") or None,
+        # only set for diarize=true: whether speaker labels were applied
+        "diarized": {"True": True, "False": False}.get(st.get("diarized")),
+        "warning": st.get("warning") or None,
+        "error": st.get("error") or None,
     }
 
-@app.get("/v1/jobs/{job_id}/result")
-async def job_result(job_id: str):
+@app.get("/v1/jobs/{job_id}")
+async def job_status(job_id: str):
+    st = job_statuses([safe_job_id(job_id)])[0]
+    if st is None:
+        raise HTTPException(404, "job tidak ditemukan")
+    return _job_view(st, estimates.snapshot())
+
+@app.post("/v1/jobs/status")
+async def job_status_batch(body: StatusBatchRequest):
+    """Status of many jobs in one call; unknown ids come back as status "not_found"."""
+    if len(body.job_ids) > STATUS_BATCH_MAX:
+        raise HTTPException(400, f"maksimal {STATUS_BATCH_MAX} job_id per request")
+    job_ids = [safe_job_id(j) for j in body.job_ids]
+    snap = estimates.snapshot()
+    return {
+        "jobs": [
+            _job_view(st, snap) if st else {"job_id": job_id, "status": "not_found"}
+            for job_id, st in zip(job_ids, job_statuses(job_ids))
+        ]
+    }
+
+def _sse(event: str, data: Dict[str, Any], event_id: Optional[str] = None) -> str:
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/v1/jobs/{job_id}/stream")
+async def job_stream(job_id: str, request: Request):
+    """Server-Sent Events: replays the segments decoded so far, then tails new ones.
+
+    Events are `segment` ({start, end, text[, chunk]}) and a final `end`
+    ({status, ...}). Reconnecting clients resume via the Last-Event-ID header.
+    """
     job_id = safe_job_id(job_id)
-    redis = get_redis()
+    # every Redis call here is async: a blocking one would stall all SSE / WebSocket clients
+    client = get_async_redis()
+    if not await client.exists(status_key(job_id)):
+        await client.aclose()
+        raise HTTPException(404, "job tidak ditemukan")
 
-    # Retry to find job in case of slight delay
-    job = None
-    for i in range(3):
+    key = segment_stream_key(job_id)
+    store = storage_dir() / "jobs" / job_id / segments.STORE_NAME
+    cursor = request.headers.get("Last-Event-ID") or "0-0"
+
+    async def events():
+        nonlocal cursor
         try:
-            job = Job.fetch(job_id, connection=redis)
-            if job:
-                job.refresh()
-                break
-        except:
-            if i < 2:
-                import asyncio
-                await asyncio.sleep(0.5)
-                continue
-    
-    if not job:
-         raise HTTPException(404, "job tidak ditemukan")
+            if cursor == "0-0" and not await client.exists(key) and store.exists():
+                # stream already expired: replay the finished transcript
+                for seg in await anyio.to_thread.run_sync(segments.read_store, store):
+                    yield _sse("segment", {"start": seg.start, "end": seg.end, "text": seg.text.strip()})
+                yield _sse("end", {"status": "finished"})
+                return
+
+            while not await request.is_disconnected():
+                resp = await client.xread({key: cursor}, block=STREAM_BLOCK_MS, count=500)
+                if not resp:
+                    # nothing new: make sure the job didn't end without an end event
+                    fields = await client.hmget(status_key(job_id), "status", "error")
+                    status, error = (v.decode() if v else None for v in fields)
+                    if status in ("failed", "stopped", "canceled"):
+                        yield _sse("end", {"status": "failed", "error": error})
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                for entry_id, fields in resp[0][1]:
+                    cursor = entry_id.decode()
+                    event = fields.pop(b"event").decode()
+                    data = {k.decode(): json.loads(v) for k, v in fields.items()}
+                    yield _sse(event, data, cursor)
+                    if event == "end":
+                        return
+        finally:
+            await client.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _render_from_store(base: Path, fmt: str) -> Optional[Path]:
+    """Render output.<fmt> from the segment store once; later calls reuse the file."""
+    store = base / segments.STORE_NAME
+    if not store.exists():
+        return None
+    out = base / f"output.{fmt}"
+    tmp = base / f"output.{fmt}.{uuid.uuid4().hex}.part"
+    segments.write_output(segments.read_store(store), fmt, tmp)
+    os.replace(tmp, out)
+    return out
+
+def _fetch_store(job_id: str, base: Path) -> bool:
+    """Pull the segment store a worker without the shared volume uploaded
+    (MINIO_UPLOAD_ARTIFACTS=segments) into the API's job directory."""
+    base.mkdir(parents=True, exist_ok=True)
+    tmp = base / f"{segments.STORE_NAME}.{uuid.uuid4().hex}.part"
+    if not storage.fetch_object(storage.MINIO_BUCKET, f"{job_id}.segments.jsonl", tmp):
+        tmp.unlink(missing_ok=True)
+        return False
+    os.replace(tmp, base / segments.STORE_NAME)
+    lifecycle.track(job_id)
+    return True
+
+@app.get("/v1/jobs/{job_id}/result")
+async def job_result(job_id: str, format: Optional[Literal["srt", "vtt", "txt", "json"]] = None):
+    job_id = safe_job_id(job_id)
+    requested, status = get_redis().hmget(status_key(job_id), "output", "status")
+    if status is None:
+        raise HTTPException(404, "job tidak ditemukan")
 
     base = storage_dir() / "jobs" / job_id
+    if status == b"finished" and not (base / segments.STORE_NAME).exists():
+        await anyio.to_thread.run_sync(_fetch_store, job_id, base)
 
     # worker akan tulis output di sini:
-    # output.srt / output.vtt / output.txt
-    for fname in ["output.srt", "output.vtt", "output.txt"]:
-        p = base / fname
+    # segments.jsonl (semua format di-render dari sini) + output.<format> yang diminta
+    if format is None:
+        requested = (requested or b"srt").decode()
+        candidates = [requested] + [f for f in segments.FORMATS if f != requested]
+    else:
+        candidates = [format]
+
+    for fmt in candidates:
+        p = base / f"output.{fmt}"
+        if not p.exists() and (format is not None or fmt == candidates[0]):
+            p = await anyio.to_thread.run_sync(_render_from_store, base, fmt) or p
         if p.exists():
-            media_type = "text/plain"
-            return FileResponse(str(p), media_type=media_type, filename=fname)
+            return FileResponse(str(p), media_type=segments.MEDIA_TYPES[fmt], filename=p.name)
 
     raise HTTPException(404, "hasil belum ada / job belum selesai")
 
+@app.websocket("/v1/live")
+async def live_transcribe(ws: WebSocket):
+    """Real-time transcription over a WebSocket.
+
+    The client sends a JSON config (LiveRequest), then binary audio chunks,
+    then {"event": "end"}. The server answers with JSON messages: `session`,
+    `ready`, `partial` / `final` ({start, end, text}) and a last `end`
+    carrying the full transcript in the requested output format.
+    """
+    await ws.accept()
+    try:
+        config = LiveRequest(**await ws.receive_json())
+    except Exception as e:
+        await ws.send_json({"type": "end", "status": "failed", "error": f"config tidak valid: {e}"})
+        await ws.close(code=1008)
+        return
+
+    session_id = f"live-{uuid.uuid4().hex}"
+    audio_key = live_audio_key(session_id)
+    events_key = segment_stream_key(session_id)
+    entry = json.dumps({"session_id": session_id, **config.model_dump()})
+    client = get_async_redis()
+    try:
+        await client.lpush(LIVE_SESSIONS_KEY, entry)
+        await ws.send_json({"type": "session", "session_id": session_id})
+
+        async def pump_audio(scope: anyio.CancelScope):
+            try:
+                while True:
+                    msg = await ws.receive()
+                    if msg["type"] == "websocket.disconnect":
+                        # nobody left to send results to
+                        scope.cancel()
+                        break
+                    if msg.get("bytes"):
+                        await client.xadd(audio_key, {"audio": msg["bytes"]}, maxlen=LIVE_MAX_BACKLOG, approximate=True)
+                    elif msg.get("text") and json.loads(msg["text"]).get("event") == "end":
+                        break
+            finally:
+                with anyio.CancelScope(shield=True):
+                    await client.xadd(audio_key, {"end": "1"})
+                    await client.expire(audio_key, LIVE_START_TIMEOUT + 60)
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(pump_audio, tg.cancel_scope)
+            cursor, claimed, waited = "0-0", False, 0
+            while True:
+                resp = await client.xread({events_key: cursor}, block=1000, count=100)
+                if not resp:
+                    waited += 1
+                    if not claimed and waited >= LIVE_START_TIMEOUT:
+                        await client.lrem(LIVE_SESSIONS_KEY, 0, entry)
+                        await ws.send_json({"type": "end", "status": "failed", "error": "tidak ada live worker yang tersedia"})
+                        break
+                    continue
+                done = False
+                for entry_id, fields in resp[0][1]:
+                    cursor = entry_id.decode()
+                    event = fields.pop(b"event").decode()
+                    claimed = True
+                    await ws.send_json({"type": event, **{k.decode(): json.loads(v) for k, v in fields.items()}})
+                    if event == "end":
+                        done = True
+                        break
+                if done:
+                    break
+            tg.cancel_scope.cancel()
+        if ws.client_state.name == "CONNECTED":
+            await ws.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        with anyio.CancelScope(shield=True):
+            # a session nobody claimed must not be picked up after the client left
+            await client.lrem(LIVE_SESSIONS_KEY, 0, entry)
+            await client.aclose()
+
 @app.get("/v1/stats")
 async def get_stats():
-    q = get_queue()
     redis = get_redis()
+    queues = transcribe_queues()
     return {
-        "queued": q.count,
-        "started": q.started_job_registry.count,
-        "failed": q.failed_job_registry.count,
-        "finished": q.finished_job_registry.count,
-        "workers": len(Worker.all(connection=redis))
+        "queued": sum(q.count for q in queues),
+        "started": sum(q.started_job_registry.count for q in queues),
+        "failed": sum(q.failed_job_registry.count for q in queues),
+        "finished": sum(q.finished_job_registry.count for q in queues),
+        "queues": {q.name: q.count for q in queues},
+        "workers": len(Worker.all(connection=redis)),
+        "cache": result_cache.stats(),
+        "webhooks": webhooks.stats(),
     }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus scrape endpoint (job and stage metrics come from the worker exporter)."""
+    return Response(metrics.api_metrics(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/v1/webhooks/dead")
+async def webhook_dead_letters(limit: int = 100):
+    """Webhook deliveries that ran out of attempts, newest first."""
+    return {"deliveries": webhooks.dead_letters(max(1, min(limit, 1000)))}
+
+@app.post("/v1/webhooks/dead/{delivery_id}/retry")
+async def webhook_retry(delivery_id: str):
+    if not webhooks.redeliver(safe_job_id(delivery_id)):
+        raise HTTPException(404, "delivery tidak ditemukan di dead-letter")
+    return {"id": delivery_id, "status": "scheduled"}
@@ -0,0 +1,324 @@
+"""Offline benchmark of the transcription pipeline.
+
+Runs process_job end to end (ffmpeg decode, model, output, MinIO upload) on
+synthetic fixtures, with fakeredis and a local S3 stand-in instead of
+Redis/MinIO, over a sweep of configurations:
+
+    python bench.py --models small,base --compute int8 --threads 0,4 \\
+        --concurrency 1,2 --engines sequential,batched --lengths 30,300 \\
+        --out bench.json [--compare baseline.json]
+
+Each configuration starts MAX_CONCURRENCY fresh slot processes (like the
+worker manager, with WARM_WORKER), loads the model, then all slots start on
+their share of the jobs at once. Reported per configuration: RTF, jobs/hour,
+peak RSS and per-stage latency (from the metrics module). Fixtures are
+generated from a fixed seed, so results of different commits are comparable;
+--compare prints the change against an earlier run and exits non-zero when
+the RTF regressed by more than --threshold.
+
+Needs ffmpeg, fakeredis and the model files (downloaded on first use).
+--fake-model replaces the model by a stub to measure pipeline overhead only.
+"""
+import os
+import sys
+import json
+import time
+import wave
+import queue
+import shutil
+import hashlib
+import argparse
+import platform
+import itertools
+import subprocess
+import tempfile
+import multiprocessing
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FIXTURE_SEED = 1234
+CONFIG_KEYS = ("model", "compute_type", "cpu_threads", "concurrency", "engine")
+
+
+def synth(kind: str, seconds: int, seed: int = FIXTURE_SEED) -> np.ndarray:
+    """Deterministic test audio: background noise, plus for "speech" voiced
+    word-length bursts (gliding pitch, a few harmonics) with short gaps and
+    the occasional phrase pause, so VAD and segmentation have work to do."""
+    rng = np.random.default_rng([seed, seconds, 0 if kind == "noise" else 1])
+    n = seconds * SAMPLE_RATE
+    audio = rng.normal(0.0, 0.01, n)
+    if kind == "speech":
+        pos = 0
+        while pos < n:
+            dur = int(rng.uniform(0.15, 0.5) * SAMPLE_RATE)
+            t = np.arange(dur) / SAMPLE_RATE
+            f0 = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(2, 5) * t))
+            phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+            voiced = sum(np.sin(k * phase) / k for k in range(1, 8)) * np.hanning(dur)
+            end = min(n, pos + dur)
+            audio[pos:end] += 0.3 * voiced[: end - pos]
+            gap = rng.uniform(0.05, 0.25) if rng.random() > 0.15 else rng.uniform(0.5, 1.2)
+            pos += dur + int(gap * SAMPLE_RATE)
+    return np.clip(audio, -1.0, 1.0).astype(np.float32)
+
+
+def write_wav(audio: np.ndarray, path: Path):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes((audio * 32767).astype("<i2").tobytes())
+
+
+def fixtures(directory: Path, kinds: List[str], lengths: List[int]) -> List[Dict[str, Any]]:
+    """Generate (or reuse) the fixture files; returns their descriptions."""
+    directory.mkdir(parents=True, exist_ok=True)
+    out = []
+    for kind, seconds in itertools.product(kinds, lengths):
+        path = directory / f"{kind}_{seconds}s.wav"
+        if not path.exists():
+            write_wav(synth(kind, seconds), path)
+        out.append({
+            "name": path.stem,
+            "path": str(path),
+            "seconds": seconds,
+            "sha256": hashlib.sha256(path.read_bytes()).hexdigest(),
+        })
+    return out
+
+
+def fixtures_digest(fx: List[Dict[str, Any]]) -> str:
+    return hashlib.sha256("".join(sorted(f["sha256"] for f in fx)).encode()).hexdigest()[:16]
+
+
+def _stage_stats(metrics) -> Dict[str, Dict[str, float]]:
+    stages: Dict[str, Dict[str, float]] = {}
+    for family in metrics.STAGE_SECONDS.collect():
+        for s in family.samples:
+            if s.name.endswith("_sum") or s.name.endswith("_count"):
+                key = "total_s" if s.name.endswith("_sum") else "count"
+                stages.setdefault(s.labels["stage"], {})[key] = s.value
+    return stages
+
+
+class _FakeModel:
+    """Stands in for WhisperModel under --fake-model: one segment per 5s."""
+
+    def transcribe(self, audio, **kwargs):
+        from collections import namedtuple
+        Seg = namedtuple("Seg", ["start", "end", "text"])
+        Info = namedtuple("Info", ["language", "duration"])
+        duration = len(audio) / SAMPLE_RATE
+        segs = [Seg(float(s), float(min(s + 5, duration)), f" segment {s // 5}") for s in range(0, int(duration), 5)]
+        return iter(segs), Info("en", duration)
+
+
+def _slot(config: Dict[str, Any], jobs: List[Dict[str, Any]], workdir: str, fake_model: bool, verbose: bool, barrier, results):
+    """One worker slot, in its own (spawned) process."""
+    os.environ.update({
+        "REDIS_URL": "redis://bench",
+        "STORAGE_DIR": workdir,
+        "MODEL_SIZE": config["model"],
+        "WHISPER_COMPUTE_TYPE": config["compute_type"],
+        "CPU_THREADS": str(config["cpu_threads"]),
+        "MAX_CONCURRENCY": str(config["concurrency"]),
+        "WHISPER_ENGINE": config["engine"],
+        "WARM_WORKER": "true",
+        "RESULT_CACHE_ENABLED": "false",
+        "CHUNKING_ENABLED": "false",
+        "PREFETCH_ENABLED": "false",
+        "WEBHOOK_DELIVERY_ENABLED": "false",
+        "MINIO_ACCESS_KEY": "bench",
+        "MINIO_SECRET_KEY": "benchsecret",
+        "MINIO_REGION": "us-east-1",
+    })
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+
+    import fakeredis
+    import fake_s3
+    import redis_queue
+    server, endpoint = fake_s3.serve()
+    os.environ["MINIO_ENDPOINT"] = endpoint
+    redis_queue._redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis_pid = os.getpid()
+
+    import resource
+    import worker
+    import metrics
+    if fake_model:
+        worker._get_model = lambda *a, **k: _FakeModel()
+        worker.BatchedInferencePipeline = lambda model: model
+
+    worker._get_model()
+    job_queue = redis_queue.get_queue(worker.model_queue_name(config["model"]))
+    for job in jobs:
+        base = Path(workdir) / "jobs" / job["job_id"]
+        base.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(job["path"], base / "input.bin")
+        payload = {"job_id": job["job_id"], "input_path": str(base / "input.bin"), "output": "srt", "engine": config["engine"]}
+        job_queue.enqueue(worker.process_job, payload, job_id=job["job_id"], job_timeout=-1)
+
+    barrier.wait()
+    started = time.time()
+    w = worker.WarmSchedulingWorker([job_queue], connection=redis_queue.get_redis(), name=f"bench-{os.getpid()}")
+    w.work(burst=True, logging_level="WARNING")
+    worker.storage.wait_uploads()
+    ended = time.time()
+    server.shutdown()
+
+    results.put({
+        "started": started,
+        "ended": ended,
+        "failed": job_queue.failed_job_registry.count,
+        "stages": _stage_stats(metrics),
+        "audio_seconds": sum(s.value for f in metrics.AUDIO_SECONDS.collect() for s in f.samples if s.name.endswith("_total")),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def run_config(config: Dict[str, Any], fx: List[Dict[str, Any]], repeat: int, fake_model: bool, verbose: bool) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    slots = config["concurrency"]
+    share: List[List[Dict[str, Any]]] = [[] for _ in range(slots)]
+    jobs = [dict(f, job_id=f"bench-{f['name']}-{r}") for r in range(repeat) for f in fx]
+    # longest first, round-robin, so the slots get similar amounts of audio
+    for i, job in enumerate(sorted(jobs, key=lambda j: -j["seconds"])):
+        share[i % slots].append(job)
+
+    barrier = ctx.Barrier(slots)
+    results = ctx.Queue()
+    with tempfile.TemporaryDirectory(prefix="transcribe-bench-") as tmp:
+        procs = [
+            ctx.Process(target=_slot, args=(config, share[i], f"{tmp}/slot{i}", fake_model, verbose, barrier, results))
+            for i in range(slots)
+        ]
+        for p in procs:
+            p.start()
+        slot_results = []
+        while len(slot_results) < slots:
+            try:
+                slot_results.append(results.get(timeout=5))
+            except queue.Empty:
+                dead = [p for p in procs if p.exitcode not in (None, 0)]
+                if dead:
+                    barrier.abort()
+                    raise RuntimeError(f"bench slot exited with {dead[0].exitcode} (run with --verbose)")
+        for p in procs:
+            p.join()
+
+    wall = max(r["ended"] for r in slot_results) - min(r["started"] for r in slot_results)
+    audio = sum(r["audio_seconds"] for r in slot_results)
+    stages: Dict[str, Dict[str, float]] = {}
+    for r in slot_results:
+        for name, s in r["stages"].items():
+            agg = stages.setdefault(name, {"count": 0, "total_s": 0.0})
+            agg["count"] += int(s.get("count", 0))
+            agg["total_s"] += s.get("total_s", 0.0)
+    for s in stages.values():
+        s["mean_s"] = round(s["total_s"] / s["count"], 4) if s["count"] else None
+        s["total_s"] = round(s["total_s"], 3)
+    transcribe_s = stages.get("transcribe", {}).get("total_s", 0.0)
+    return {
+        **config,
+        "jobs": len(jobs),
+        "failed": sum(r["failed"] for r in slot_results),
+        "audio_seconds": round(audio, 2),
+        "wall_seconds": round(wall, 3),
+        # model time per audio second in one slot (what the worker logs as RTF)
+        "rtf": round(transcribe_s / audio, 4) if audio else None,
+        # wall time per audio second with all slots busy
+        "wall_rtf": round(wall / audio, 4) if audio else None,
+        "jobs_per_hour": round(len(jobs) / wall * 3600, 1) if wall else None,
+        "peak_rss_mb": round(max(r["peak_rss_mb"] for r in slot_results), 1),
+        "total_rss_mb": round(sum(r["peak_rss_mb"] for r in slot_results), 1),
+        "stages": stages,
+    }
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[str]:
+    """Print new vs old per configuration; returns the regressions."""
+    if old.get("fixtures_digest") != new.get("fixtures_digest"):
+        print("[!] Fixture sets differ, results are not directly comparable")
+    baseline = {tuple(r[k] for k in CONFIG_KEYS): r for r in old.get("results", [])}
+    regressions = []
+    for r in new["results"]:
+        key = tuple(r[k] for k in CONFIG_KEYS)
+        o = baseline.get(key)
+        if o is None or not o.get("rtf") or not r.get("rtf"):
+            continue
+        change = r["rtf"] / o["rtf"] - 1
+        print(f"    {'/'.join(map(str, key))}: rtf {o['rtf']} -> {r['rtf']} ({change:+.1%}), "
+              f"jobs/h {o['jobs_per_hour']} -> {r['jobs_per_hour']}, peak RSS {o['peak_rss_mb']} -> {r['peak_rss_mb']} MB")
+        if change > threshold:
+            regressions.append(f"{'/'.join(map(str, key))}: rtf {change:+.1%}")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _csv(cast):
+    return lambda s: [cast(x.strip()) for x in s.split(",") if x.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline transcription pipeline benchmark")
+    parser.add_argument("--models", type=_csv(str), default=[os.getenv("MODEL_SIZE", "small")])
+    parser.add_argument("--compute", type=_csv(str), default=["int8"])
+    parser.add_argument("--threads", type=_csv(int), default=[0], help="CPU_THREADS values (0 = derived from concurrency)")
+    parser.add_argument("--concurrency", type=_csv(int), default=[1])
+    parser.add_argument("--engines", type=_csv(str), default=["sequential"])
+    parser.add_argument("--kinds", type=_csv(str), default=["speech", "noise"])
+    parser.add_argument("--lengths", type=_csv(int), default=[30, 300], help="fixture lengths in seconds")
+    parser.add_argument("--repeat", type=int, default=1, help="times each fixture is transcribed per configuration")
+    parser.add_argument("--fixtures", type=Path, default=Path(tempfile.gettempdir()) / "transcribe-bench-fixtures")
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed RTF increase before --compare fails")
+    parser.add_argument("--fake-model", action="store_true")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    fx = fixtures(args.fixtures, args.kinds, args.lengths)
+    report = {
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "host": {"cpus": os.cpu_count(), "machine": platform.machine(), "python": platform.python_version()},
+        "fake_model": args.fake_model,
+        "fixtures": [{k: f[k] for k in ("name", "seconds", "sha256")} for f in fx],
+        "fixtures_digest": fixtures_digest(fx),
+        "results": [],
+    }
+    for values in itertools.product(args.models, args.compute, args.threads, args.concurrency, args.engines):
+        config = dict(zip(CONFIG_KEYS, values))
+        print(f"[*] {config} ...", flush=True)
+        result = run_config(config, fx, args.repeat, args.fake_model, args.verbose)
+        print(f"    -> rtf={result['rtf']} wall_rtf={result['wall_rtf']} jobs/h={result['jobs_per_hour']} "
+              f"peak_rss={result['peak_rss_mb']}MB failed={result['failed']}", flush=True)
+        report["results"].append(result)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text)
+        print(f"[+] Wrote {args.out}")
+    else:
+        print(text)
+
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), report, args.threshold)
+        if regressions:
+            print("[!] RTF regressions: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+import bisect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+from utils import valid_int_env, valid_str_env
+
+# CPU speaker diarization.
+# Speech regions (Silero VAD) are cut into 1.5 s windows, each window gets a
+# speaker embedding from an ONNX model (WeSpeaker-style: 80-dim Kaldi fbank
+# in, one embedding out) and the embeddings are clustered by cosine
+# similarity. Runs on its own thread over the same in-memory PCM the model
+# transcribes: onnxruntime and CTranslate2 both release the GIL, so with a
+# spare core per slot diarization adds next to nothing to the job's time.
+DIARIZE_MODEL = valid_str_env("DIARIZE_MODEL", "/models/speaker-embedding.onnx")
+# onnxruntime threads per slot, on top of the slot's CPU_THREADS
+DIARIZE_THREADS = valid_int_env("DIARIZE_THREADS", 1)
+# windows / clusters more similar than this (cosine) are the same speaker
+try:
+    DIARIZE_THRESHOLD = float(valid_str_env("DIARIZE_THRESHOLD", "0.5"))
+except ValueError:
+    DIARIZE_THRESHOLD = 0.5
+DIARIZE_MAX_SPEAKERS = valid_int_env("DIARIZE_MAX_SPEAKERS", 0)  # 0 = no limit
+
+SAMPLE_RATE = 16000
+WINDOW = 1.5
+STEP = 0.75
+_BATCH = 32
+_MIN_CLUSTER = 3  # windows; smaller clusters are folded into the nearest speaker
+
+_session = None
+_session_lock = threading.Lock()
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_pid: Optional[int] = None
+
+Turn = Tuple[float, float, str]
+
+
+def available() -> bool:
+    return os.path.isfile(DIARIZE_MODEL)
+
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = max(1, DIARIZE_THREADS)
+            options.inter_op_num_threads = 1
+            print(f"[*] Loading speaker embedding model ({DIARIZE_MODEL})")
+            _session = onnxruntime.InferenceSession(
+                DIARIZE_MODEL, sess_options=options, providers=["CPUExecutionProvider"]
+            )
+        return _session
+
+
+def _mel_banks(num_bins: int = 80, n_fft: int = 512, low: float = 20.0) -> np.ndarray:
+    # Kaldi's triangular filters on the mel scale, over the n_fft // 2 bins
+    # below Nyquist (the Nyquist bin gets no weight)
+    def mel(f):
+        return 1127.0 * np.log(1.0 + f / 700.0)
+    high = SAMPLE_RATE / 2
+    edges = np.linspace(mel(low), mel(high), num_bins + 2)
+    freqs = mel(np.arange(n_fft // 2) * SAMPLE_RATE / n_fft)
+    left, center, right = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    up = (freqs - left) / (center - left)
+    down = (right - freqs) / (right - center)
+    banks = np.maximum(0.0, np.minimum(up, down))
+    return np.pad(banks, ((0, 0), (0, 1))).T.astype(np.float32)
+
+
+_MEL = None
+
+
+def fbank(audio: np.ndarray) -> np.ndarray:
+    """80-dim log mel filterbank, 25 ms frames every 10 ms, as Kaldi computes
+    it (hamming window, pre-emphasis 0.97, no dither), one row per frame."""
+    global _MEL
+    if _MEL is None:
+        _MEL = _mel_banks()
+    if len(audio) < 400:
+        return np.zeros((0, 80), dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, 400)[::160] * 32768.0
+    frames = frames - frames.mean(axis=1, keepdims=True)
+    frames[:, 1:] -= 0.97 * frames[:, :-1].copy()
+    frames[:, 0] *= 1 - 0.97
+    frames *= np.hamming(400)
+    power = np.abs(np.fft.rfft(frames, 512)) ** 2
+    return np.log(np.maximum(power.astype(np.float32) @ _MEL, np.finfo(np.float32).eps))
+
+
+def windows(speech: List[dict], duration: float) -> List[Tuple[float, float, float]]:
+    """(window start, core start, core end) for every embedding window.
+
+    Regions shorter than a window get one window centered on them; longer
+    ones are covered every STEP seconds. Each window is credited only with
+    its core (the middle STEP seconds, or up to the region's edges), so the
+    cores tile the speech without overlapping.
+    """
+    out = []
+    for region in speech:
+        s, e = region["start"] / SAMPLE_RATE, region["end"] / SAMPLE_RATE
+        if e - s <= WINDOW:
+            start = min(max(0.0, (s + e - WINDOW) / 2), max(0.0, duration - WINDOW))
+            out.append((start, s, e))
+            continue
+        starts = [float(x) for x in np.arange(s, e - WINDOW, STEP)] + [e - WINDOW]
+        for i, start in enumerate(starts):
+            core_start = s if i == 0 else out[-1][2]
+            core_end = e if i == len(starts) - 1 else start + (WINDOW + STEP) / 2
+            out.append((start, core_start, max(core_start, core_end)))
+    return out
+
+
+def embed(audio: np.ndarray, starts: List[float]) -> np.ndarray:
+    """Unit-length speaker embeddings of the WINDOW-second windows at starts.
+
+    Features are computed per window from its own slice of audio (frames
+    never look past their 400 samples), so memory stays at one batch of
+    windows however long the recording is.
+    """
+    session = _get_session()
+    name = session.get_inputs()[0].name
+    total = (len(audio) - 400) // 160 + 1 if len(audio) >= 400 else 0  # frames fbank(audio) would have
+    frames = int(WINDOW * 100) - 2  # frames in a WINDOW-second slice
+    span = (frames - 1) * 160 + 400  # samples those frames cover
+    out = []
+    for i in range(0, len(starts), _BATCH):
+        batch = []
+        for start in starts[i:i + _BATCH]:
+            first = min(int(start * 100), max(0, total - frames))
+            window = fbank(audio[first * 160:first * 160 + span])
+            if len(window) < frames:
+                window = np.pad(window, ((0, frames - len(window)), (0, 0)), mode="edge")
+            batch.append(window - window.mean(axis=0))  # per-window CMN
+        out.append(session.run(None, {name: np.stack(batch)})[0])
+    emb = np.concatenate(out).reshape(len(starts), -1)
+    return emb / np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-8)
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-8)
+
+
+def cluster(emb: np.ndarray, threshold: Optional[float] = None, max_speakers: Optional[int] = None) -> np.ndarray:
+    """Speaker index per embedding, numbered in order of first appearance.
+
+    One pass assigns each window to the most similar running centroid (or a
+    new one below threshold), then centroids are merged average-linkage
+    style while they are more similar than threshold (or while there are
+    more than max_speakers), tiny clusters are dropped and every window is
+    reassigned to its nearest remaining centroid. O(windows x speakers), so
+    hours of audio stay cheap.
+    """
+    threshold = DIARIZE_THRESHOLD if threshold is None else threshold
+    max_speakers = DIARIZE_MAX_SPEAKERS if max_speakers is None else max_speakers
+    if len(emb) == 0:
+        return np.zeros(0, dtype=int)
+    sums, counts = [emb[0].copy()], [1]
+    for e in emb[1:]:
+        sims = _normalize(np.array(sums)) @ e
+        best = int(np.argmax(sims))
+        if sims[best] >= threshold:
+            sums[best] += e
+            counts[best] += 1
+        else:
+            sums.append(e.copy())
+            counts.append(1)
+
+    while len(sums) > 1:
+        centroids = _normalize(np.array(sums))
+        sims = centroids @ centroids.T
+        np.fill_diagonal(sims, -np.inf)
+        a, b = np.unravel_index(int(np.argmax(sims)), sims.shape)
+        if sims[a, b] < threshold and not (max_speakers and len(sums) > max_speakers):
+            break
+        a, b = min(a, b), max(a, b)
+        sums[a] = sums[a] + sums.pop(b)
+        counts[a] += counts.pop(b)
+
+    keep = [i for i, n in enumerate(counts) if n >= _MIN_CLUSTER] or [int(np.argmax(counts))]
+    labels = np.argmax(emb @ _normalize(np.array([sums[i] for i in keep])).T, axis=1)
+    # renumber by first appearance so SPEAKER_00 is whoever talks first
+    order = {}
+    return np.array([order.setdefault(l, len(order)) for l in labels])
+
+
+def diarize(audio: np.ndarray) -> List[Turn]:
+    """Speaker turns (start, end, label) of 16 kHz mono float32 PCM."""
+    duration = len(audio) / SAMPLE_RATE
+    speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=300))
+    spans = windows(speech, duration)
+    if not spans:
+        return []
+    labels = cluster(embed(audio, [w[0] for w in spans]))
+    turns: List[Turn] = []
+    for (_, start, end), label in zip(spans, labels):
+        speaker = f"SPEAKER_{label:02d}"
+        if turns and turns[-1][2] == speaker and start - turns[-1][1] < STEP:
+            turns[-1] = (turns[-1][0], end, speaker)
+        else:
+            turns.append((start, end, speaker))
+    return turns
+
+
+def assign(segments: Iterable[Any], turns: List[Turn]) -> List[Optional[str]]:
+    """Speaker of each segment: the one it overlaps most, else the nearest turn."""
+    if not turns:
+        return [None for _ in segments]
+    ends = [t[1] for t in turns]
+    labels = []
+    for seg in segments:
+        start, end = float(seg.start), float(seg.end)
+        i = bisect.bisect_right(ends, start)
+        overlap = {}
+        j = i
+        while j < len(turns) and turns[j][0] < end:
+            overlap[turns[j][2]] = overlap.get(turns[j][2], 0.0) + min(end, turns[j][1]) - max(start, turns[j][0])
+            j += 1
+        if overlap:
+            labels.append(max(overlap, key=overlap.get))
+            continue
+        # no turn overlaps (VAD missed it): the turn closest in time
+        near = [t for t in turns[max(0, i - 1):i + 1]]
+        labels.append(min(near, key=lambda t: min(abs(t[0] - end), abs(start - t[1])))[2])
+    return labels
+
+
+def _run(audio: np.ndarray) -> Optional[List[Turn]]:
+    try:
+        return diarize(audio)
+    except Exception as e:
+        # speaker labels are best effort: the transcript never fails on them
+        print(f"[!] Diarization failed: {e}")
+        return None
+
+
+def start(audio: np.ndarray) -> Optional[Future]:
+    """Diarize audio on this process's diarization thread; None (with a
+    warning) when DIARIZE_MODEL is missing. The future never raises, its
+    result is None if diarization failed."""
+    global _pool, _pool_pid
+    if not available():
+        print(f"[!] Diarization requested but DIARIZE_MODEL ({DIARIZE_MODEL}) not found, skipping")
+        return None
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = ThreadPoolExecutor(1, thread_name_prefix="diarize")
+        _pool_pid = os.getpid()
+    return _pool.submit(_run, audio)
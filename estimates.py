@@ -0,0 +1,97 @@
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from rq import Worker
+
+from redis_queue import get_redis
+from utils import valid_int_env, valid_str_env
+
+# Duration-based estimates.
+# Workers keep exponentially weighted averages of the real-time factor per
+# model and of the wall time per job in one Redis hash. The API turns them
+# into per-job timeouts (probed duration x RTF, within [JOB_TIMEOUT_MIN,
+# JOB_TIMEOUT]) and estimated start / finish times on the job status.
+JOB_TIMEOUT = valid_int_env("JOB_TIMEOUT", 14400)
+JOB_TIMEOUT_MIN = valid_int_env("JOB_TIMEOUT_MIN", 600)
+# how much slower than the measured RTF a job may run before it times out
+TIMEOUT_RTF_FACTOR = valid_int_env("TIMEOUT_RTF_FACTOR", 4)
+# RTF assumed for a model no job has been measured on yet
+try:
+    DEFAULT_RTF = float(valid_str_env("DEFAULT_RTF", "0.5"))
+except ValueError:
+    DEFAULT_RTF = 0.5
+_ALPHA = 0.2
+
+_KEY = "transcribe:estimates"  # hash: rtf:<model> -> RTF, job_seconds -> wall time per job
+
+
+def _record(field: str, value: float):
+    # read-modify-write: a lost update between two slots only drops one sample
+    redis = get_redis()
+    old = redis.hget(_KEY, field)
+    new = value if old is None else (1 - _ALPHA) * float(old) + _ALPHA * value
+    redis.hset(_KEY, field, new)
+
+
+def record_rtf(model: str, rtf: float):
+    _record(f"rtf:{model}", rtf)
+
+
+def record_job_seconds(seconds: float):
+    _record("job_seconds", seconds)
+
+
+def snapshot() -> Dict[str, Any]:
+    """Averages and the number of worker slots, read once per status request."""
+    redis = get_redis()
+    raw = {k.decode(): float(v) for k, v in redis.hgetall(_KEY).items()}
+    return {
+        "rtf": {k[4:]: v for k, v in raw.items() if k.startswith("rtf:")},
+        "job_seconds": raw.get("job_seconds"),
+        "slots": Worker.count(connection=redis),
+    }
+
+
+def rtf(model: str, snap: Optional[Dict[str, Any]] = None) -> float:
+    if snap is not None:
+        return snap["rtf"].get(model, DEFAULT_RTF)
+    value = get_redis().hget(_KEY, f"rtf:{model}")
+    return DEFAULT_RTF if value is None else float(value)
+
+
+def job_timeout(duration: Optional[float], model: str) -> int:
+    """Timeout for a job of this duration; JOB_TIMEOUT if it is unknown."""
+    if not duration:
+        return JOB_TIMEOUT
+    expected = duration * rtf(model) * TIMEOUT_RTF_FACTOR
+    return int(min(JOB_TIMEOUT, max(JOB_TIMEOUT_MIN, expected)))
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def estimate(st: Dict[str, Any], snap: Dict[str, Any], now: Optional[datetime] = None) -> Tuple[Optional[str], Optional[str]]:
+    """(estimated_start, estimated_finish) of a queued or started job, ISO 8601.
+
+    The queue ahead is assumed to drain at one average job per slot; the job
+    itself takes duration x the model's RTF (or the average job time).
+    """
+    now = now or datetime.now(timezone.utc)
+    status = st.get("status") or "queued"
+    duration = float(st["duration"]) if st.get("duration") else None
+    if duration is not None and st.get("model"):
+        work = duration * rtf(st["model"], snap)
+    else:
+        work = snap["job_seconds"]
+
+    if status == "started":
+        start = _parse_time(st.get("started_at")) or now
+    elif status == "queued" and st.get("queue_position") is not None:
+        if snap["job_seconds"] is None:
+            return None, None
+        start = now + timedelta(seconds=st["queue_position"] * snap["job_seconds"] / max(1, snap["slots"]))
+    else:
+        return None, None
+    finish = max(now, start + timedelta(seconds=work)) if work is not None else None
+    return start.isoformat(), finish.isoformat() if finish else None
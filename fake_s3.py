@@ -0,0 +1,117 @@
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from typing import Tuple
+
+# In-process S3 stand-in for tests and the benchmark (no MinIO needed).
+
+
+class FakeS3(BaseHTTPRequestHandler):
+    """Just enough of the S3 API for the storage module: bucket HEAD/PUT,
+    object PUT/HEAD/GET (with Range)/DELETE and the three multipart calls.
+    Every request is recorded."""
+    protocol_version = "HTTP/1.1"
+    buckets = set()
+    objects = {}
+    parts = {}
+    calls = []
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status=200, body=b"", headers=None):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, method):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query, keep_blank_values=True)
+        bucket, _, key = url.path.lstrip("/").partition("/")
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with self.lock:
+            self.calls.append((method, bucket, key, sorted(query)))
+        return bucket, key, query, body
+
+    def _object_headers(self, body: bytes):
+        return {
+            "ETag": '"%s"' % hashlib.md5(body).hexdigest(),
+            "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT",
+            "Content-Type": "application/octet-stream",
+        }
+
+    def _no_such_key(self, method):
+        if method == "HEAD":
+            return self._reply(404)
+        xml = b"<Error><Code>NoSuchKey</Code><Message>not found</Message></Error>"
+        self._reply(404, xml, {"Content-Type": "application/xml"})
+
+    def do_HEAD(self):
+        bucket, key, _, _ = self._route("HEAD")
+        if not key:
+            return self._reply(200 if bucket in self.buckets else 404)
+        body = self.objects.get((bucket, key))
+        if body is None:
+            return self._no_such_key("HEAD")
+        # HEAD: Content-Length is the object size, no body follows
+        self.send_response(200)
+        for k, v in self._object_headers(body).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+    def do_GET(self):
+        bucket, key, query, _ = self._route("GET")
+        if not key:
+            return self._reply(200, b'<LocationConstraint xmlns="http://s3.amazonaws.com/doc/2006-03-01/"></LocationConstraint>')
+        body = self.objects.get((bucket, key))
+        if body is None:
+            return self._no_such_key("GET")
+        rng = self.headers.get("Range")
+        if rng:
+            start, _, end = rng.split("=", 1)[1].partition("-")
+            start, end = int(start), int(end) if end else len(body) - 1
+            headers = dict(self._object_headers(body), **{"Content-Range": f"bytes {start}-{end}/{len(body)}"})
+            return self._reply(206, body[start:end + 1], headers)
+        self._reply(200, body, self._object_headers(body))
+
+    def do_DELETE(self):
+        bucket, key, _, _ = self._route("DELETE")
+        self.objects.pop((bucket, key), None)
+        self._reply(204)
+
+    def do_PUT(self):
+        bucket, key, query, body = self._route("PUT")
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if not key:
+            self.buckets.add(bucket)
+        elif "uploadId" in query:
+            with self.lock:
+                self.parts[(query["uploadId"][0], int(query["partNumber"][0]))] = body
+        else:
+            self.objects[(bucket, key)] = body
+        self._reply(200, headers={"ETag": etag})
+
+    def do_POST(self):
+        bucket, key, query, body = self._route("POST")
+        if "uploads" in query:
+            xml = f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key><UploadId>up-{key}</UploadId></InitiateMultipartUploadResult>"
+            return self._reply(200, xml.encode())
+        upload_id = query["uploadId"][0]
+        with self.lock:
+            numbers = sorted(n for u, n in self.parts if u == upload_id)
+            self.objects[(bucket, key)] = b"".join(self.parts.pop((upload_id, n)) for n in numbers)
+        xml = f'<CompleteMultipartUploadResult><Location>/{bucket}/{key}</Location><Bucket>{bucket}</Bucket><Key>{key}</Key><ETag>"x-{len(numbers)}"</ETag></CompleteMultipartUploadResult>'
+        self._reply(200, xml.encode())
+
+
+def serve() -> Tuple[ThreadingHTTPServer, str]:
+    """Start a FakeS3 server on a free port; returns (server, "host:port")."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeS3)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"127.0.0.1:{server.server_port}"
@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from redis_queue import get_redis, status_key
+from utils import valid_int_env, valid_str_env, storage_dir
+
+# Job directory lifecycle.
+# Every job directory is registered in a sorted set scored by the time it may
+# be deleted, so a reaper pass only touches expired entries (ZRANGEBYSCORE)
+# instead of walking STORAGE_DIR/jobs. A job that is still queued or running
+# when its entry comes due is pushed back by JOB_TIMEOUT; once it ends the
+# entry is rescored to ended_at + JOB_TTL_SECONDS, the lifetime of its status
+# and RQ result. Above DISK_HIGH_WATERMARK the lowest-scored (oldest ended)
+# jobs are evicted early until usage is back under DISK_LOW_WATERMARK.
+# Worker nodes without the shared volume keep job directories (fetched inputs,
+# outputs) in their own STORAGE_DIR. Whichever manager pops an entry from the
+# shared index deletes only its own copy, so each node also tracks the
+# directories its slots touched in a per-node index that only its manager reaps.
+AUTO_DELETE_LOCAL = os.getenv("AUTO_DELETE_LOCAL", "false").lower() == "true"
+JOB_TTL_SECONDS = valid_int_env("JOB_TTL_SECONDS", 86400)
+JOB_TIMEOUT = valid_int_env("JOB_TIMEOUT", 14400)
+DISK_HIGH_WATERMARK = valid_int_env("DISK_HIGH_WATERMARK", 90)  # percent used, 0 = off
+DISK_LOW_WATERMARK = valid_int_env("DISK_LOW_WATERMARK", 80)
+LIFECYCLE_INTERVAL = valid_int_env("LIFECYCLE_INTERVAL", 60)
+NODE_NAME = valid_str_env("NODE_NAME", os.uname().nodename)
+_BATCH = 100
+_ACTIVE = {b"queued", b"started"}
+
+_PREFIX = "transcribe:lifecycle"
+_EXPIRY = f"{_PREFIX}:expiry"  # zset: job id -> time its directory may be deleted
+_NODE_EXPIRY = f"{_EXPIRY}:{NODE_NAME}"  # same, for this node's own STORAGE_DIR
+
+
+def job_dir(job_id: str) -> Path:
+    return storage_dir() / "jobs" / job_id
+
+
+def track(job_id: str, ttl: int = JOB_TTL_SECONDS, pipeline=None):
+    """(Re)schedule deletion of the job's directory ttl seconds from now."""
+    redis = pipeline if pipeline is not None else get_redis()
+    redis.zadd(_EXPIRY, {job_id: time.time() + ttl})
+
+
+def track_local(job_id: str, ttl: int = JOB_TTL_SECONDS, pipeline=None):
+    """Same as track, for this node's copy of the job's directory."""
+    redis = pipeline if pipeline is not None else get_redis()
+    redis.zadd(_NODE_EXPIRY, {job_id: time.time() + ttl})
+
+
+def release_input(payload: Dict[str, Any]):
+    """Delete the job's input (and its digest / partial download) once the
+    output is written, when AUTO_DELETE_LOCAL is set."""
+    if not AUTO_DELETE_LOCAL or not payload.get("input_path"):
+        return
+    input_path = Path(payload["input_path"])
+    for path in (input_path, input_path.with_name(input_path.name + ".sha256"),
+                 input_path.with_name(input_path.name + ".part")):
+        path.unlink(missing_ok=True)
+
+
+def disk_usage_percent(path: Optional[Path] = None) -> float:
+    usage = shutil.disk_usage(path or storage_dir())
+    return 100.0 * usage.used / max(1, usage.total)
+
+
+def _active(redis, job_ids) -> list:
+    pipe = redis.pipeline()
+    for job_id in job_ids:
+        pipe.hget(status_key(job_id.decode()), "status")
+    return [status in _ACTIVE for status in pipe.execute()]
+
+
+def _delete(redis, job_id: str, index: str = _EXPIRY) -> bool:
+    # ZREM decides which reaper deletes when several managers share the volume
+    if not redis.zrem(index, job_id):
+        return False
+    shutil.rmtree(job_dir(job_id), ignore_errors=True)
+    return True
+
+
+def reap(now: Optional[float] = None, index: str = _EXPIRY) -> int:
+    """Delete the directories of expired jobs; returns how many were removed."""
+    redis = get_redis()
+    now = time.time() if now is None else now
+    removed = 0
+    while True:
+        ids = redis.zrangebyscore(index, "-inf", now, start=0, num=_BATCH)
+        for job_id, active in zip(ids, _active(redis, ids)):
+            if active:
+                redis.zadd(index, {job_id: now + JOB_TIMEOUT})
+            elif _delete(redis, job_id.decode(), index):
+                removed += 1
+        if len(ids) < _BATCH:
+            return removed
+
+
+def evict(path: Optional[Path] = None, index: str = _EXPIRY) -> int:
+    """Above DISK_HIGH_WATERMARK, delete ended jobs oldest first until usage
+    drops under DISK_LOW_WATERMARK; returns how many were removed."""
+    if not DISK_HIGH_WATERMARK or disk_usage_percent(path) < DISK_HIGH_WATERMARK:
+        return 0
+    redis = get_redis()
+    removed, offset = 0, 0
+    while disk_usage_percent(path) > DISK_LOW_WATERMARK:
+        ids = redis.zrange(index, offset, offset + _BATCH - 1)
+        if not ids:
+            break
+        for job_id, active in zip(ids, _active(redis, ids)):
+            if active:
+                offset += 1
+            elif _delete(redis, job_id.decode(), index):
+                removed += 1
+                if disk_usage_percent(path) <= DISK_LOW_WATERMARK:
+                    break
+    return removed
+
+
+def run_once() -> int:
+    # this node's own directories first, then the shared index
+    removed = reap(index=_NODE_EXPIRY) + reap() + evict(index=_NODE_EXPIRY) + evict()
+    if removed:
+        print(f"[*] Lifecycle: removed {removed} job directories")
+    return removed
+
+
+def adopt() -> int:
+    """Register job directories that aren't tracked yet (e.g. left from before
+    the index existed), scored by their mtime. Walks the whole jobs directory,
+    so it is meant to be run once by hand, not periodically."""
+    redis = get_redis()
+    jobs = storage_dir() / "jobs"
+    if not jobs.is_dir():
+        return 0
+    adopted = 0
+    for entry in os.scandir(jobs):
+        if entry.is_dir() and redis.zscore(_EXPIRY, entry.name) is None:
+            redis.zadd(_EXPIRY, {entry.name: entry.stat().st_mtime + JOB_TTL_SECONDS})
+            adopted += 1
+    return adopted
+
+
+if __name__ == "__main__":
+    # python lifecycle.py [--adopt]: one reaper pass (after adopting untracked directories)
+    if "--adopt" in sys.argv[1:]:
+        print(f"[*] Lifecycle: adopted {adopt()} job directories")
+    run_once()
@@ -0,0 +1,347 @@
+import sys
+import json
+import time
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+
+import numpy as np
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+from redis_queue import get_redis, LIVE_SESSIONS_KEY, live_audio_key
+from utils import valid_int_env, valid_str_env
+from worker import (
+    _get_model, _publish, _decode_pcm, MODEL_SIZE, SAMPLE_RATE, FFMPEG_TIMEOUT, WORKER_READY_FILE,
+)
+import segments as segment_store
+from segments import Segment
+
+# Live (streaming) transcription pool.
+# One process keeps a single warm model and decodes up to LIVE_SESSIONS
+# sessions in parallel threads (CTranslate2 num_workers).
+LIVE_MODEL = valid_str_env("LIVE_MODEL", MODEL_SIZE)
+LIVE_SESSIONS = valid_int_env("LIVE_SESSIONS", 2)
+# Latency knobs:
+#   LIVE_STEP_MS            how much new audio triggers a re-decode (partial latency)
+#   LIVE_SILENCE_MS         pause that closes an utterance (final latency after speech)
+#   LIVE_MAX_BUFFER_SECONDS hard bound on the rolling buffer (worst-case final latency)
+LIVE_STEP_MS = valid_int_env("LIVE_STEP_MS", 1000)
+LIVE_SILENCE_MS = valid_int_env("LIVE_SILENCE_MS", 700)
+LIVE_MAX_BUFFER_SECONDS = valid_int_env("LIVE_MAX_BUFFER_SECONDS", 15)
+# session ends when the client sends nothing for this long
+LIVE_IDLE_TIMEOUT = valid_int_env("LIVE_IDLE_TIMEOUT", 30)
+# committed text fed back as prompt so consecutive utterances stay consistent
+LIVE_PROMPT_CHARS = 200
+
+
+class LiveTranscriber:
+    """Incremental decoder over a rolling audio buffer.
+
+    Every LIVE_STEP_MS of new audio the whole buffer is decoded again.
+    Leading segments that came out identical in two consecutive decodes are
+    stable ("final") and are cut from the buffer; the rest is "partial" and
+    may still change. An utterance is closed (everything final) when VAD sees
+    LIVE_SILENCE_MS of trailing silence or the buffer hits its bound.
+    """
+
+    def __init__(self, model, language: Optional[str] = None, task: str = "transcribe"):
+        self.model = model
+        self.language = language
+        self.task = task
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.offset = 0.0  # stream time (s) of buffer[0]
+        self.pending = 0  # samples fed since the last decode
+        self.committed: List[Segment] = []
+        self._previous: List[str] = []  # texts of the last uncommitted hypothesis
+
+    @property
+    def duration(self) -> float:
+        return self.offset + len(self.buffer) / SAMPLE_RATE
+
+    def feed(self, pcm: np.ndarray) -> List[Tuple[str, Segment]]:
+        """Append 16k mono float32 samples; returns [(kind, segment)] to publish."""
+        if len(pcm):
+            self.buffer = np.concatenate([self.buffer, pcm])
+            self.pending += len(pcm)
+        if self.pending < LIVE_STEP_MS * SAMPLE_RATE // 1000:
+            return []
+        self.pending = 0
+        return self._step(flush=False)
+
+    def flush(self, pcm: Optional[np.ndarray] = None) -> List[Tuple[str, Segment]]:
+        """End of stream: commit whatever is left in the buffer."""
+        if pcm is not None and len(pcm):
+            self.buffer = np.concatenate([self.buffer, pcm])
+        return self._step(flush=True)
+
+    def _advance(self, samples: int):
+        self.buffer = self.buffer[samples:]
+        self.offset += samples / SAMPLE_RATE
+
+    def _step(self, flush: bool) -> List[Tuple[str, Segment]]:
+        n = len(self.buffer)
+        if not n:
+            return []
+        speech = get_speech_timestamps(
+            self.buffer, VadOptions(min_silence_duration_ms=LIVE_SILENCE_MS // 2, speech_pad_ms=100)
+        )
+        if not speech:
+            # silence only: nothing to decode, keep a short tail as lead-in
+            self._advance(max(0, n - SAMPLE_RATE // 5))
+            self._previous = []
+            return []
+
+        prompt = " ".join(s.text.strip() for s in self.committed[-10:])[-LIVE_PROMPT_CHARS:]
+        gen, info = self.model.transcribe(
+            self.buffer,
+            language=self.language,
+            task=self.task,
+            beam_size=1,
+            vad_filter=False,
+            condition_on_previous_text=False,
+            initial_prompt=prompt or None,
+        )
+        hypothesis = [s for s in gen if (s.text or "").strip()]
+        texts = [s.text.strip() for s in hypothesis]
+
+        trailing_silence = (n - speech[-1]["end"]) * 1000 / SAMPLE_RATE
+        if flush or trailing_silence >= LIVE_SILENCE_MS:
+            stable = len(hypothesis)
+        else:
+            # local agreement: leading segments unchanged since the last decode,
+            # never the last one (it may still be growing)
+            stable = 0
+            while (stable < len(hypothesis) - 1 and stable < len(self._previous)
+                   and texts[stable] == self._previous[stable]):
+                stable += 1
+            if not stable and n >= LIVE_MAX_BUFFER_SECONDS * SAMPLE_RATE:
+                # buffer bound reached: force out all but the growing tail
+                stable = len(hypothesis) - 1 if len(hypothesis) > 1 else len(hypothesis)
+        if stable == len(hypothesis):
+            cut = n
+        else:
+            cut = min(n, int(hypothesis[stable - 1].end * SAMPLE_RATE)) if stable else 0
+
+        events = []
+        for i, seg in enumerate(hypothesis):
+            shifted = Segment(self.offset + float(seg.start), self.offset + min(float(seg.end), n / SAMPLE_RATE), texts[i])
+            if i < stable:
+                self.committed.append(shifted)
+                events.append(("final", shifted))
+            else:
+                events.append(("partial", shifted))
+
+        if stable and self.language is None:
+            # pin the detected language once something is committed
+            self.language = info.language
+        self._previous = texts[stable:]
+        if cut:
+            self._advance(cut)
+        return events
+
+
+class _PcmDecoder:
+    """Raw s16le 16k mono: no ffmpeg needed, just convert."""
+
+    def __init__(self):
+        self._rest = b""
+
+    def feed(self, data: bytes) -> np.ndarray:
+        data = self._rest + data
+        usable = len(data) - len(data) % 2
+        self._rest = data[usable:]
+        return np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+
+    def close(self) -> np.ndarray:
+        return np.zeros(0, dtype=np.float32)
+
+
+class _FfmpegDecoder:
+    """Long-running ffmpeg fed through stdin (Opus in Ogg/WebM, or PCM at
+    another rate/channel count); decoded samples are collected by a reader thread."""
+
+    def __init__(self, input_args: List[str]):
+        cmd = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", *input_args, "-i", "pipe:0",
+               "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", "pipe:1"]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._out = bytearray()
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while True:
+            chunk = self.proc.stdout.read1(64 * 1024)
+            if not chunk:
+                break
+            with self._lock:
+                self._out += chunk
+
+    def _drain(self) -> np.ndarray:
+        with self._lock:
+            usable = len(self._out) - len(self._out) % 4
+            data = bytes(self._out[:usable])
+            del self._out[:usable]
+        return np.frombuffer(data, dtype=np.float32)
+
+    def feed(self, data: bytes) -> np.ndarray:
+        self.proc.stdin.write(data)
+        self.proc.stdin.flush()
+        return self._drain()
+
+    def close(self) -> np.ndarray:
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._reader.join(FFMPEG_TIMEOUT)
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        return self._drain()
+
+
+def _decoder_for(config: Dict[str, Any]):
+    rate = int(config.get("sample_rate") or SAMPLE_RATE)
+    channels = int(config.get("channels") or 1)
+    if config.get("format") == "opus":
+        return _FfmpegDecoder([])
+    if rate == SAMPLE_RATE and channels == 1:
+        return _PcmDecoder()
+    return _FfmpegDecoder(["-f", "s16le", "-ar", str(rate), "-ac", str(channels)])
+
+
+def run_session(config: Dict[str, Any]):
+    """Serve one live session until the client ends it or goes idle."""
+    session_id = config["session_id"]
+    key = live_audio_key(session_id)
+    redis = get_redis()
+    decoder = _decoder_for(config)
+    live = LiveTranscriber(_get_model(LIVE_MODEL, LIVE_SESSIONS), config.get("language"), config.get("task", "transcribe"))
+
+    def emit(events):
+        for kind, seg in events:
+            _publish(session_id, kind, start=round(seg.start, 3), end=round(seg.end, 3), text=seg.text)
+
+    print(f"[{session_id}] Live session started ({config.get('format', 'pcm')})")
+    _publish(session_id, "ready", model=LIVE_MODEL)
+    try:
+        cursor = "0-0"
+        last_audio = time.monotonic()
+        ended = False
+        while not ended:
+            resp = redis.xread({key: cursor}, block=LIVE_STEP_MS, count=200)
+            if not resp:
+                if time.monotonic() - last_audio > LIVE_IDLE_TIMEOUT:
+                    print(f"[{session_id}] Live session idle, closing")
+                    break
+                continue
+            last_audio = time.monotonic()
+            pcm = []
+            for entry_id, fields in resp[0][1]:
+                cursor = entry_id
+                if b"end" in fields:
+                    ended = True
+                    break
+                pcm.append(decoder.feed(fields[b"audio"]))
+            if pcm:
+                emit(live.feed(np.concatenate(pcm)))
+
+        emit(live.flush(decoder.close()))
+        fmt = config.get("output") or "srt"
+        _publish(
+            session_id, "end",
+            status="finished",
+            language=live.language,
+            duration=round(live.duration, 3),
+            output=fmt,
+            transcript=segment_store.render(live.committed, fmt),
+        )
+        print(f"[{session_id}] Live session finished ({live.duration:.1f}s audio, {len(live.committed)} segments)")
+    except Exception as e:
+        print(f"[{session_id}] Live session failed: {e}")
+        _publish(session_id, "end", status="failed", error=str(e))
+        decoder.close()
+    finally:
+        redis.delete(key)
+
+
+def serve():
+    print(f"[*] Live worker starting (LIVE_MODEL: {LIVE_MODEL}, LIVE_SESSIONS: {LIVE_SESSIONS})...")
+    started = time.monotonic()
+    _get_model(LIVE_MODEL, LIVE_SESSIONS)
+    print(f"    [+] Live model loaded in {time.monotonic() - started:.1f}s")
+    Path(WORKER_READY_FILE).touch()
+
+    slots = threading.Semaphore(LIVE_SESSIONS)
+
+    def _run(config):
+        try:
+            run_session(config)
+        finally:
+            slots.release()
+
+    redis = get_redis()
+    while True:
+        # only claim a session when a slot is free, so others can pick it up
+        slots.acquire()
+        item = redis.brpop(LIVE_SESSIONS_KEY, timeout=5)
+        if not item:
+            slots.release()
+            continue
+        threading.Thread(target=_run, args=(json.loads(item[1]),), daemon=True).start()
+
+
+async def replay(path: str, url: str, language: Optional[str], speed: float):
+    """Send a local audio file to the live endpoint at real-time speed and print what comes back."""
+    import asyncio
+    import websockets
+
+    audio = _decode_pcm(path)
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+    step = SAMPLE_RATE // 10 * 2  # 100 ms of s16le
+
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"format": "pcm", "language": language}))
+        started = time.monotonic()
+
+        async def send():
+            for i in range(0, len(pcm), step):
+                await ws.send(pcm[i:i + step])
+                # pace against the wall clock rather than sleeping a fixed 100 ms
+                due = started + (i + step) / 2 / SAMPLE_RATE / speed
+                await asyncio.sleep(max(0.0, due - time.monotonic()))
+            await ws.send(json.dumps({"event": "end"}))
+
+        sender = asyncio.ensure_future(send())
+        async for message in ws:
+            event = json.loads(message)
+            lag = time.monotonic() - started
+            if event["type"] in ("partial", "final"):
+                print(f"{lag:7.2f}s {event['type']:>7} [{event['start']:.2f}-{event['end']:.2f}] {event['text']}")
+            elif event["type"] == "end":
+                print(event.get("transcript") or event.get("error"))
+                break
+            else:
+                print(f"{lag:7.2f}s {event}")
+        sender.cancel()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        # python live.py replay sample.wav [ws://localhost:8080/v1/live] [language] [speed]
+        import asyncio
+        args = sys.argv[2:]
+        if not args:
+            print("usage: python live.py replay <file> [url] [language] [speed]")
+            sys.exit(1)
+        asyncio.run(replay(
+            args[0],
+            args[1] if len(args) > 1 else "ws://localhost:8080/v1/live",
+            args[2] if len(args) > 2 else None,
+            float(args[3]) if len(args) > 3 else 1.0,
+        ))
+    else:
+        serve()
@@ -0,0 +1,121 @@
+import os
+import glob
+from typing import Optional
+
+from prometheus_client import (
+    Counter, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST,
+    generate_latest, start_http_server, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from rq import Worker
+
+from redis_queue import get_redis, transcribe_queues
+from utils import valid_int_env
+
+# Prometheus metrics.
+# The API serves /metrics itself (queue depth). The worker manager runs an
+# exporter on METRICS_PORT for the per-job metrics and slot utilisation.
+# Worker slots, work-horses and the webhook process are separate processes:
+# with PROMETHEUS_MULTIPROC_DIR set (it has to be in the environment before
+# the worker starts) their samples are written there and summed on scrape.
+METRICS_PORT = valid_int_env("METRICS_PORT", 9100)  # 0 disables the worker exporter
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+STAGE_SECONDS = Histogram(
+    "transcribe_stage_seconds",
+    "Time spent in each pipeline stage",
+    ["stage"],  # download, decode, model_load, transcribe, diarize_wait, write_output, upload, webhook
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+AUDIO_SECONDS = Counter(
+    "transcribe_audio_seconds",
+    "Seconds of audio transcribed",
+    ["model"],
+)
+REALTIME_FACTOR = Histogram(
+    "transcribe_realtime_factor",
+    "Transcription time divided by audio duration",
+    ["model", "compute_type", "engine"],
+    buckets=(0.02, 0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 4),
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "transcribe_queue_wait_seconds",
+    "Time from enqueue until a worker starts the job",
+    ["queue", "priority"],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600),
+)
+JOBS = Counter(
+    "transcribe_jobs",
+    "Jobs ended by the workers",
+    ["status"],
+)
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage."""
+    return STAGE_SECONDS.labels(name).time()
+
+
+class QueueCollector:
+    """Queue depth per RQ queue, read from Redis on scrape (API side)."""
+
+    def collect(self):
+        depth = GaugeMetricFamily("transcribe_queue_depth", "Jobs waiting per queue", labels=["queue"])
+        pipe = get_redis().pipeline()
+        queues = transcribe_queues()
+        for q in queues:
+            pipe.llen(q.key)
+        for q, n in zip(queues, pipe.execute()):
+            depth.add_metric([q.name], n)
+        yield depth
+
+
+class SlotCollector:
+    """Busy / idle worker slots of this host, from RQ's worker registry."""
+
+    def __init__(self, host: Optional[str] = None):
+        self.host = host or os.uname().nodename
+
+    def collect(self):
+        slots = GaugeMetricFamily("transcribe_worker_slots", "Worker slots by state", labels=["host", "state"])
+        util = GaugeMetricFamily("transcribe_worker_utilisation", "Fraction of worker slots running a job", labels=["host"])
+        prefix = f"worker-{self.host}-"
+        workers = [w for w in Worker.all(connection=get_redis()) if w.name.startswith(prefix)]
+        busy = sum(1 for w in workers if w.get_state() == "busy")
+        slots.add_metric([self.host, "busy"], busy)
+        slots.add_metric([self.host, "idle"], len(workers) - busy)
+        util.add_metric([self.host], busy / len(workers) if workers else 0.0)
+        yield slots
+        yield util
+
+
+def api_metrics() -> bytes:
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead(pid: int):
+    """Multiprocess bookkeeping for an exited slot or work-horse: its live
+    gauge files are dropped. Counter and histogram files stay (their samples
+    are still summed in), so every forked work-horse leaves one behind."""
+    if MULTIPROC_DIR and pid:
+        multiprocess.mark_process_dead(pid, MULTIPROC_DIR)
+
+
+def serve_worker_exporter():
+    """Start the worker manager's /metrics exporter (in a background thread)."""
+    if not METRICS_PORT:
+        return
+    registry = CollectorRegistry()
+    if MULTIPROC_DIR:
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+        # samples of processes from a previous run would be summed in
+        for f in glob.glob(os.path.join(MULTIPROC_DIR, "*.db")):
+            os.remove(f)
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        print("[!] PROMETHEUS_MULTIPROC_DIR not set, job metrics of worker slots are not exported")
+    registry.register(SlotCollector())
+    start_http_server(METRICS_PORT, registry=registry)
+    print(f"[*] Metrics exporter listening on :{METRICS_PORT}")
@@ -1,6 +1,15 @@
 import os
+import time
+import bisect
+from datetime import datetime, timezone
+from typing import Optional, List, Tuple, Dict, Any
 from redis import Redis
+import redis.asyncio as aioredis
 from rq import Queue
+from rq.job import Job, JobStatus
+from rq.exceptions import AbandonedJobError, NoSuchJobError
+from rq.registry import StartedJobRegistry, FailedJobRegistry
+from utils import valid_int_env, valid_str_env
 
 _redis = None
 _redis_pid = None
@@ -21,5 +30,264 @@ def get_redis():
         _redis_pid = current_pid
     return _redis
 
+def get_async_redis() -> aioredis.Redis:
+    """New asyncio client for long blocking reads in the API (caller closes it)."""
+    return aioredis.Redis.from_url(
+        os.environ["REDIS_URL"],
+        decode_responses=False,
+        socket_keepalive=True,
+    )
+
+def segment_stream_key(job_id: str) -> str:
+    """Redis stream the worker appends decoded segments to while a job runs."""
+    return f"transcribe:segments:{job_id}"
+
+# Live sessions: the API pushes a session config onto LIVE_SESSIONS_KEY and
+# appends the client's audio to live_audio_key(); a live worker claims the
+# session and publishes partial/final segments to segment_stream_key(session).
+LIVE_SESSIONS_KEY = "transcribe:live:sessions"
+
+def live_audio_key(session_id: str) -> str:
+    return f"transcribe:live:audio:{session_id}"
+
+# Compact per-job status: one small hash of plain strings per job, written at
+# enqueue and on every progress update, so status reads never have to load
+# (and unpickle) the RQ job. Fields mirrored from job.meta are listed here.
+STATUS_META_FIELDS = ("progress", "message", "minio_url", "db_id", "output", "chunks", "merge_job_id", "model", "duration", "diarized", "warning")
+
+def status_key(job_id: str) -> str:
+    return f"transcribe:status:{job_id}"
+
+def queue_index_key(queue_name: str) -> str:
+    """Sorted set mirroring a queue's order: a job's position is one ZRANK."""
+    return f"transcribe:qindex:{queue_name}"
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def set_status(job_id: str, pipeline=None, **fields):
+    """Update the job's status hash; None clears a field to ""."""
+    pipe = pipeline if pipeline is not None else get_redis().pipeline()
+    key = status_key(job_id)
+    pipe.hset(key, mapping={k: "" if v is None else str(v) for k, v in fields.items()})
+    pipe.expire(key, valid_int_env("JOB_TTL_SECONDS", 86400))
+    if pipeline is None:
+        pipe.execute()
+
+class StatusJob(Job):
+    """Job whose meta updates are mirrored into its status hash."""
+
+    def save_meta(self):
+        pipe = self.connection.pipeline()
+        pipe.hset(self.key, "meta", self.serializer.dumps(self.meta))
+        set_status(self.id, pipeline=pipe, **{k: self.meta[k] for k in STATUS_META_FIELDS if k in self.meta})
+        pipe.execute()
+
+class IndexedQueue(Queue):
+    """Queue that also maintains queue_index_key(name) and the status hash.
+
+    Every path that puts a job on a queue (enqueue, enqueue_many, dependents,
+    requeue) goes through push_job_id, so hooking it keeps the index exact.
+    Scores are push times; front pushes use the negated time so the latest
+    one ranks first, like LPUSH.
+    """
+    job_class = StatusJob
+
+    def push_job_id(self, job_id: str, pipeline=None, at_front: bool = False):
+        super().push_job_id(job_id, pipeline=pipeline, at_front=at_front)
+        pipe = pipeline if pipeline is not None else self.connection.pipeline()
+        now = time.time()
+        pipe.zadd(queue_index_key(self.name), {job_id: -now if at_front else now})
+        # enqueue_many doesn't register the queue in rq:queues (enqueue does)
+        pipe.sadd(self.redis_queues_keys, self.key)
+        pipe.hsetnx(status_key(job_id), "created_at", utc_now())
+        set_status(job_id, pipeline=pipe, status="queued", queue=self.name, enqueued_at=utc_now())
+        if pipeline is None:
+            pipe.execute()
+
+    def remove(self, job_or_id, pipeline=None):
+        job_id = job_or_id.id if isinstance(job_or_id, Job) else job_or_id
+        result = super().remove(job_or_id, pipeline=pipeline)
+        (pipeline if pipeline is not None else self.connection).zrem(queue_index_key(self.name), job_id)
+        return result
+
+def prune_queue_index(queue_name: str) -> int:
+    """Drop index entries of jobs that left the queue without IndexedQueue
+    seeing it (deleted, cancelled, or skipped on dequeue once their hash
+    expired); they would push every later job's queue_position up. Returns
+    how many were dropped."""
+    redis = get_redis()
+    # one MULTI, so both are read at the same point in time
+    pipe = redis.pipeline()
+    pipe.zrange(queue_index_key(queue_name), 0, -1)
+    pipe.lrange(Queue.redis_queue_namespace_prefix + queue_name, 0, -1)
+    indexed, queued = pipe.execute()
+    stale = set(indexed) - set(queued)
+    if stale:
+        redis.zrem(queue_index_key(queue_name), *stale)
+    return len(stale)
+
+class IndexedStartedJobRegistry(StartedJobRegistry):
+    """StartedJobRegistry whose cleanup handles jobs abandoned by a dead slot
+    (heartbeat expired) the way this service needs.
+
+    RQ's own cleanup requeues through a plain Queue (no index, no status
+    hash) and, in RQ 2.0, looks jobs up by the registry member, which is
+    "<job id>:<execution id>", so it never finds them and just drops the
+    entries. Here retries go through IndexedQueue and failures go to the
+    FailedJobRegistry; returns the abandoned jobs.
+    """
+
+    def get_queue(self):
+        return IndexedQueue(self.name, connection=self.connection, serializer=self.serializer)
+
+    def cleanup(self, timestamp: Optional[float] = None, exception_handlers: Optional[list] = None) -> List[Job]:
+        score = timestamp if timestamp is not None else time.time()
+        members = self.get_expired_job_ids(score)
+        abandoned = []
+        if not members:
+            return abandoned
+        queue = self.get_queue()
+        failed = FailedJobRegistry(self.name, self.connection, job_class=self.job_class, serializer=self.serializer)
+        with self.connection.pipeline() as pipeline:
+            for job_id in dict.fromkeys(m.rsplit(":", 1)[0] for m in members):
+                try:
+                    job = self.job_class.fetch(job_id, connection=self.connection, serializer=self.serializer)
+                except NoSuchJobError:
+                    continue
+                for handler in exception_handlers or []:
+                    if handler(job, AbandonedJobError, AbandonedJobError(), None) is False:
+                        break
+                if job.retries_left:
+                    job.retry(queue, pipeline)
+                else:
+                    job.set_status(JobStatus.FAILED, pipeline=pipeline)
+                    job._exc_info = f"Moved to FailedJobRegistry, due to AbandonedJobError, at {datetime.now()}"
+                    job.save(pipeline=pipeline, include_meta=False)
+                    failed.add(job, job.failure_ttl, exc_string="AbandonedJobError", pipeline=pipeline)
+                abandoned.append(job)
+            pipeline.zremrangebyscore(self.key, 0, score)
+            pipeline.execute()
+        for job in abandoned:
+            if job.get_status(refresh=False) == JobStatus.FAILED:
+                queue.enqueue_dependents(job)
+        return abandoned
+
 def get_queue(name="transcribe"):
-    return Queue(name, connection=get_redis())
+    return IndexedQueue(name, connection=get_redis())
+
+# Queue layout: one RQ queue per (model, priority, duration class, tenant).
+#   transcribe[-<model>][:<priority>][~<class>][@<tenant>]
+# The plain model queue is the "default" priority without a tenant, so jobs
+# submitted without priority/tenant land where they always did.
+# Duration classes are optional (shortest-job-first): with DURATION_BUCKETS
+# set (ascending seconds, e.g. "300,1800") a job whose duration was probed at
+# ingest goes to class bisect(DURATION_BUCKETS, duration), and within a
+# priority workers drain shorter classes first. Jobs of unknown duration
+# have no class and rank with the longest one.
+PRIORITIES = ("high", "default", "bulk")
+QUEUE_PREFIX = "transcribe"
+DURATION_BUCKETS = sorted(int(b) for b in valid_str_env("DURATION_BUCKETS", "").split(",") if b.strip().isdigit())
+
+def duration_class(duration: Optional[float]) -> Optional[int]:
+    if not DURATION_BUCKETS or duration is None:
+        return None
+    return bisect.bisect_right(DURATION_BUCKETS, duration)
+
+def scheduled_queue_name(
+    base: str, priority: str = "default", tenant: Optional[str] = None, size_class: Optional[int] = None
+) -> str:
+    name = base
+    if priority and priority != "default":
+        name += f":{priority}"
+    if size_class is not None:
+        name += f"~{size_class}"
+    if tenant:
+        name += f"@{tenant}"
+    return name
+
+def queue_size_class(name: str) -> int:
+    """Duration class of a queue for ordering; unclassified queues rank last."""
+    name = name.split("@", 1)[0]
+    if "~" in name and name.rsplit("~", 1)[1].isdigit():
+        return int(name.rsplit("~", 1)[1])
+    return len(DURATION_BUCKETS)
+
+def parse_queue_name(name: str) -> Tuple[str, str, Optional[str]]:
+    """Inverse of scheduled_queue_name: (base, priority, tenant); see queue_size_class."""
+    tenant = None
+    if "@" in name:
+        name, tenant = name.rsplit("@", 1)
+    if "~" in name and name.rsplit("~", 1)[1].isdigit():
+        name = name.rsplit("~", 1)[0]
+    priority = "default"
+    if ":" in name and name.rsplit(":", 1)[1] in PRIORITIES:
+        name, priority = name.rsplit(":", 1)
+    return name, priority, tenant
+
+def transcribe_queues() -> List[Queue]:
+    """Every transcription queue RQ knows about (queues are created on first enqueue)."""
+    return [
+        q for q in IndexedQueue.all(connection=get_redis())
+        if parse_queue_name(q.name)[0].startswith(QUEUE_PREFIX)
+    ]
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+def job_statuses(job_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """Status hashes of many jobs (None if unknown), with queue_position.
+
+    Two pipelined round-trips however many jobs are asked for: the hashes
+    plus the queue registry, then one ZRANK per queued job and one LLEN per
+    queue. queue_position is the number of jobs workers will pick first:
+    higher priority queues (and, within a priority, shorter duration
+    classes) are drained first and the remaining queues are served
+    round-robin, so another lane with n jobs can only get min(n, own
+    position) jobs in ahead.
+    """
+    redis = get_redis()
+    pipe = redis.pipeline()
+    for job_id in job_ids:
+        pipe.hgetall(status_key(job_id))
+    pipe.smembers(Queue.redis_queues_keys)
+    *hashes, queue_keys = pipe.execute()
+
+    statuses = [
+        {"job_id": job_id, **{_decode(k): _decode(v) for k, v in h.items()}} if h else None
+        for job_id, h in zip(job_ids, hashes)
+    ]
+    queued = [st for st in statuses if st and st.get("status") == "queued" and st.get("queue")]
+    if not queued:
+        return statuses
+
+    names = [
+        name for name in (_decode(k)[len(Queue.redis_queue_namespace_prefix):] for k in queue_keys)
+        if parse_queue_name(name)[0].startswith(QUEUE_PREFIX)
+    ]
+    pipe = redis.pipeline()
+    for st in queued:
+        pipe.zrank(queue_index_key(st["queue"]), st["job_id"])
+    for name in names:
+        pipe.llen(Queue.redis_queue_namespace_prefix + name)
+    results = pipe.execute()
+    ranks, sizes = results[:len(queued)], dict(zip(names, results[len(queued):]))
+
+    def rank(name):
+        return PRIORITIES.index(parse_queue_name(name)[1]), queue_size_class(name)
+
+    for st, own in zip(queued, ranks):
+        if own is None:
+            continue
+        own_rank = rank(st["queue"])
+        ahead = own
+        for name, count in sizes.items():
+            if name == st["queue"]:
+                continue
+            other_rank = rank(name)
+            if other_rank < own_rank:
+                ahead += count
+            elif other_rank == own_rank:
+                ahead += min(count, own)
+        st["queue_position"] = ahead
+    return statuses
@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import zlib
+from typing import Dict, Any, Optional, List
+
+from redis_queue import get_redis
+from utils import valid_int_env
+from segments import SegmentBuffer
+
+# Content-addressed transcription cache.
+# Key = (sha256 of input bytes, model, language, task[, diarize]); value = the
+# decoded segments (with speaker labels for diarized jobs) so any output
+# format can be rendered from a hit without the model.
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_TTL = valid_int_env("RESULT_CACHE_TTL", 7 * 86400)
+RESULT_CACHE_MAX_ENTRIES = valid_int_env("RESULT_CACHE_MAX_ENTRIES", 10000)
+# entries bigger than this (compressed) are not cached at all
+RESULT_CACHE_MAX_ENTRY_BYTES = valid_int_env("RESULT_CACHE_MAX_ENTRY_BYTES", 8 * 1024 * 1024)
+# total compressed size of all entries; least recently used go first (0 = no limit)
+RESULT_CACHE_MAX_BYTES = valid_int_env("RESULT_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+_BATCH = 100
+
+_PREFIX = "transcribe:cache"
+_INDEX = f"{_PREFIX}:index"  # zset: key -> last used timestamp
+_SIZES = f"{_PREFIX}:sizes"  # hash: key -> compressed size
+_BYTES = f"{_PREFIX}:bytes"  # sum of _SIZES
+_HITS = f"{_PREFIX}:hits"
+_MISSES = f"{_PREFIX}:misses"
+
+
+def cache_key(digest: str, model: str, language: Optional[str], task: str, diarize: bool = False) -> str:
+    key = f"{digest}:{model}:{language or 'auto'}:{task}"
+    return f"{key}:diarize" if diarize else key
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    """Return {"language", "duration", "segments"} for a cached result or None."""
+    if not RESULT_CACHE_ENABLED:
+        return None
+    redis = get_redis()
+    raw = redis.get(f"{_PREFIX}:{key}")
+    if raw is None:
+        redis.incr(_MISSES)
+        return None
+    pipe = redis.pipeline()
+    pipe.incr(_HITS)
+    pipe.zadd(_INDEX, {key: time.time()})
+    pipe.expire(f"{_PREFIX}:{key}", RESULT_CACHE_TTL)
+    pipe.execute()
+    data = json.loads(zlib.decompress(raw))
+    segments = SegmentBuffer()
+    segments.extend(data["segments"])
+    data["segments"] = segments
+    return data
+
+
+def put(key: str, language: str, duration: float, segments: List[Any]):
+    if not RESULT_CACHE_ENABLED:
+        return
+    data = {
+        "language": language,
+        "duration": duration,
+        "segments": [
+            [float(s.start), float(s.end), s.text or ""] + ([None, s.speaker] if getattr(s, "speaker", None) else [])
+            for s in segments
+        ],
+    }
+    raw = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+    if len(raw) > RESULT_CACHE_MAX_ENTRY_BYTES:
+        print(f"[!] Result too large to cache ({len(raw)} bytes)")
+        return
+
+    redis = get_redis()
+    old = int(redis.hget(_SIZES, key) or 0)  # a replaced entry
+    pipe = redis.pipeline()
+    pipe.set(f"{_PREFIX}:{key}", raw, ex=RESULT_CACHE_TTL)
+    pipe.zadd(_INDEX, {key: time.time()})
+    pipe.hset(_SIZES, key, len(raw))
+    pipe.incrby(_BYTES, len(raw) - old)
+    pipe.execute()
+    _evict(redis)
+
+
+def _evict(redis):
+    """Walk the index from the least recently used end, dropping entries past
+    their TTL (their keys are gone already, the index is cleaned lazily) and
+    then more until the entry and byte bounds hold again."""
+    pipe = redis.pipeline()
+    pipe.zcard(_INDEX)
+    pipe.get(_BYTES)
+    count, total = pipe.execute()
+    total = int(total or 0)
+    expired_before = time.time() - RESULT_CACHE_TTL
+
+    def over() -> bool:
+        return count > RESULT_CACHE_MAX_ENTRIES or bool(RESULT_CACHE_MAX_BYTES and total > RESULT_CACHE_MAX_BYTES)
+
+    victims, freed, offset = [], 0, 0
+    done = False
+    while not done:
+        batch = redis.zrange(_INDEX, offset, offset + _BATCH - 1, withscores=True)
+        if not batch:
+            break
+        for (k, score), size in zip(batch, redis.hmget(_SIZES, [k for k, _ in batch])):
+            if score >= expired_before and not over():
+                done = True
+                break
+            victims.append(k)
+            count -= 1
+            total -= int(size or 0)
+            freed += int(size or 0)
+        offset += len(batch)
+    if victims:
+        pipe = redis.pipeline()
+        pipe.zrem(_INDEX, *victims)
+        pipe.hdel(_SIZES, *victims)
+        pipe.decrby(_BYTES, freed)
+        pipe.delete(*[f"{_PREFIX}:{k.decode() if isinstance(k, bytes) else k}" for k in victims])
+        pipe.execute()
+
+
+def stats() -> Dict[str, int]:
+    redis = get_redis()
+    pipe = redis.pipeline()
+    pipe.get(_HITS)
+    pipe.get(_MISSES)
+    pipe.zcard(_INDEX)
+    pipe.get(_BYTES)
+    hits, misses, entries, size = pipe.execute()
+    return {
+        "hits": int(hits or 0),
+        "misses": int(misses or 0),
+        "entries": entries,
+        "bytes": int(size or 0),
+    }
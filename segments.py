@@ -0,0 +1,205 @@
+import json
+from array import array
+from collections import namedtuple
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, List, Any
+
+import srt
+
+# Canonical transcript: one Whisper pass is stored as a JSON-lines segment
+# file (segments.jsonl) and every output format is rendered from it.
+Segment = namedtuple("Segment", ["start", "end", "text", "words", "speaker"], defaults=[None, None])
+
+STORE_NAME = "segments.jsonl"
+FORMATS = ("srt", "vtt", "txt", "json")
+MEDIA_TYPES = {
+    "srt": "text/plain",
+    "vtt": "text/vtt",
+    "txt": "text/plain",
+    "json": "application/json",
+}
+
+
+def _words(seg: Any):
+    words = getattr(seg, "words", None)
+    if not words:
+        return None
+    # faster-whisper Word objects, or [start, end, word] rows read back from a store
+    return [
+        list(w) if isinstance(w, (list, tuple)) else [float(w.start), float(w.end), w.word]
+        for w in words
+    ]
+
+
+def write_store(segments: Iterable[Any], path: Path):
+    """Persist segments as JSON lines: {"start", "end", "text"[, "words"][, "speaker"]}."""
+    tmp = path.with_name(path.name + ".part")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for seg in segments:
+            row = {"start": float(seg.start), "end": float(seg.end), "text": seg.text or ""}
+            words = _words(seg)
+            if words:
+                row["words"] = words
+            if getattr(seg, "speaker", None):
+                row["speaker"] = seg.speaker
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    tmp.replace(path)
+
+
+class SegmentBuffer:
+    """Compact, append-only segment list for long transcripts.
+
+    start/end live in float arrays and the texts in one UTF-8 buffer indexed
+    by offsets, instead of one faster-whisper Segment (tokens, log probs,
+    ...) per line. Word timings are only kept with words=True; speaker
+    labels only once a segment has one. Iterating yields Segment tuples, so
+    it can be passed wherever a list was.
+    """
+
+    def __init__(self, words: bool = False):
+        self.starts = array("d")
+        self.ends = array("d")
+        self._text = bytearray()
+        self._offsets = array("Q", [0])
+        self._words = {} if words else None
+        self._speakers = {}
+
+    def append(
+        self, start: float, end: float, text: Optional[str], words: Optional[list] = None, speaker: Optional[str] = None
+    ):
+        self.starts.append(float(start))
+        self.ends.append(float(end))
+        self._text += (text or "").encode("utf-8")
+        self._offsets.append(len(self._text))
+        if words and self._words is not None:
+            self._words[len(self.starts) - 1] = words
+        if speaker:
+            self._speakers[len(self.starts) - 1] = speaker
+
+    def set_speakers(self, speakers: List[Optional[str]]):
+        """Label the segments in order (see diarize.assign)."""
+        self._speakers = {i: s for i, s in enumerate(speakers) if s}
+
+    def extend(self, segments: Iterable[Any]):
+        """Append Segment-like objects or [start, end, text(, words(, speaker))] rows."""
+        for seg in segments:
+            if hasattr(seg, "start"):
+                self.append(
+                    seg.start, seg.end, seg.text,
+                    _words(seg) if self._words is not None else None, getattr(seg, "speaker", None),
+                )
+            else:
+                self.append(*seg)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i: int) -> Segment:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("segment index out of range")
+        text = self._text[self._offsets[i]:self._offsets[i + 1]].decode("utf-8")
+        words = self._words.get(i) if self._words else None
+        return Segment(self.starts[i], self.ends[i], text, words, self._speakers.get(i))
+
+    def __iter__(self) -> Iterator[Segment]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+def read_store(path: Path) -> SegmentBuffer:
+    segments = SegmentBuffer(words=True)
+    with open(path, encoding="utf-8") as f:
+        for row in map(json.loads, filter(str.strip, f)):
+            segments.append(row["start"], row["end"], row["text"], row.get("words"), row.get("speaker"))
+    return segments
+
+
+def _cues(segments: Iterable[Any], sep: str, voice: str) -> Iterator[str]:
+    """SRT-style cues, one string per segment, rendered as srt.compose does
+    (empty or zero-length segments skipped, renumbered from 1). Segments
+    are expected in time order, which is how the worker produces them.
+    A speaker label is put in front of the text with the voice template."""
+    index = 0
+    for seg in segments:
+        start, end = float(seg.start), float(seg.end)
+        content = srt.make_legal_content((seg.text or "").strip())
+        if not content.strip() or start < 0 or start >= end:
+            continue
+        speaker = getattr(seg, "speaker", None)
+        if speaker:
+            content = voice % speaker + content
+        index += 1
+        yield "%d\n%s --> %s\n%s\n\n" % (index, _timestamp(start, sep), _timestamp(end, sep), content)
+
+
+def _timestamp(seconds: float, sep: str) -> str:
+    ts = srt.timedelta_to_srt_timestamp(timedelta(seconds=seconds))
+    return ts if sep == "," else ts.replace(",", sep)
+
+
+def iter_srt(segments: Iterable[Any]) -> Iterator[str]:
+    return _cues(segments, ",", "[%s] ")
+
+
+def iter_vtt(segments: Iterable[Any]) -> Iterator[str]:
+    yield "WEBVTT\n\n"
+    # WebVTT voice span
+    yield from _cues(segments, ".", "<v %s>")
+
+
+def iter_txt(segments: Iterable[Any]) -> Iterator[str]:
+    # one line per segment; blank lines before the first / after the last text dropped
+    blank, started = 0, False
+    for seg in segments:
+        text = (seg.text or "").strip()
+        if not text:
+            blank += 1
+            continue
+        speaker = getattr(seg, "speaker", None)
+        if speaker:
+            text = f"[{speaker}] {text}"
+        if started:
+            yield "\n" * (blank + 1)
+        yield text
+        blank, started = 0, True
+    yield "\n"
+
+
+def iter_json(segments: Iterable[Any]) -> Iterator[str]:
+    yield '{"segments": ['
+    for i, seg in enumerate(segments):
+        row = {"start": float(seg.start), "end": float(seg.end), "text": (seg.text or "").strip()}
+        words = _words(seg)
+        if words:
+            row["words"] = words
+        if getattr(seg, "speaker", None):
+            row["speaker"] = seg.speaker
+        yield (", " if i else "") + json.dumps(row, ensure_ascii=False)
+    yield "]}"
+
+
+_RENDERERS = {
+    "srt": iter_srt,
+    "vtt": iter_vtt,
+    "txt": iter_txt,
+    "json": iter_json,
+}
+
+
+def _chunks(segments: Iterable[Any], fmt: str) -> Iterator[str]:
+    if fmt not in _RENDERERS:
+        raise ValueError(f"unknown output format: {fmt}")
+    return _RENDERERS[fmt](segments)
+
+
+def render(segments: Iterable[Any], fmt: str) -> str:
+    return "".join(_chunks(segments, fmt))
+
+
+def write_output(segments: Iterable[Any], fmt: str, path: Path):
+    """Stream the rendered output to path, one segment at a time."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(_chunks(segments, fmt))
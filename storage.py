@@ -0,0 +1,266 @@
+import os
+import time
+import hashlib
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from pathlib import Path
+from typing import Optional, List, Tuple, Callable
+
+import certifi
+import urllib3
+from minio import Minio
+
+from utils import valid_int_env, valid_str_env, sanitize_minio_endpoint
+import metrics
+
+# MinIO / S3 object storage for job artifacts.
+MINIO_ENDPOINT = sanitize_minio_endpoint(os.getenv("MINIO_ENDPOINT", ""))
+MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY")
+MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY")
+MINIO_BUCKET = valid_str_env("MINIO_BUCKET", "transcribe")
+MINIO_SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
+MINIO_PUBLIC_BASE_URL = os.getenv("MINIO_PUBLIC_BASE_URL")
+# setting the region skips the GetBucketLocation lookup
+MINIO_REGION = os.getenv("MINIO_REGION") or None
+# objects larger than one part go up as multipart, MINIO_PARALLEL_UPLOADS parts at a time
+MINIO_PART_SIZE = valid_int_env("MINIO_PART_SIZE", 16 * 1024 * 1024)
+MINIO_PARALLEL_UPLOADS = valid_int_env("MINIO_PARALLEL_UPLOADS", 4)
+# background upload threads per process (0 = upload inline)
+MINIO_UPLOAD_THREADS = valid_int_env("MINIO_UPLOAD_THREADS", 2)
+# which job artifacts to upload: output (requested format), segments (segments.jsonl),
+# formats (every other rendered format), input (the original input file)
+MINIO_UPLOAD_ARTIFACTS = {
+    a.strip() for a in valid_str_env("MINIO_UPLOAD_ARTIFACTS", "output").split(",") if a.strip()
+}
+# Job inputs: source_type=s3 objects and uploads the API streams to MinIO
+# (INGEST_TO_MINIO). Workers fetch them with ranged GETs of MINIO_PART_SIZE,
+# MINIO_PARALLEL_DOWNLOADS at a time, into their local scratch directory.
+MINIO_INPUT_BUCKET = valid_str_env("MINIO_INPUT_BUCKET", MINIO_BUCKET)
+MINIO_INPUT_PREFIX = valid_str_env("MINIO_INPUT_PREFIX", "inputs/")
+MINIO_PARALLEL_DOWNLOADS = valid_int_env("MINIO_PARALLEL_DOWNLOADS", 4)
+_READ_SIZE = 1024 * 1024
+_RANGE_ATTEMPTS = 3
+
+_client = None
+_client_pid = None
+_buckets_ready = set()
+_uploader = None
+_uploader_pid = None
+_pending: List[Future] = []
+
+
+def configured() -> bool:
+    return all([MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY])
+
+
+def get_client() -> Minio:
+    """One client (and connection pool) per process, like get_redis."""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        http_client = urllib3.PoolManager(
+            maxsize=max(10, MINIO_PARALLEL_UPLOADS * max(1, MINIO_UPLOAD_THREADS)),
+            timeout=urllib3.Timeout(connect=10, read=300),
+            cert_reqs="CERT_REQUIRED" if MINIO_SECURE else "CERT_NONE",
+            ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+            retries=urllib3.Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504]),
+        )
+        _client = Minio(
+            MINIO_ENDPOINT,
+            access_key=MINIO_ACCESS_KEY,
+            secret_key=MINIO_SECRET_KEY,
+            secure=MINIO_SECURE,
+            region=MINIO_REGION,
+            http_client=http_client,
+        )
+        _client_pid = os.getpid()
+    return _client
+
+
+def ensure_bucket(bucket: str = MINIO_BUCKET):
+    """Create the bucket if needed. Checked once per worker slot (forked
+    work-horses inherit the flag), not on every upload."""
+    if bucket in _buckets_ready:
+        return
+    client = get_client()
+    if not client.bucket_exists(bucket):
+        client.make_bucket(bucket)
+    _buckets_ready.add(bucket)
+
+
+def public_url(object_name: str) -> str:
+    if MINIO_PUBLIC_BASE_URL:
+        # Ensure no trailing slash in base url and join with object name
+        return f"{MINIO_PUBLIC_BASE_URL.rstrip('/')}/{object_name}"
+    protocol = "https" if MINIO_SECURE else "http"
+    return f"{protocol}://{MINIO_ENDPOINT}/{MINIO_BUCKET}/{object_name}"
+
+
+def upload(file_path: Path, object_name: str, content_type: str = "application/octet-stream") -> Optional[str]:
+    """Upload one file (multipart above MINIO_PART_SIZE); returns its URL or None."""
+    if not configured():
+        print("[!] MinIO configuration incomplete, skipping upload.")
+        return None
+    try:
+        ensure_bucket()
+        with metrics.stage("upload"):
+            get_client().fput_object(
+                MINIO_BUCKET,
+                object_name,
+                str(file_path),
+                content_type=content_type,
+                part_size=MINIO_PART_SIZE,
+                num_parallel_uploads=MINIO_PARALLEL_UPLOADS,
+            )
+        return public_url(object_name)
+    except Exception as e:
+        print(f"[!] MinIO upload failed ({object_name}): {e}")
+        return None
+
+
+class InputTooLarge(ValueError):
+    pass
+
+
+class _HashingReader:
+    """File wrapper for put_object: hashes and counts what MinIO reads."""
+
+    def __init__(self, f, max_bytes: int = 0):
+        self.f = f
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    def read(self, n: int = -1) -> bytes:
+        chunk = self.f.read(n)
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise InputTooLarge(f"input exceeds {self.max_bytes} bytes")
+        self.digest.update(chunk)
+        return chunk
+
+
+def put_stream(f, bucket: str, object_name: str, max_bytes: int = 0) -> Tuple[int, str]:
+    """Stream a file object of unknown length into bucket (multipart, one
+    MINIO_PART_SIZE part in memory at a time). Returns (size, sha256 hex)."""
+    ensure_bucket(bucket)
+    reader = _HashingReader(f, max_bytes)
+    get_client().put_object(bucket, object_name, reader, length=-1, part_size=MINIO_PART_SIZE)
+    return reader.size, reader.digest.hexdigest()
+
+
+def object_size(bucket: str, object_name: str) -> int:
+    return get_client().stat_object(bucket, object_name).size
+
+
+def object_sizes(objects: List[Tuple[str, str]]) -> List[Optional[int]]:
+    """Sizes of many (bucket, name) objects, MINIO_PARALLEL_DOWNLOADS HEADs
+    at a time; None where the object cannot be stat'ed."""
+    def size(obj: Tuple[str, str]) -> Optional[int]:
+        try:
+            return object_size(*obj)
+        except Exception:
+            return None
+    with ThreadPoolExecutor(max(1, MINIO_PARALLEL_DOWNLOADS)) as pool:
+        return list(pool.map(size, objects))
+
+
+def download(bucket: str, object_name: str, dest: Path, max_bytes: int = 0) -> str:
+    """Fetch an object into dest with parallel ranged GETs; a dropped
+    connection only retries the rest of its own range. Returns the sha256."""
+    client = get_client()
+    started = time.monotonic()
+    size = client.stat_object(bucket, object_name).size
+    if max_bytes and size > max_bytes:
+        raise InputTooLarge(f"input exceeds MAX_INPUT_BYTES ({max_bytes})")
+
+    with open(dest, "wb") as f:
+        f.truncate(size)
+    fd = os.open(dest, os.O_WRONLY)
+
+    def fetch(offset: int, length: int):
+        done = 0
+        for attempt in range(_RANGE_ATTEMPTS):
+            try:
+                resp = client.get_object(bucket, object_name, offset=offset + done, length=length - done)
+                try:
+                    for chunk in resp.stream(_READ_SIZE):
+                        os.pwrite(fd, chunk, offset + done)
+                        done += len(chunk)
+                finally:
+                    resp.close()
+                    resp.release_conn()
+            except Exception:
+                if attempt == _RANGE_ATTEMPTS - 1:
+                    raise
+            if done >= length:
+                return
+        raise IOError(f"short read of {object_name} at {offset + done}")
+
+    try:
+        ranges = [(o, min(MINIO_PART_SIZE, size - o)) for o in range(0, size, MINIO_PART_SIZE)]
+        with ThreadPoolExecutor(max(1, MINIO_PARALLEL_DOWNLOADS)) as pool:
+            list(pool.map(lambda r: fetch(*r), ranges))
+    finally:
+        os.close(fd)
+
+    # ranges arrive out of order, so hash afterwards (from the page cache)
+    digest = hashlib.sha256()
+    with open(dest, "rb") as f:
+        for chunk in iter(lambda: f.read(_READ_SIZE), b""):
+            digest.update(chunk)
+    elapsed = max(time.monotonic() - started, 1e-6)
+    print(f"    -> Downloaded {size} bytes from {bucket}/{object_name} ({size / elapsed / 1024 / 1024:.2f} MB/s)")
+    return digest.hexdigest()
+
+
+def presigned_url(bucket: str, object_name: str, expires: int = 600) -> str:
+    """Temporary GET URL, e.g. for ffprobe to read an object's header."""
+    return get_client().presigned_get_object(bucket, object_name, expires=timedelta(seconds=expires))
+
+
+def fetch_object(bucket: str, object_name: str, dest: Path) -> bool:
+    """Download a small object to dest; False if it doesn't exist (or MinIO is not set up)."""
+    if not configured():
+        return False
+    try:
+        get_client().fget_object(bucket, object_name, str(dest))
+        return True
+    except Exception as e:
+        print(f"[!] MinIO fetch failed ({object_name}): {e}")
+        return False
+
+
+def remove(bucket: str, object_name: str):
+    try:
+        get_client().remove_object(bucket, object_name)
+    except Exception as e:
+        print(f"[!] MinIO remove failed ({object_name}): {e}")
+
+
+def upload_all(files: List[Tuple[Path, str, str]]) -> List[Optional[str]]:
+    """Upload (path, object_name, content_type) entries; URLs in the same order."""
+    return [upload(path, name, ctype) for path, name, ctype in files]
+
+
+def submit(fn: Callable, *args) -> Optional[Future]:
+    """Run fn on the background upload pool so the slot can start its next job.
+
+    Returns None (after running fn inline) when MINIO_UPLOAD_THREADS is 0.
+    """
+    global _uploader, _uploader_pid, _pending
+    if MINIO_UPLOAD_THREADS <= 0:
+        fn(*args)
+        return None
+    if _uploader is None or _uploader_pid != os.getpid():
+        _uploader = ThreadPoolExecutor(MINIO_UPLOAD_THREADS, thread_name_prefix="upload")
+        _uploader_pid = os.getpid()
+        _pending = []
+    future = _uploader.submit(fn, *args)
+    _pending = [f for f in _pending if not f.done()] + [future]
+    return future
+
+
+def wait_uploads():
+    """Block until every background upload of this process has finished."""
+    if _uploader_pid == os.getpid() and _pending:
+        wait(_pending)
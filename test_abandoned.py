@@ -0,0 +1,85 @@
+import os
+import sys
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import fakeredis
+    import redis_queue
+    import worker
+    from rq import Retry
+    from rq.registry import StartedJobRegistry, FailedJobRegistry
+    print("PASS: Imported worker")
+except ImportError as e:
+    print(f"FAIL: Could not import: {e}")
+    sys.exit(1)
+
+def test_dead_slot_jobs():
+    redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis = redis
+    redis_queue._redis_pid = os.getpid()
+    q = redis_queue.get_queue("transcribe")
+    retried = q.enqueue(worker.process_job, {"job_id": "r"}, job_id="r", retry=Retry(max=1))
+    failed = q.enqueue(worker.process_job, {"job_id": "f"}, job_id="f")
+
+    # a slot takes both jobs, then dies: its heartbeats stop and the
+    # started registry entries expire
+    w = worker.SchedulingWorker([q], connection=redis)
+    w.register_birth()
+    for job_id in ("r", "f"):
+        job = w.dequeue_job_and_maintain_ttl(timeout=1)[0]
+        w.prepare_execution(job)
+        w.prepare_job_execution(job)
+    registry = StartedJobRegistry(q.name, connection=redis)
+    assert {st["status"] for st in redis_queue.job_statuses(["r", "f"])} == {"started"}
+    members = redis.zrange(registry.key, 0, -1)
+    assert len(members) == 2
+    redis.zadd(registry.key, {member: 1 for member in members})
+
+    # the next worker's maintenance pass
+    worker.SchedulingWorker([q], connection=redis).clean_registries()
+    r, f = redis_queue.job_statuses(["r", "f"])
+    assert r["status"] == "queued" and r["queue_position"] == 0, r
+    assert f["status"] == "failed" and f["error"] and f["ended_at"], f
+    assert q.get_job_ids() == ["r"]
+    assert "f" in FailedJobRegistry(q.name, connection=redis) and registry.count == 0
+    print("PASS: jobs of a dead slot read as queued (retry) or failed")
+
+def test_failed_job_removes_ingested_input():
+    import storage
+    redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis = redis
+    redis_queue._redis_pid = os.getpid()
+    q = redis_queue.get_queue("transcribe")
+    payload = {"job_id": "i", "s3_bucket": "inputs", "s3_key": "inputs/i", "s3_delete": True}
+    jobs = [
+        q.enqueue(worker.process_job, payload, job_id="i"),
+        q.enqueue(worker.process_chunk, dict(payload, index=0), job_id="i-c0000", meta={"chunk": 0}),
+        q.enqueue(worker.process_job, dict(payload, job_id="s"), job_id="s", meta={"merge_job_id": "s-merge"}),
+    ]
+    removed = []
+    remove, threads = storage.remove, storage.MINIO_UPLOAD_THREADS
+    storage.remove = lambda bucket, name: removed.append((bucket, name))
+    storage.MINIO_UPLOAD_THREADS = 0
+    try:
+        w = worker.SchedulingWorker([q], connection=redis)
+        for job in jobs:
+            w._set_final_status(job, status="failed", ended_at=redis_queue.utc_now(), error="boom")
+    finally:
+        storage.remove, storage.MINIO_UPLOAD_THREADS = remove, threads
+    # only the client job; a chunk or a split parent leaves it to the merge
+    assert removed == [("inputs", "inputs/i")], removed
+    print("PASS: a failed job removes its ingested upload from MinIO")
+
+if __name__ == "__main__":
+    try:
+        test_dead_slot_jobs()
+        test_failed_job_removes_ingested_input()
+        print("\nAll abandoned job tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
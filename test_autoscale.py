@@ -0,0 +1,79 @@
+import os
+import sys
+import tempfile
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    from utils import available_cpus, available_memory_mb
+    import worker
+    print("PASS: Imported available_cpus, worker")
+except ImportError as e:
+    print(f"FAIL: Could not import: {e}")
+    sys.exit(1)
+
+def _cgroup(files):
+    d = tempfile.mkdtemp()
+    for name, content in files.items():
+        path = os.path.join(d, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+    return d
+
+def test_available_cpus():
+    affinity = len(os.sched_getaffinity(0))
+    assert available_cpus(_cgroup({})) == affinity
+    assert available_cpus(_cgroup({"cpu.max": "max 100000"})) == affinity
+    # a 1.5 CPU quota rounds up, but never above the affinity mask
+    assert available_cpus(_cgroup({"cpu.max": "150000 100000"})) == min(affinity, 2)
+    assert available_cpus(_cgroup({"cpu/cpu.cfs_quota_us": "50000", "cpu/cpu.cfs_period_us": "100000"})) == 1
+    print("PASS: CPU count follows affinity and cgroup quota")
+
+def test_available_memory():
+    mb = 1024 * 1024
+    assert available_memory_mb(_cgroup({"memory.max": str(2048 * mb), "memory.current": str(1536 * mb)})) <= 512
+    assert available_memory_mb(_cgroup({"memory.max": "max", "memory.current": "0"})) == available_memory_mb(_cgroup({}))
+    print("PASS: memory headroom is capped by the cgroup limit")
+
+def test_scale_target():
+    saved = worker.MIN_CONCURRENCY, worker.MAX_CONCURRENCY
+    worker.MIN_CONCURRENCY, worker.MAX_CONCURRENCY = 1, 4
+    try:
+        assert worker.scale_target(busy=0, waiting=0) == 1
+        assert worker.scale_target(busy=1, waiting=2) == 3
+        assert worker.scale_target(busy=2, waiting=10) == 4
+        assert worker.scale_target(busy=2, waiting=10, memory_cap=3) == 3
+        # the floor holds even if memory is short
+        assert worker.scale_target(busy=0, waiting=5, memory_cap=0) == 1
+    finally:
+        worker.MIN_CONCURRENCY, worker.MAX_CONCURRENCY = saved
+    print("PASS: slot target follows queue depth within bounds")
+
+def test_free_slot():
+    saved = worker.MAX_CONCURRENCY
+    worker.MAX_CONCURRENCY = 3
+    try:
+        assert worker.free_slot({0: None}, {}) == 1
+        assert worker.free_slot({0: None}, {1: None}) == 2
+        # every free index still draining: no scale-up this tick
+        assert worker.free_slot({0: None}, {1: None, 2: None}) is None
+        assert worker.free_slot({0: None, 1: None, 2: None}, {}) is None
+    finally:
+        worker.MAX_CONCURRENCY = saved
+    print("PASS: scale-up skips slot indexes that are still draining")
+
+if __name__ == "__main__":
+    try:
+        test_available_cpus()
+        test_available_memory()
+        test_scale_target()
+        test_free_slot()
+        print("\nAll autoscale tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
@@ -0,0 +1,84 @@
+import os
+import sys
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import fakeredis
+    import redis_queue
+    # app registers a Prometheus collector that reads Redis on import
+    redis_queue._redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis_pid = os.getpid()
+    import app
+    import storage
+    from fake_s3 import FakeS3, serve
+    from fastapi.testclient import TestClient
+    print("PASS: Imported app")
+except ImportError as e:
+    print(f"FAIL: Could not import app: {e}")
+    sys.exit(1)
+
+def _setup():
+    redis_queue._redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis_pid = os.getpid()
+    server, storage.MINIO_ENDPOINT = serve()
+    storage.MINIO_ACCESS_KEY = "test"
+    storage.MINIO_SECRET_KEY = "testsecret"
+    storage.MINIO_REGION = "us-east-1"
+    storage._client = None
+    storage._buckets_ready.clear()
+    FakeS3.objects.clear()
+    FakeS3.calls.clear()
+    return server
+
+def test_batch_s3_validation():
+    server = _setup()
+    limit = app.MAX_INPUT_BYTES
+    app.MAX_INPUT_BYTES = 100
+    try:
+        bucket = storage.MINIO_INPUT_BUCKET
+        FakeS3.objects[(bucket, "ok.wav")] = b"x" * 10
+        FakeS3.objects[(bucket, "big.wav")] = b"x" * 200
+        r = TestClient(app.app).post("/v1/transcribe/batch", json={"jobs": [
+            {"source_type": "s3", "key": "ok.wav"},
+            {"source_type": "s3", "key": "missing.wav"},
+            {"source_type": "url", "url": "https://example.com/a.wav"},
+            {"source_type": "s3", "key": "big.wav"},
+        ]})
+        assert r.status_code == 422, r.status_code
+        errors = r.json()["detail"]["errors"]
+        assert [e["index"] for e in errors] == [1, 3], errors
+        assert errors[0]["error"] == "object tidak ditemukan di bucket"
+        assert "melebihi batas 100" in errors[1]["error"]
+        heads = sorted(c[2] for c in FakeS3.calls if c[0] == "HEAD" and c[2])
+        assert heads == ["big.wav", "missing.wav", "ok.wav"], heads
+        assert not redis_queue.get_redis().keys("rq:job:*")
+        print("PASS: batch s3 entries are HEAD-checked and rejected by index")
+    finally:
+        app.MAX_INPUT_BYTES = limit
+        server.shutdown()
+
+def test_batch_s3_unconfigured():
+    server = _setup()
+    server.shutdown()
+    storage.MINIO_ENDPOINT = ""
+    r = TestClient(app.app).post("/v1/transcribe/batch", json={"jobs": [
+        {"source_type": "url", "url": "https://example.com/a.wav"},
+        {"source_type": "s3", "key": "a.wav"},
+    ]})
+    assert r.status_code == 422, r.status_code
+    assert r.json()["detail"]["errors"] == [{"index": 1, "error": "object storage (MINIO_*) belum dikonfigurasi"}]
+    print("PASS: batch s3 entries need object storage configured")
+
+if __name__ == "__main__":
+    try:
+        test_batch_s3_validation()
+        test_batch_s3_unconfigured()
+        print("\nAll batch tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
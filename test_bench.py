@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import bench
+    print("PASS: Imported bench")
+except ImportError as e:
+    print(f"FAIL: Could not import bench: {e}")
+    sys.exit(1)
+
+def test_fixtures_are_deterministic():
+    a = bench.synth("speech", 3)
+    b = bench.synth("speech", 3)
+    noise = bench.synth("noise", 3)
+    assert len(a) == 3 * bench.SAMPLE_RATE
+    assert np.array_equal(a, b)
+    # speech bursts are well above the noise floor
+    assert np.abs(a).max() > 5 * np.abs(noise).std()
+    print("PASS: synthetic fixtures are reproducible")
+
+def _result(rtf, **config):
+    r = {"model": "small", "compute_type": "int8", "cpu_threads": 0, "concurrency": 1, "engine": "sequential"}
+    r.update(config)
+    return dict(r, rtf=rtf, jobs_per_hour=100, peak_rss_mb=500)
+
+def test_compare_flags_regressions():
+    old = {"fixtures_digest": "x", "results": [_result(0.20), _result(0.30, concurrency=2)]}
+    new = {"fixtures_digest": "x", "results": [_result(0.21), _result(0.36, concurrency=2), _result(0.5, model="base")]}
+    regressions = bench.compare(old, new, threshold=0.10)
+    assert len(regressions) == 1 and regressions[0].startswith("small/int8/0/2/sequential")
+    print("PASS: compare reports RTF regressions over the threshold only")
+
+if __name__ == "__main__":
+    try:
+        test_fixtures_are_deterministic()
+        test_compare_flags_regressions()
+        print("\nAll bench tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
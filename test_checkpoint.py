@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import fakeredis
+    import redis_queue
+    import worker
+    from segments import Segment, SegmentBuffer
+    print("PASS: Imported worker checkpoints")
+except ImportError as e:
+    print(f"FAIL: Could not import: {e}")
+    sys.exit(1)
+
+def test_checkpoint_roundtrip():
+    redis_queue._redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis_pid = os.getpid()
+    assert worker._load_checkpoint("job") is None
+
+    segments = SegmentBuffer()
+    segments.append(0.0, 1.0, " one")
+    segments.append(1.0, 2.5, " two")
+    saved = worker._save_checkpoint("job", segments, 0, "en")
+    segments.append(2.5, 4.0, " three")
+    saved = worker._save_checkpoint("job", segments, saved, "en")
+    assert saved == 3
+    # nothing new: no write
+    assert worker._save_checkpoint("job", segments, saved, "en") == 3
+    assert redis_queue._redis.llen(worker._checkpoint_key("job")) == 2
+
+    offset, language, loaded, _ = worker._load_checkpoint("job")
+    assert offset == 4.0 and language == "en"
+    assert list(loaded) == [Segment(0.0, 1.0, " one"), Segment(1.0, 2.5, " two"), Segment(2.5, 4.0, " three")]
+    print("PASS: checkpoints append only new segments and resume at the last end")
+
+def test_resume_rewinds_stream():
+    redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis = redis
+    redis_queue._redis_pid = os.getpid()
+    key = redis_queue.segment_stream_key("job")
+    segments = SegmentBuffer()
+    for start, text in ((0.0, " one"), (1.0, " two")):
+        segments.append(start, start + 1.0, text)
+        worker._publish_segment("job", segments[len(segments) - 1])
+    worker._save_checkpoint("job", segments, 0, "en")
+    # the attempt streamed one more segment after its checkpoint, then died
+    worker._publish_segment("job", Segment(2.0, 3.0, " three"))
+
+    offset, _, _, stream_id = worker._load_checkpoint("job")
+    assert worker._rewind_stream("job", stream_id, offset) == 1
+    entries = [(f[b"event"].decode(), json.loads(f.get(b"text", b"null"))) for _, f in redis.xrange(key)]
+    assert entries == [("segment", "one"), ("segment", "two"), ("reset", None)], entries
+    assert json.loads(redis.xrange(key)[-1][1][b"offset"]) == 2.0
+    # nothing past the checkpoint: no reset
+    assert worker._rewind_stream("job", redis.xrevrange(key, count=1)[0][0].decode(), offset) == 0
+    # a retry without checkpoint starts the stream over
+    assert worker._rewind_stream("job", None, 0.0) == 3
+    assert [f[b"event"] for _, f in redis.xrange(key)] == [b"reset"]
+    assert worker._rewind_stream("fresh", None, 0.0) == 0 and not redis.exists(redis_queue.segment_stream_key("fresh"))
+    print("PASS: a resumed attempt drops what was streamed past its checkpoint and sends reset")
+
+def test_only_transient_failures_retry():
+    from rq import Retry
+    from rq.job import _job_stack
+    from rq.timeouts import JobTimeoutException
+    redis_queue._redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis_pid = os.getpid()
+    q = redis_queue.get_queue("transcribe")
+
+    def run(job_id, error):
+        job = q.enqueue(worker.process_job, {"job_id": job_id}, job_id=job_id, retry=Retry(max=2))
+        _job_stack.push(job)
+        try:
+            worker._run_with_error_webhook(lambda p: (_ for _ in ()).throw(error), {"job_id": job_id})
+        except type(error):
+            pass
+        finally:
+            _job_stack.pop()
+        return job
+
+    # a decode error fails the same way every time: no retries, end event sent
+    job = run("bad", RuntimeError("ffmpeg: invalid data found"))
+    assert job.retries_left == 0
+    assert redis_queue._redis.xlen(redis_queue.segment_stream_key("bad")) == 1
+    # a timeout keeps its retries and doesn't end the stream
+    job = run("slow", JobTimeoutException("timed out"))
+    assert job.retries_left == 2
+    assert redis_queue._redis.xlen(redis_queue.segment_stream_key("slow")) == 0
+    print("PASS: only timeouts are retried, input errors fail at once")
+
+if __name__ == "__main__":
+    try:
+        test_checkpoint_roundtrip()
+        test_resume_rewinds_stream()
+        test_only_transient_failures_retry()
+        print("\nAll checkpoint tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
@@ -0,0 +1,175 @@
+import os
+import sys
+import json
+import tempfile
+from types import SimpleNamespace
+from datetime import datetime, timezone, timedelta
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import fakeredis
+    import redis_queue
+    import worker
+    print("PASS: Imported worker fan-out")
+except ImportError as e:
+    print(f"FAIL: Could not import: {e}")
+    sys.exit(1)
+
+def test_plan_chunks():
+    # cuts at the last gap before each target that is past half of it
+    assert worker._plan_chunks([4.0, 9.0, 15.0, 22.0], 30.0, 10.0) == [(0.0, 9.0), (9.0, 15.0), (15.0, 22.0), (22.0, 30.0)]
+    # no usable gap: hard cut at the target
+    assert worker._plan_chunks([2.0], 25.0, 10.0) == [(0.0, 10.0), (10.0, 20.0), (20.0, 25.0)]
+    # short audio is one chunk, the last chunk always ends at the duration
+    assert worker._plan_chunks([1.0, 2.0], 8.0, 10.0) == [(0.0, 8.0)]
+    assert worker._plan_chunks([], 10.0, 10.0) == [(0.0, 10.0)]
+    print("PASS: chunk boundaries follow silence midpoints")
+
+def _merge_setup(d, job_id, chunks):
+    os.environ["STORAGE_DIR"] = d
+    redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis = redis
+    redis_queue._redis_pid = os.getpid()
+    payload = {"job_id": job_id, "input_path": os.path.join(d, "input.bin"), "input_sha256": "abc", "output": "txt"}
+    redis_queue.get_queue("transcribe").enqueue(worker.process_job, payload, job_id=job_id)
+    for i, segments in chunks.items():
+        redis.set(worker._chunk_result_key(job_id, i), json.dumps(segments))
+    return payload
+
+def test_merge_in_chunk_order():
+    with tempfile.TemporaryDirectory() as d:
+        # chunk results arrive out of order
+        payload = _merge_setup(d, "m1", {1: [[10.0, 11.0, " two"]], 0: [[0.0, 1.0, " one"]]})
+        result = worker._merge_chunks_logic(payload, 2, 11.0, "en")
+        assert result["status"] == "finished"
+        with open(os.path.join(d, "jobs", "m1", "output.txt"), encoding="utf-8") as f:
+            assert f.read() == "one\ntwo\n"
+        assert not redis_queue._redis.exists(worker._chunk_result_key("m1", 0))
+        print("PASS: merge stitches chunks in index order")
+
+def test_merge_failed_chunk():
+    with tempfile.TemporaryDirectory() as d:
+        payload = _merge_setup(d, "m2", {0: [[0.0, 1.0, " one"]], 2: [[20.0, 21.0, " three"]]})
+        try:
+            worker._merge_chunks_logic(payload, 3, 21.0, "en")
+        except RuntimeError as e:
+            assert "chunk 1 of 3" in str(e), e
+        else:
+            raise AssertionError("merge with a failed chunk must fail")
+        assert not os.path.exists(os.path.join(d, "jobs", "m2", "output.txt"))
+        print("PASS: a failed chunk fails the merge")
+
+def test_merge_diarization_outcome():
+    import result_cache
+    enabled = result_cache.RESULT_CACHE_ENABLED
+    result_cache.RESULT_CACHE_ENABLED = True
+    key = result_cache.cache_key("abc", worker.MODEL_SIZE, None, "transcribe", True)
+    try:
+        # the parent stored turns / an empty result / null (failed) / nothing (no model)
+        cases = [
+            (json.dumps([[0.0, 5.0, "SPEAKER_00"]]), True, None),
+            (json.dumps([]), False, "no speech"),
+            (json.dumps(None), False, "failed"),
+            (None, False, "DIARIZE_MODEL"),
+        ]
+        for n, (stored, diarized, warning) in enumerate(cases):
+            with tempfile.TemporaryDirectory() as d:
+                job_id = f"md{n}"
+                payload = _merge_setup(d, job_id, {0: [[0.0, 1.0, " one"]]})
+                payload["diarize"] = True
+                if stored is not None:
+                    redis_queue._redis.set(worker._diarization_key(job_id), stored)
+                result = worker._merge_chunks_logic(payload, 1, 1.0, None)
+                assert result["diarized"] is diarized, (n, result)
+                assert result["warning"] is None if warning is None else warning in result["warning"], (n, result)
+                assert (result_cache.get(key) is not None) is diarized, n
+                st = redis_queue.job_statuses([job_id])[0]
+                assert st["diarized"] == str(diarized), (n, st)
+        print("PASS: only merges that got speaker labels are cached as diarized")
+    finally:
+        result_cache.RESULT_CACHE_ENABLED = enabled
+
+def test_job_seconds_per_client_job():
+    import estimates
+    redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis = redis
+    redis_queue._redis_pid = os.getpid()
+    w = worker.SchedulingWorker(["transcribe"], connection=redis)
+    now = datetime.now(timezone.utc)
+    # chunks and the parent that only split the audio are not client jobs
+    w._record_job_seconds(SimpleNamespace(meta={"chunk": 3}, started_at=now - timedelta(seconds=5)))
+    w._record_job_seconds(SimpleNamespace(meta={"merge_job_id": "p-merge"}, started_at=now - timedelta(seconds=5)))
+    assert estimates.snapshot()["job_seconds"] is None
+    # the merge records the parent's wall time
+    redis_queue.set_status("p", started_at=(now - timedelta(seconds=600)).isoformat())
+    w._record_job_seconds(SimpleNamespace(meta={"parent_job_id": "p"}, started_at=now - timedelta(seconds=2)))
+    assert 599 < estimates.snapshot()["job_seconds"] < 605
+    print("PASS: a fan-out counts once in the job time average, parent start to merge end")
+
+def test_jobs_counted_per_client_job():
+    import metrics
+    redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis = redis
+    redis_queue._redis_pid = os.getpid()
+    q = redis_queue.get_queue("transcribe")
+    jobs = [
+        q.enqueue(worker.process_job, {"job_id": "p"}, job_id="p", meta={"merge_job_id": "p-merge"}),
+        q.enqueue(worker.process_chunk, {"job_id": "p"}, job_id="p-c0000", meta={"chunk": 0}),
+        q.enqueue(worker.merge_chunks, {"job_id": "p"}, 1, 1.0, "en", job_id="p-merge", meta={"parent_job_id": "p"}),
+        q.enqueue(worker.process_job, {"job_id": "j"}, job_id="j"),
+    ]
+    before = metrics.REGISTRY.get_sample_value("transcribe_jobs_total", {"status": "failed"}) or 0.0
+    w = worker.SchedulingWorker([q], connection=redis)
+    for job in jobs:
+        w._set_final_status(job, status="failed", ended_at=redis_queue.utc_now(), error="boom")
+    # the fan-out counts once (its merge), plus the plain job
+    assert metrics.REGISTRY.get_sample_value("transcribe_jobs_total", {"status": "failed"}) == before + 2
+    print("PASS: transcribe_jobs_total counts client jobs, not chunks or the split")
+
+def test_fan_out_retry_rejoins_merge():
+    import numpy as np
+    redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis = redis
+    redis_queue._redis_pid = os.getpid()
+    q = redis_queue.get_queue("transcribe")
+    payload = {"job_id": "f1", "input_path": "/nonexistent", "input_sha256": "abc", "language": "en"}
+    job = q.enqueue(worker.process_job, payload, job_id="f1")
+    assert worker._existing_merge(job) is None
+    saved = worker.CHUNK_SECONDS
+    worker.CHUNK_SECONDS = 10
+    try:
+        first = worker._fan_out(job, payload, np.zeros(25 * worker.SAMPLE_RATE, dtype=np.float32))
+    finally:
+        worker.CHUNK_SECONDS = saved
+    assert first["chunks"] == 3, first
+    queued = q.get_job_ids()
+    redis.set(worker._chunk_counter_key("f1"), 2)
+
+    # a retry that crashed before its meta was saved still finds the merge
+    job.meta.pop("merge_job_id")
+    assert worker._existing_merge(job) == "f1-merge"
+    again = worker._rejoin_fan_out(job, payload, "f1-merge")
+    assert again == first, again
+    assert q.get_job_ids() == queued
+    assert redis.get(worker._chunk_counter_key("f1")) == b"2"
+    assert job.meta["merge_job_id"] == "f1-merge"
+    print("PASS: a retried parent re-attaches to its merge, chunks aren't enqueued again")
+
+if __name__ == "__main__":
+    try:
+        test_plan_chunks()
+        test_merge_in_chunk_order()
+        test_merge_failed_chunk()
+        test_merge_diarization_outcome()
+        test_job_seconds_per_client_job()
+        test_jobs_counted_per_client_job()
+        test_fan_out_retry_rejoins_merge()
+        print("\nAll chunk tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
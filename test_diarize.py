@@ -0,0 +1,120 @@
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import diarize
+    from segments import Segment
+    print("PASS: Imported diarize")
+except ImportError as e:
+    print(f"FAIL: Could not import diarize: {e}")
+    sys.exit(1)
+
+def test_fbank_frames():
+    feats = diarize.fbank(np.zeros(16000, dtype=np.float32))
+    # Kaldi framing without edge padding: 1 + (16000 - 400) // 160
+    assert feats.shape == (98, 80), feats.shape
+    assert diarize.fbank(np.zeros(100, dtype=np.float32)).shape == (0, 80)
+    print("PASS: fbank frames audio like Kaldi")
+
+def test_windows_tile_speech():
+    sr = diarize.SAMPLE_RATE
+    spans = diarize.windows([{"start": 0, "end": 5 * sr}, {"start": 6 * sr, "end": int(6.5 * sr)}], 7.0)
+    cores = [(s, e) for _, s, e in spans]
+    assert cores[0][0] == 0.0 and cores[-2][1] == 5.0
+    assert all(a[1] == b[0] for a, b in zip(cores[:-2], cores[1:-1]))
+    # a short region gets one window centered on it, within the audio
+    assert spans[-1] == (5.5, 6.0, 6.5)
+    print("PASS: window cores tile each speech region")
+
+class _Session:
+    """Stand-in embedding model: the mean fbank vector of each window."""
+    class _Input:
+        name = "feats"
+
+    def get_inputs(self):
+        return [self._Input()]
+
+    def run(self, outputs, feeds):
+        return [feeds["feats"].mean(axis=1) + np.arange(80)]
+
+def _embed_peak(seconds, starts):
+    audio = np.random.RandomState(0).randn(seconds * diarize.SAMPLE_RATE).astype(np.float32) * 0.1
+    tracemalloc.start()
+    try:
+        emb = diarize.embed(audio, starts)
+        return emb, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def test_embed_memory_flat():
+    saved = diarize._session
+    diarize._session = _Session()
+    try:
+        starts = [0.0, 1.0, 2.5, 9.0]
+        # same features as framing the whole recording at once
+        audio = np.random.RandomState(0).randn(10 * diarize.SAMPLE_RATE).astype(np.float32) * 0.1
+        feats = diarize.fbank(audio)
+        frames = int(diarize.WINDOW * 100) - 2
+        expected = []
+        for start in starts:
+            first = min(int(start * 100), len(feats) - frames)
+            window = feats[first:first + frames]
+            expected.append((window - window.mean(axis=0)).mean(axis=0) + np.arange(80))
+        expected = np.array(expected) / np.linalg.norm(expected, axis=1, keepdims=True)
+        emb, short = _embed_peak(10, starts)
+        assert np.allclose(emb, expected, atol=1e-4)
+        # 60x longer input, same windows: peak memory doesn't grow with it
+        _, long = _embed_peak(600, starts)
+        assert long < short * 1.5 + 1024 * 1024, (short, long)
+        print(f"PASS: embedding peak memory is flat in input length ({short} vs {long} bytes)")
+    finally:
+        diarize._session = saved
+
+def test_cluster_speakers():
+    rng = np.random.RandomState(0)
+    a, b = rng.randn(16), rng.randn(16)
+    emb = np.array([a + 0.1 * rng.randn(16) for _ in range(5)] + [b + 0.1 * rng.randn(16) for _ in range(5)]
+                   + [a + 0.1 * rng.randn(16) for _ in range(3)])
+    emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+    assert list(diarize.cluster(emb, 0.5)) == [0] * 5 + [1] * 5 + [0] * 3
+    assert list(diarize.cluster(emb, 0.5, max_speakers=1)) == [0] * 13
+    print("PASS: embeddings cluster into speakers in order of appearance")
+
+def test_assign():
+    turns = [(0.0, 2.0, "SPEAKER_00"), (2.0, 5.0, "SPEAKER_01"), (8.0, 9.0, "SPEAKER_00")]
+    segs = [Segment(0.0, 1.0, "a"), Segment(1.5, 4.0, "b"), Segment(5.5, 6.0, "c"), Segment(7.0, 7.8, "d")]
+    assert diarize.assign(segs, turns) == ["SPEAKER_00", "SPEAKER_01", "SPEAKER_01", "SPEAKER_00"]
+    assert diarize.assign(segs, []) == [None] * 4
+    print("PASS: segments take the speaker they overlap most")
+
+def test_failure_is_none():
+    real = diarize.diarize
+    diarize.diarize = lambda audio: 1 / 0
+    try:
+        # failed and "no speech" ([]) must stay distinguishable
+        assert diarize._run(np.zeros(16000, dtype=np.float32)) is None
+    finally:
+        diarize.diarize = real
+    print("PASS: a failed diarization yields None, not an empty turn list")
+
+if __name__ == "__main__":
+    try:
+        test_fbank_frames()
+        test_windows_tile_speech()
+        test_embed_memory_flat()
+        test_cluster_speakers()
+        test_assign()
+        test_failure_is_none()
+        print("\nAll diarize tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
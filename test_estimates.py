@@ -0,0 +1,81 @@
+import os
+import sys
+from datetime import datetime, timezone, timedelta
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import fakeredis
+    import redis_queue
+    import estimates
+    print("PASS: Imported estimates")
+except ImportError as e:
+    print(f"FAIL: Could not import estimates: {e}")
+    sys.exit(1)
+
+def _setup():
+    redis_queue._redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis_pid = os.getpid()
+
+def test_job_timeout():
+    _setup()
+    assert estimates.job_timeout(None, "small") == estimates.JOB_TIMEOUT
+    assert estimates.job_timeout(10, "small") == estimates.JOB_TIMEOUT_MIN
+    assert estimates.job_timeout(10 ** 7, "small") == estimates.JOB_TIMEOUT
+    estimates.record_rtf("small", 0.25)
+    assert estimates.rtf("small") == 0.25
+    estimates.record_rtf("small", 0.5)
+    assert abs(estimates.rtf("small") - 0.3) < 1e-9
+    expected = int(3600 * 0.3 * estimates.TIMEOUT_RTF_FACTOR)
+    if estimates.JOB_TIMEOUT_MIN <= expected <= estimates.JOB_TIMEOUT:
+        assert estimates.job_timeout(3600, "small") == expected
+    print("PASS: timeouts follow duration x RTF within the bounds")
+
+def test_estimate():
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    snap = {"rtf": {"small": 0.5}, "job_seconds": None, "slots": 2}
+    queued = {"status": "queued", "queue_position": 4, "model": "small", "duration": "600"}
+    # nothing measured yet
+    assert estimates.estimate(queued, snap, now) == (None, None)
+    snap["job_seconds"] = 100.0
+    start, finish = estimates.estimate(queued, snap, now)
+    assert start == (now + timedelta(seconds=200)).isoformat()
+    assert finish == (now + timedelta(seconds=500)).isoformat()
+
+    started = {"status": "started", "started_at": (now - timedelta(seconds=60)).isoformat(), "model": "small", "duration": "600"}
+    start, finish = estimates.estimate(started, snap, now)
+    assert finish == (now + timedelta(seconds=240)).isoformat()
+    assert estimates.estimate({"status": "finished"}, snap, now) == (None, None)
+    print("PASS: ETAs drain the queue ahead at one average job per slot")
+
+def test_duration_classes():
+    buckets = redis_queue.DURATION_BUCKETS
+    redis_queue.DURATION_BUCKETS = [300, 1800]
+    try:
+        assert redis_queue.duration_class(None) is None
+        assert redis_queue.duration_class(60) == 0
+        assert redis_queue.duration_class(600) == 1
+        assert redis_queue.duration_class(7200) == 2
+        name = redis_queue.scheduled_queue_name("transcribe", "bulk", "acme", 1)
+        assert name == "transcribe:bulk~1@acme"
+        assert redis_queue.parse_queue_name(name) == ("transcribe", "bulk", "acme")
+        assert redis_queue.queue_size_class(name) == 1
+        # unknown durations rank with the longest class
+        assert redis_queue.queue_size_class("transcribe:bulk@acme") == 2
+    finally:
+        redis_queue.DURATION_BUCKETS = buckets
+    print("PASS: queue names carry the duration class")
+
+if __name__ == "__main__":
+    try:
+        test_job_timeout()
+        test_estimate()
+        test_duration_classes()
+        print("\nAll estimates tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
@@ -0,0 +1,106 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import fakeredis
+    import redis_queue
+    import lifecycle
+    print("PASS: Imported lifecycle")
+except ImportError as e:
+    print(f"FAIL: Could not import lifecycle: {e}")
+    sys.exit(1)
+
+def _setup(d):
+    os.environ["STORAGE_DIR"] = d
+    redis_queue._redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis_pid = os.getpid()
+    return redis_queue._redis
+
+def _job(job_id, status=None):
+    base = lifecycle.job_dir(job_id)
+    base.mkdir(parents=True)
+    (base / "output.srt").write_text(job_id)
+    if status:
+        redis_queue.set_status(job_id, status=status)
+    return base
+
+def test_reap_only_expired():
+    with tempfile.TemporaryDirectory() as d:
+        _setup(d)
+        old, fresh, running = _job("old", "finished"), _job("fresh", "finished"), _job("running", "started")
+        lifecycle.track("old", ttl=-10)
+        lifecycle.track("fresh", ttl=3600)
+        lifecycle.track("running", ttl=-10)
+        assert lifecycle.reap() == 1
+        assert not old.exists() and fresh.exists() and running.exists()
+        # a running job is pushed back instead of deleted
+        score = redis_queue.get_redis().zscore(lifecycle._EXPIRY, "running")
+        assert score > lifecycle.JOB_TIMEOUT / 2, score
+        print("PASS: reaper removes expired jobs and skips running ones")
+
+def test_evict_oldest_first():
+    with tempfile.TemporaryDirectory() as d:
+        _setup(d)
+        jobs = {j: _job(j, "finished") for j in ("a", "b", "c")}
+        _job("busy", "started")
+        for ttl, j in enumerate(("busy", "a", "b", "c")):
+            lifecycle.track(j, ttl=ttl * 100)
+        # pretend the disk is full until two jobs are gone
+        usage = iter([95, 95, 85, 75, 75])
+        real = lifecycle.disk_usage_percent
+        lifecycle.disk_usage_percent = lambda path=None: next(usage)
+        try:
+            assert lifecycle.evict() == 2
+        finally:
+            lifecycle.disk_usage_percent = real
+        assert not jobs["a"].exists() and not jobs["b"].exists() and jobs["c"].exists()
+        assert lifecycle.job_dir("busy").exists()
+        print("PASS: high-water mark evicts the oldest ended jobs first")
+
+def test_node_local_index():
+    with tempfile.TemporaryDirectory() as d:
+        redis = _setup(d)
+        base = _job("scratch", "finished")
+        lifecycle.track("scratch", ttl=-10)
+        lifecycle.track_local("scratch", ttl=-10)
+        # another node's manager took the shared entry: only its own copy went
+        assert redis.zrem(lifecycle._EXPIRY, "scratch")
+        assert lifecycle.reap() == 0 and base.exists()
+        redis_queue.set_status("scratch", status="started")
+        assert lifecycle.run_once() == 0 and base.exists()
+        redis_queue.set_status("scratch", status="failed")
+        redis.zadd(lifecycle._NODE_EXPIRY, {"scratch": 0})
+        assert lifecycle.run_once() == 1
+        assert not base.exists() and redis.zcard(lifecycle._NODE_EXPIRY) == 0
+        print("PASS: a node reaps its own copy from its node index")
+
+def test_release_input():
+    with tempfile.TemporaryDirectory() as d:
+        input_path = Path(d) / "input.bin"
+        input_path.write_bytes(b"x")
+        lifecycle.AUTO_DELETE_LOCAL = False
+        lifecycle.release_input({"input_path": str(input_path)})
+        assert input_path.exists()
+        lifecycle.AUTO_DELETE_LOCAL = True
+        lifecycle.release_input({"input_path": str(input_path)})
+        assert not input_path.exists()
+        print("PASS: AUTO_DELETE_LOCAL removes the input")
+
+if __name__ == "__main__":
+    try:
+        test_reap_only_expired()
+        test_evict_oldest_first()
+        test_node_local_index()
+        test_release_input()
+        print("\nAll lifecycle tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
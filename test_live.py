@@ -0,0 +1,87 @@
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import live
+    print("PASS: Imported live")
+except ImportError as e:
+    print(f"FAIL: Could not import live: {e}")
+    sys.exit(1)
+
+SR = live.SAMPLE_RATE
+Seg = namedtuple("Seg", ["start", "end", "text"])
+Info = namedtuple("Info", ["language"])
+
+class FakeModel:
+    """One segment per second of signal; the text is taken from the amplitude."""
+    def transcribe(self, audio, **kwargs):
+        segs = []
+        for i in range(len(audio) // SR):
+            level = int(round(float(audio[i * SR]) * 100))
+            if level:
+                segs.append(Seg(float(i), float(i + 1), f" w{level}"))
+        return iter(segs), Info("en")
+
+def fake_vad(audio, options=None):
+    loud = np.nonzero(np.abs(audio) > 0.005)[0]
+    return [{"start": int(loud[0]), "end": int(loud[-1]) + 1}] if len(loud) else []
+
+def _tone(level, seconds=1):
+    return np.full(SR * seconds, level, dtype=np.float32)
+
+def test_partial_then_final():
+    live.get_speech_timestamps = fake_vad
+    t = live.LiveTranscriber(FakeModel())
+    events = []
+    for level in (0.01, 0.02, 0.03):
+        events += t.feed(_tone(level))
+    kinds = [(k, s.text) for k, s in events]
+    # a segment becomes final only after two decodes agree on it
+    assert ("partial", "w1") in kinds
+    assert ("final", "w1") in kinds
+    assert ("final", "w3") not in kinds
+    assert t.language == "en"
+    print("PASS: local agreement commits stable segments")
+
+    events = t.feed(np.zeros(SR, dtype=np.float32))
+    assert [k for k, _ in events] == ["final"] * len(events) and events
+    assert [s.text for s in t.committed] == ["w1", "w2", "w3"]
+    # committed audio is cut from the rolling buffer, timestamps stay absolute
+    assert len(t.buffer) < SR and t.committed[-1].start == 2.0
+    print("PASS: trailing silence closes the utterance")
+
+def test_flush():
+    live.get_speech_timestamps = fake_vad
+    t = live.LiveTranscriber(FakeModel(), language="id")
+    t.feed(_tone(0.05, 2)[: SR // 2])
+    events = t.flush(_tone(0.05, 1)[: SR])
+    assert [(k, s.text) for k, s in events] == [("final", "w5")]
+    assert t.language == "id"
+    print("PASS: flush commits the rest of the buffer")
+
+def test_pcm_decoder():
+    d = live._PcmDecoder()
+    pcm = np.array([0, 16384, -16384], dtype=np.int16).tobytes()
+    first = d.feed(pcm[:3])
+    rest = d.feed(pcm[3:])
+    assert np.allclose(np.concatenate([first, rest]), [0.0, 0.5, -0.5])
+    print("PASS: pcm decoder keeps split samples")
+
+if __name__ == "__main__":
+    try:
+        test_partial_then_final()
+        test_flush()
+        test_pcm_decoder()
+        print("\nAll live tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import tempfile
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import metrics
+    print("PASS: Imported metrics")
+except ImportError as e:
+    print(f"FAIL: Could not import metrics: {e}")
+    sys.exit(1)
+
+def _sample(name, **labels):
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_stage_timer():
+    before = _sample("transcribe_stage_seconds_count", stage="decode")
+    with metrics.stage("decode"):
+        time.sleep(0.01)
+    assert _sample("transcribe_stage_seconds_count", stage="decode") == before + 1
+    assert _sample("transcribe_stage_seconds_sum", stage="decode") >= 0.01
+    print("PASS: stage() records one observation per block")
+
+def test_rtf_buckets():
+    labels = {"model": "small", "compute_type": "int8", "engine": "sequential"}
+    metrics.REALTIME_FACTOR.labels(**labels).observe(0.12)
+    assert _sample("transcribe_realtime_factor_bucket", le="0.1", **labels) == 0
+    assert _sample("transcribe_realtime_factor_bucket", le="0.15", **labels) == 1
+    print("PASS: realtime factor is bucketed below 1.0")
+
+def test_mark_process_dead():
+    saved = metrics.MULTIPROC_DIR
+    try:
+        with tempfile.TemporaryDirectory() as d:
+            metrics.MULTIPROC_DIR = d
+            for name in ("gauge_livesum_4242.db", "counter_4242.db", "histogram_4242.db", "gauge_livesum_7.db"):
+                open(os.path.join(d, name), "w").close()
+            metrics.mark_process_dead(4242)
+            assert sorted(os.listdir(d)) == ["counter_4242.db", "gauge_livesum_7.db", "histogram_4242.db"]
+            metrics.mark_process_dead(0)  # no horse
+        metrics.MULTIPROC_DIR = None
+        metrics.mark_process_dead(4242)
+        print("PASS: a dead process only loses its live gauge files")
+    finally:
+        metrics.MULTIPROC_DIR = saved
+
+if __name__ == "__main__":
+    try:
+        test_stage_timer()
+        test_rtf_buckets()
+        test_mark_process_dead()
+        print("\nAll metrics tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
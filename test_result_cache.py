@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import json
+import tempfile
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import fakeredis
+    import redis_queue
+    import result_cache
+    from segments import SegmentBuffer
+    print("PASS: Imported result_cache")
+except ImportError as e:
+    print(f"FAIL: Could not import result_cache: {e}")
+    sys.exit(1)
+
+def _setup():
+    redis_queue._redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis_pid = os.getpid()
+    result_cache.RESULT_CACHE_ENABLED = True
+    return redis_queue._redis
+
+def _segments(text=" hello", n=1):
+    segments = SegmentBuffer()
+    for i in range(n):
+        segments.append(float(i), float(i) + 1.0, text)
+    return segments
+
+def test_key():
+    plain = result_cache.cache_key("abc", "small", None, "transcribe")
+    assert plain == "abc:small:auto:transcribe"
+    assert result_cache.cache_key("abc", "small", None, "transcribe", True) == plain + ":diarize"
+    assert result_cache.cache_key("abc", "small", "id", "transcribe") != plain
+    print("PASS: cache key separates language and diarized results")
+
+def test_hit_and_miss():
+    _setup()
+    key = result_cache.cache_key("abc", "small", None, "transcribe")
+    assert result_cache.get(key) is None
+    result_cache.put(key, "en", 2.0, _segments(n=2))
+    hit = result_cache.get(key)
+    assert hit["language"] == "en" and hit["duration"] == 2.0
+    assert [s.text for s in hit["segments"]] == [" hello", " hello"]
+    # a diarized request doesn't hit the plain result
+    assert result_cache.get(result_cache.cache_key("abc", "small", None, "transcribe", True)) is None
+    stats = result_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1), stats
+    assert stats["bytes"] > 0
+    print("PASS: hits and misses are counted")
+
+def test_ttl():
+    redis = _setup()
+    result_cache.put("k", "en", 1.0, _segments())
+    ttl = redis.ttl(f"{result_cache._PREFIX}:k")
+    assert 0 < ttl <= result_cache.RESULT_CACHE_TTL
+    # an index entry older than the TTL is dropped by the next put
+    redis.zadd(result_cache._INDEX, {"k": time.time() - result_cache.RESULT_CACHE_TTL - 1})
+    result_cache.put("k2", "en", 1.0, _segments())
+    assert redis.zscore(result_cache._INDEX, "k") is None
+    assert result_cache.stats()["entries"] == 1
+    print("PASS: entries expire after RESULT_CACHE_TTL")
+
+def test_entry_too_large():
+    _setup()
+    limit = result_cache.RESULT_CACHE_MAX_ENTRY_BYTES
+    result_cache.RESULT_CACHE_MAX_ENTRY_BYTES = 10
+    try:
+        result_cache.put("big", "en", 1.0, _segments())
+    finally:
+        result_cache.RESULT_CACHE_MAX_ENTRY_BYTES = limit
+    assert result_cache.get("big") is None
+    assert result_cache.stats()["bytes"] == 0
+    print("PASS: entries over RESULT_CACHE_MAX_ENTRY_BYTES are not cached")
+
+def test_eviction():
+    redis = _setup()
+    entries, budget = result_cache.RESULT_CACHE_MAX_ENTRIES, result_cache.RESULT_CACHE_MAX_BYTES
+    try:
+        result_cache.RESULT_CACHE_MAX_ENTRIES = 3
+        for k in "abcd":
+            result_cache.put(k, "en", 1.0, _segments())
+        assert result_cache.get("a") is None and result_cache.get("d") is not None
+        assert result_cache.stats()["entries"] == 3
+
+        # the byte budget: fits two of these entries, b was used last
+        redis.flushall()
+        result_cache.RESULT_CACHE_MAX_ENTRIES = 100
+        text = " " + os.urandom(3000).hex()
+        result_cache.put("a", "en", 1.0, _segments(text))
+        size = result_cache.stats()["bytes"]
+        result_cache.RESULT_CACHE_MAX_BYTES = size * 2 + size // 2
+        result_cache.put("b", "en", 1.0, _segments(text))
+        result_cache.get("a")
+        result_cache.put("c", "en", 1.0, _segments(text))
+        assert result_cache.get("b") is None
+        assert result_cache.get("a") is not None and result_cache.get("c") is not None
+        stats = result_cache.stats()
+        assert stats["entries"] == 2 and stats["bytes"] <= result_cache.RESULT_CACHE_MAX_BYTES, stats
+        # replacing an entry doesn't count it twice
+        result_cache.put("c", "en", 1.0, _segments(text))
+        assert result_cache.stats()["bytes"] == stats["bytes"]
+        print("PASS: least recently used entries go first, by count and by bytes")
+    finally:
+        result_cache.RESULT_CACHE_MAX_ENTRIES, result_cache.RESULT_CACHE_MAX_BYTES = entries, budget
+
+def test_worker_hit_skips_model():
+    import worker
+    from rq.job import _job_stack
+    redis = _setup()
+    real = worker._get_model
+    worker._get_model = lambda *a, **k: (_ for _ in ()).throw(AssertionError("model loaded on a cache hit"))
+    try:
+        with tempfile.TemporaryDirectory() as d:
+            os.environ["STORAGE_DIR"] = d
+            payload = {"job_id": "hit", "input_path": os.path.join(d, "input.bin"), "input_sha256": "abc", "output": "txt"}
+            open(payload["input_path"], "wb").close()
+            key = result_cache.cache_key("abc", worker.MODEL_SIZE, None, "transcribe")
+            result_cache.put(key, "en", 2.0, _segments(n=2))
+            job = redis_queue.get_queue("transcribe").enqueue(worker.process_job, payload, job_id="hit")
+            _job_stack.push(job)
+            try:
+                result = worker._execute_job_logic(payload)
+            finally:
+                _job_stack.pop()
+            assert result["cache_hit"] and result["language"] == "en"
+            with open(os.path.join(d, "jobs", "hit", "output.txt"), encoding="utf-8") as f:
+                assert f.read() == "hello\nhello\n"
+            events = [f[b"event"] for _, f in redis.xrange(redis_queue.segment_stream_key("hit"))]
+            assert events == [b"segment", b"segment", b"end"], events
+            assert json.loads(redis.xrange(redis_queue.segment_stream_key("hit"))[1][1][b"start"]) == 1.0
+        print("PASS: a cache hit writes the output and streams segments without the model")
+    finally:
+        worker._get_model = real
+
+if __name__ == "__main__":
+    try:
+        test_key()
+        test_hit_and_miss()
+        test_ttl()
+        test_entry_too_large()
+        test_eviction()
+        test_worker_hit_skips_model()
+        print("\nAll result cache tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
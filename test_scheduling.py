@@ -0,0 +1,162 @@
+import os
+import sys
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import fakeredis
+    import redis_queue
+    import worker
+    from redis_queue import IndexedQueue, job_statuses
+    print("PASS: Imported scheduling")
+except ImportError as e:
+    print(f"FAIL: Could not import: {e}")
+    sys.exit(1)
+
+_BUCKETS = redis_queue.DURATION_BUCKETS
+
+def _setup():
+    redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis = redis
+    redis_queue._redis_pid = os.getpid()
+    redis_queue.DURATION_BUCKETS = [300, 1800]
+    return redis
+
+def teardown_function(function):
+    redis_queue.DURATION_BUCKETS = _BUCKETS
+
+def _enqueue(name, n):
+    q = redis_queue.get_queue(name)
+    return [q.enqueue(worker.process_job, {"job_id": f"{name}-{i}"}, job_id=f"{name.replace('@', '_')}-{i}").id for i in range(n)]
+
+NAMES = ["transcribe:bulk~0", "transcribe@b", "transcribe", "transcribe~0@a", "transcribe:high", "transcribe@a", "transcribe~0"]
+
+def test_ordered_queues():
+    redis = _setup()
+    w = worker.SchedulingWorker([IndexedQueue(n, connection=redis) for n in NAMES], connection=redis)
+    # priority, then duration class (no class = longest), then tenant round-robin
+    assert [q.name for q in w._ordered_queues] == [
+        "transcribe:high", "transcribe~0", "transcribe~0@a", "transcribe", "transcribe@a", "transcribe@b", "transcribe:bulk~0",
+    ]
+    # after serving tenant a, b goes first and a last within each rank
+    w.reorder_queues(IndexedQueue("transcribe@a", connection=redis))
+    assert [q.name for q in w._ordered_queues] == [
+        "transcribe:high", "transcribe~0", "transcribe~0@a", "transcribe@b", "transcribe", "transcribe@a", "transcribe:bulk~0",
+    ]
+    print("PASS: workers order queues by priority, duration class and tenant")
+
+def test_queue_position():
+    _setup()
+    high = _enqueue("transcribe:high", 1)
+    short = _enqueue("transcribe~0", 1)
+    default = _enqueue("transcribe", 3)
+    tenant = _enqueue("transcribe@a", 2)
+    bulk = _enqueue("transcribe:bulk", 1)
+    ids = high + short + default + tenant + bulk
+    positions = {st["job_id"]: st["queue_position"] for st in job_statuses(ids)}
+    assert positions[high[0]] == 0
+    assert positions[short[0]] == 1
+    # round-robin with the tenant lane: it can only get min(n, own) jobs in ahead
+    assert [positions[j] for j in default] == [2, 4, 6]
+    assert [positions[j] for j in tenant] == [2, 4]
+    assert positions[bulk[0]] == 7
+    assert job_statuses(["missing"]) == [None]
+    print("PASS: queue_position follows the worker order")
+
+def test_stale_index_pruned():
+    redis = _setup()
+    ids = _enqueue("transcribe", 4)
+    q = redis_queue.get_queue("transcribe")
+    # removed behind IndexedQueue's back: a cancel and an expired job hash
+    q.fetch_job(ids[0]).cancel()
+    redis.lrem(q.key, 0, ids[1])
+    worker.SchedulingWorker([q], connection=redis).clean_registries()
+    assert redis.zcard(redis_queue.queue_index_key("transcribe")) == 2
+    assert [st["queue_position"] for st in job_statuses(ids[2:])] == [0, 1]
+    print("PASS: index entries of jobs gone from the queue are pruned")
+
+def test_prefetch_follows_worker_order():
+    redis = _setup()
+    bulk = _enqueue("transcribe:bulk", 2)
+    default = _enqueue("transcribe", 2)
+    high = _enqueue("transcribe:high", 1)
+    w = worker.SchedulingWorker([IndexedQueue(n, connection=redis) for n in ("transcribe:bulk", "transcribe", "transcribe:high")], connection=redis)
+    names = [q.name for q in w._ordered_queues]
+    # the job being run is skipped; only as many as there are slots (+1) are looked at
+    expected = (high + default)[1:worker.MAX_CONCURRENCY + 2]
+    assert worker.prefetch_candidates(names, high[0]) == expected, worker.prefetch_candidates(names, high[0])
+    assert bulk[0] not in worker.prefetch_candidates(names, high[0])
+    print("PASS: prefetch looks at the jobs the worker dequeues next")
+
+class _Model:
+    """Stand-in WhisperModel: records loads instead of reading weights."""
+    loads = []
+
+    def __init__(self, name, **kwargs):
+        self.name = name
+        self.loads.append(name)
+
+def _models(budget):
+    worker._models.clear()
+    _Model.loads = []
+    worker.WhisperModel = _Model
+    worker.MODEL_MEMORY_BUDGET_MB = budget
+
+def test_model_lru():
+    real, budget = worker.WhisperModel, worker.MODEL_MEMORY_BUDGET_MB
+    try:
+        # budget 0: only the model in use stays loaded
+        _models(0)
+        worker._get_model("tiny")
+        worker._get_model("base")
+        assert worker.resident_models() == ["base"]
+
+        # room for small + base: loading tiny evicts the least recently used
+        _models(worker._estimate_model_mb("small") + worker._estimate_model_mb("base"))
+        worker._get_model("small")
+        worker._get_model("base")
+        assert worker._get_model("small").name == "small"  # a hit, now most recent
+        worker._get_model("tiny")
+        assert worker.resident_models() == ["tiny", "small"]
+        assert _Model.loads == ["small", "base", "tiny"]
+        print("PASS: models are evicted least recently used first within the budget")
+    finally:
+        worker.WhisperModel, worker.MODEL_MEMORY_BUDGET_MB = real, budget
+        worker._models.clear()
+
+def test_resident_model_first():
+    redis = _setup()
+    real, budget = worker.WhisperModel, worker.MODEL_MEMORY_BUDGET_MB
+    try:
+        _models(10 ** 6)
+        names = [worker.model_queue_name(m) for m in ("tiny", "base", "small")]
+        w = worker.SchedulingWorker([IndexedQueue(n, connection=redis) for n in names], connection=redis)
+        assert [q.name for q in w._ordered_queues] == names  # nothing loaded: as given
+        worker._get_model("small")
+        worker._get_model("base")
+        # most recently used model first, models not loaded last
+        assert [q.name for q in w._ordered_queues] == [names[1], names[2], names[0]]
+        # priority still wins over a loaded model
+        w.queues.append(IndexedQueue("transcribe-tiny:high", connection=redis))
+        assert w._ordered_queues[0].name == "transcribe-tiny:high"
+        print("PASS: workers prefer queues of models they have loaded")
+    finally:
+        worker.WhisperModel, worker.MODEL_MEMORY_BUDGET_MB = real, budget
+        worker._models.clear()
+
+if __name__ == "__main__":
+    try:
+        test_ordered_queues()
+        test_queue_position()
+        test_stale_index_pruned()
+        test_prefetch_follows_worker_order()
+        test_model_lru()
+        test_resident_model_first()
+        print("\nAll scheduling tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
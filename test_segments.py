@@ -0,0 +1,93 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    from segments import Segment, SegmentBuffer, write_store, read_store, write_output, render
+    print("PASS: Imported segments")
+except ImportError as e:
+    print(f"FAIL: Could not import segments: {e}")
+    sys.exit(1)
+
+SEGMENTS = [
+    Segment(0.0, 1.5, " hello"),
+    Segment(1.5, 3.25, " world", [[1.5, 2.0, " wor"], [2.0, 3.25, "ld"]]),
+]
+
+def test_store_roundtrip():
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "segments.jsonl"
+        write_store(SEGMENTS, path)
+        loaded = read_store(path)
+    assert list(loaded) == SEGMENTS
+    print("PASS: segment store roundtrip")
+
+def test_segment_buffer():
+    buf = SegmentBuffer()
+    buf.extend(SEGMENTS)
+    buf.append(3.25, 4.0, " ünïcode")
+    assert len(buf) == 3
+    assert buf[-1] == Segment(3.25, 4.0, " ünïcode")
+    # word timings are dropped unless asked for
+    assert buf[1].words is None
+    kept = SegmentBuffer(words=True)
+    kept.extend(SEGMENTS)
+    assert list(kept) == SEGMENTS
+    print("PASS: columnar segment buffer")
+
+def test_render_formats():
+    srt_text = render(SEGMENTS, "srt")
+    assert "00:00:01,500 --> 00:00:03,250\nworld" in srt_text
+    print("PASS: render srt")
+
+    vtt_text = render(SEGMENTS, "vtt")
+    assert vtt_text.startswith("WEBVTT\n\n")
+    assert "00:00:01.500 --> 00:00:03.250" in vtt_text
+    print("PASS: render vtt")
+
+    assert render(SEGMENTS, "txt") == "hello\nworld\n"
+    print("PASS: render txt")
+
+    assert '"words": [[1.5, 2.0, " wor"]' in render(SEGMENTS, "json")
+    print("PASS: render json")
+
+    # streamed to disk, same bytes as the rendered string
+    with tempfile.TemporaryDirectory() as d:
+        for fmt in ("srt", "vtt", "txt", "json"):
+            path = Path(d) / f"output.{fmt}"
+            write_output(SEGMENTS, fmt, path)
+            assert path.read_text(encoding="utf-8") == render(SEGMENTS, fmt)
+    print("PASS: write_output streams every format")
+
+def test_speakers():
+    buf = SegmentBuffer()
+    buf.extend(SEGMENTS)
+    buf.set_speakers(["SPEAKER_00", None])
+    assert buf[0].speaker == "SPEAKER_00" and buf[1].speaker is None
+    assert "\n[SPEAKER_00] hello\n" in render(buf, "srt")
+    assert "\n<v SPEAKER_00>hello\n" in render(buf, "vtt")
+    assert render(buf, "txt") == "[SPEAKER_00] hello\nworld\n"
+    assert '"speaker": "SPEAKER_00"' in render(buf, "json")
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "segments.jsonl"
+        write_store(buf, path)
+        assert [seg.speaker for seg in read_store(path)] == ["SPEAKER_00", None]
+    print("PASS: speaker labels are stored and rendered")
+
+if __name__ == "__main__":
+    try:
+        test_store_roundtrip()
+        test_segment_buffer()
+        test_render_formats()
+        test_speakers()
+        print("\nAll segment tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
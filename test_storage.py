@@ -0,0 +1,137 @@
+import io
+import os
+import sys
+import hashlib
+import tempfile
+from pathlib import Path
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import storage
+    from fake_s3 import FakeS3, serve
+    print("PASS: Imported storage")
+except ImportError as e:
+    print(f"FAIL: Could not import storage: {e}")
+    sys.exit(1)
+
+def _serve():
+    server, storage.MINIO_ENDPOINT = serve()
+    storage.MINIO_ACCESS_KEY = "test"
+    storage.MINIO_SECRET_KEY = "testsecret"
+    storage.MINIO_REGION = "us-east-1"
+    storage._client = None
+    storage._buckets_ready.clear()
+    return server
+
+def test_bucket_checked_once():
+    server = _serve()
+    try:
+        with tempfile.TemporaryDirectory() as d:
+            for i in range(3):
+                path = Path(d) / f"out{i}.srt"
+                path.write_text(f"job {i}")
+                url = storage.upload(path, f"job{i}.srt", "text/plain")
+                assert url == f"http://{storage.MINIO_ENDPOINT}/{storage.MINIO_BUCKET}/job{i}.srt"
+        assert FakeS3.objects[(storage.MINIO_BUCKET, "job2.srt")] == b"job 2"
+        heads = [c for c in FakeS3.calls if c[0] == "HEAD"]
+        assert len(heads) == 1, heads
+        assert storage.get_client() is storage.get_client()
+        print("PASS: one pooled client, bucket checked once for three uploads")
+    finally:
+        server.shutdown()
+
+def test_parallel_multipart():
+    server = _serve()
+    storage.MINIO_PART_SIZE = 5 * 1024 * 1024  # S3 minimum
+    try:
+        with tempfile.TemporaryDirectory() as d:
+            path = Path(d) / "segments.jsonl"
+            data = os.urandom(storage.MINIO_PART_SIZE * 2 + 1234)
+            path.write_bytes(data)
+            assert storage.upload(path, "big.segments.jsonl")
+        assert FakeS3.objects[(storage.MINIO_BUCKET, "big.segments.jsonl")] == data
+        part_puts = [c for c in FakeS3.calls if c[0] == "PUT" and "partNumber" in c[3]]
+        assert len(part_puts) == 3, part_puts
+        print("PASS: large artifacts go up as multipart")
+    finally:
+        server.shutdown()
+
+def test_background_uploads():
+    server = _serve()
+    try:
+        with tempfile.TemporaryDirectory() as d:
+            done = []
+            files = []
+            for i in range(4):
+                path = Path(d) / f"f{i}.txt"
+                path.write_text(str(i))
+                files.append((path, f"bg{i}.txt", "text/plain"))
+            storage.submit(lambda: done.append(storage.upload_all(files)))
+            storage.wait_uploads()
+            assert len(done) == 1 and all(done[0])
+        assert all((storage.MINIO_BUCKET, f"bg{i}.txt") in FakeS3.objects for i in range(4))
+        print("PASS: background uploads finish before wait_uploads returns")
+    finally:
+        server.shutdown()
+
+def test_ranged_download():
+    server = _serve()
+    storage.MINIO_PART_SIZE = 5 * 1024 * 1024
+    try:
+        data = os.urandom(storage.MINIO_PART_SIZE * 2 + 77)
+        FakeS3.objects[("inputs", "a/b.mp3")] = data
+        with tempfile.TemporaryDirectory() as d:
+            dest = Path(d) / "input.bin"
+            digest = storage.download("inputs", "a/b.mp3", dest)
+            assert dest.read_bytes() == data
+            assert digest == hashlib.sha256(data).hexdigest()
+            try:
+                storage.download("inputs", "a/b.mp3", dest, max_bytes=1024)
+                assert False, "size limit not enforced"
+            except storage.InputTooLarge:
+                pass
+        gets = [c for c in FakeS3.calls if c[0] == "GET" and c[2] == "a/b.mp3"]
+        assert len(gets) == 3, gets
+        print("PASS: inputs are fetched as parallel ranged GETs")
+    finally:
+        server.shutdown()
+
+def test_put_stream():
+    server = _serve()
+    try:
+        data = b"x" * 300000
+        size, digest = storage.put_stream(io.BytesIO(data), "inputs", "job1")
+        assert size == len(data) and digest == hashlib.sha256(data).hexdigest()
+        assert FakeS3.objects[("inputs", "job1")] == data
+        try:
+            storage.put_stream(io.BytesIO(data), "inputs", "job2", max_bytes=1000)
+            assert False, "size limit not enforced"
+        except storage.InputTooLarge:
+            pass
+        print("PASS: streamed uploads are hashed and size-checked")
+    finally:
+        server.shutdown()
+
+def test_unconfigured():
+    storage.MINIO_ENDPOINT = ""
+    assert not storage.configured()
+    assert storage.upload(Path("missing"), "x.srt") is None
+    print("PASS: upload is skipped without MinIO config")
+
+if __name__ == "__main__":
+    try:
+        test_bucket_checked_once()
+        test_parallel_multipart()
+        test_background_uploads()
+        test_ranged_download()
+        test_put_stream()
+        test_unconfigured()
+        print("\nAll storage tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
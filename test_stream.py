@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import fakeredis
+    import redis_queue
+    # app registers a Prometheus collector that reads Redis on import
+    redis_queue._redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis_pid = os.getpid()
+    import app
+    from fastapi.testclient import TestClient
+    print("PASS: Imported app")
+except ImportError as e:
+    print(f"FAIL: Could not import app: {e}")
+    sys.exit(1)
+
+def _setup():
+    server = fakeredis.FakeServer()
+    redis_queue._redis = fakeredis.FakeRedis(server=server)
+    redis_queue._redis_pid = os.getpid()
+    app.get_async_redis = lambda: fakeredis.FakeAsyncRedis(server=server)
+    app.STREAM_BLOCK_MS = 50
+    return redis_queue._redis
+
+def _events(client, job_id, headers=None):
+    events = []
+    with client.stream("GET", f"/v1/jobs/{job_id}/stream", headers=headers or {}) as r:
+        assert r.status_code == 200, r.status_code
+        for block in r.iter_text():
+            for chunk in filter(None, block.split("\n\n")):
+                fields = dict(line.split(": ", 1) for line in chunk.split("\n") if not line.startswith(":"))
+                if fields:
+                    events.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+    return events
+
+def _publish(redis, job_id, event, **fields):
+    data = {"event": event, **{k: json.dumps(v) for k, v in fields.items()}}
+    return redis.xadd(redis_queue.segment_stream_key(job_id), data).decode()
+
+def test_replay_and_end():
+    redis = _setup()
+    redis_queue.set_status("s1", status="started")
+    first = _publish(redis, "s1", "segment", start=0.0, end=1.0, text="one")
+    _publish(redis, "s1", "segment", start=1.0, end=2.0, text="two")
+    _publish(redis, "s1", "end", status="finished")
+    client = TestClient(app.app)
+
+    events = _events(client, "s1")
+    assert [e[1] for e in events] == ["segment", "segment", "end"]
+    assert events[0][0] == first
+    # the stream closes after the end event
+    resumed = _events(client, "s1", {"Last-Event-ID": first})
+    assert [(e[1], e[2].get("text")) for e in resumed] == [("segment", "two"), ("end", None)]
+    assert client.get("/v1/jobs/missing/stream").status_code == 404
+    print("PASS: SSE replays from Last-Event-ID and ends on the end event")
+
+def test_failed_without_end_event():
+    redis = _setup()
+    redis_queue.set_status("s2", status="failed", error="boom")
+    _publish(redis, "s2", "segment", start=0.0, end=1.0, text="one")
+    events = _events(TestClient(app.app), "s2")
+    assert events[-1][1:] == ("end", {"status": "failed", "error": "boom"})
+    print("PASS: SSE ends when the job failed without an end event")
+
+if __name__ == "__main__":
+    try:
+        test_replay_and_end()
+        test_failed_without_end_event()
+        print("\nAll stream tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
@@ -0,0 +1,66 @@
+import os
+import sys
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import fakeredis
+    import redis_queue
+    # app registers a Prometheus collector that reads Redis on import
+    redis_queue._redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis_pid = os.getpid()
+    import app
+    from starlette.requests import Request
+    from fastapi.testclient import TestClient
+    print("PASS: Imported app")
+except ImportError as e:
+    print(f"FAIL: Could not import app: {e}")
+    sys.exit(1)
+
+def _post(size):
+    """POST an upload of size bytes with MAX_INPUT_BYTES=100; returns (response, form reads)."""
+    reads = []
+    form = Request.form
+    def counting_form(self, *args, **kwargs):
+        reads.append(self.url.path)
+        return form(self, *args, **kwargs)
+    limit = app.MAX_INPUT_BYTES
+    app.MAX_INPUT_BYTES = 100
+    Request.form = counting_form
+    try:
+        r = TestClient(app.app).post(
+            "/v1/transcribe",
+            data={"source_type": "upload"},
+            files={"file": ("a.wav", b"x" * size, "audio/wav")},
+        )
+    finally:
+        Request.form = form
+        app.MAX_INPUT_BYTES = limit
+    return r, reads
+
+def test_declared_length_rejected_before_form():
+    r, reads = _post(app.MULTIPART_OVERHEAD_BYTES + 1000)
+    assert r.status_code == 413, r.status_code
+    assert r.json()["detail"] == "ukuran file melebihi batas 100 bytes", r.json()
+    assert reads == [], reads
+    print("PASS: oversized Content-Length refused before the form is read")
+
+def test_streaming_backstop():
+    # within the multipart overhead allowance, so only the copy catches it
+    r, reads = _post(1000)
+    assert r.status_code == 413, r.status_code
+    assert reads, "form should have been read"
+    print("PASS: upload over the limit still refused while streaming")
+
+if __name__ == "__main__":
+    try:
+        test_declared_length_rejected_before_form()
+        test_streaming_backstop()
+        print("\nAll upload tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
@@ -0,0 +1,154 @@
+import os
+import sys
+import hmac
+import json
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add current directory to path
+sys.path.append(os.getcwd())
+
+try:
+    import fakeredis
+    import redis_queue
+    # app registers a Prometheus collector that reads Redis on import
+    redis_queue._redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis_pid = os.getpid()
+    import webhooks
+    import app
+    from fastapi.testclient import TestClient
+    print("PASS: Imported webhooks")
+except ImportError as e:
+    print(f"FAIL: Could not import webhooks: {e}")
+    sys.exit(1)
+
+def test_sign():
+    body = b'{"job_id": "abc"}'
+    expected = hmac.new(b"secret", b"1700000000." + body, hashlib.sha256).hexdigest()
+    assert webhooks.sign(body, "1700000000", "secret") == f"sha256={expected}"
+    print("PASS: HMAC signature over timestamp.body")
+
+def test_backoff():
+    for attempt in range(1, 20):
+        delay = min(webhooks.WEBHOOK_BACKOFF_MAX, webhooks.WEBHOOK_BACKOFF_BASE * 2 ** (attempt - 1))
+        got = webhooks.backoff(attempt)
+        assert delay / 2 <= got <= delay, (attempt, got)
+    print("PASS: backoff is exponential, capped and jittered")
+
+def test_retryable():
+    assert webhooks._retryable(None)
+    assert webhooks._retryable(503)
+    assert webhooks._retryable(429)
+    assert not webhooks._retryable(404)
+    print("PASS: only transient failures are retried")
+
+class _Receiver(BaseHTTPRequestHandler):
+    """Webhook endpoint answering with the next scripted status (the last one repeats)."""
+    statuses = []
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.received.append((dict(self.headers), body))
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def _setup(*statuses):
+    redis_queue._redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    redis_queue._redis_pid = os.getpid()
+    _Receiver.statuses = list(statuses)
+    _Receiver.received = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Receiver)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/hook"
+
+def _deliver_due(session):
+    # make everything due now, then run one delivery round
+    redis = redis_queue.get_redis()
+    for d in redis.zrange(webhooks._SCHEDULE, 0, -1):
+        redis.zadd(webhooks._SCHEDULE, {d: 0})
+    for d in webhooks._claim(10):
+        webhooks.deliver(session, d)
+
+def test_retry_then_deliver():
+    server, url = _setup(500, 200)
+    secret = webhooks.WEBHOOK_SECRET
+    webhooks.WEBHOOK_SECRET = "s3cret"
+    try:
+        redis = redis_queue.get_redis()
+        session = webhooks._session()
+        delivery_id = webhooks.enqueue(url, {"job_id": "j1", "status": "completed"})
+        assert webhooks._claim(10) == [delivery_id]
+        before = time.time()
+        webhooks.deliver(session, delivery_id)
+        due = redis.zscore(webhooks._SCHEDULE, delivery_id)
+        base = webhooks.WEBHOOK_BACKOFF_BASE
+        assert before + base / 2 - 1 <= due <= time.time() + base, (due - before)
+        assert json.loads(redis.get(webhooks._delivery_key(delivery_id)))["last_error"] == "HTTP 500"
+        assert webhooks._claim(10) == []  # not due before its backoff
+
+        _deliver_due(session)
+        assert len(_Receiver.received) == 2
+        headers, body = _Receiver.received[-1]
+        assert json.loads(body) == {"job_id": "j1", "status": "completed"}
+        assert headers["X-Webhook-Id"] == delivery_id
+        assert headers["X-Webhook-Signature"] == webhooks.sign(body, headers["X-Webhook-Timestamp"], "s3cret")
+        assert redis.zcard(webhooks._SCHEDULE) == 0
+        assert redis.get(webhooks._delivery_key(delivery_id)) is None
+        stats = webhooks.stats()
+        assert (stats["retried"], stats["delivered"], stats["attempts"], stats["dead"]) == (1, 1, 2, 0), stats
+        print("PASS: a 500 is retried after backoff and the signed retry is delivered")
+    finally:
+        webhooks.WEBHOOK_SECRET = secret
+        server.shutdown()
+
+def test_dead_letter_and_requeue():
+    server, url = _setup(500, 500, 200)
+    attempts = webhooks.WEBHOOK_MAX_ATTEMPTS
+    webhooks.WEBHOOK_MAX_ATTEMPTS = 2
+    try:
+        redis = redis_queue.get_redis()
+        session = webhooks._session()
+        client = TestClient(app.app)
+        delivery_id = webhooks.enqueue(url, {"job_id": "j2", "status": "failed"})
+        _deliver_due(session)
+        _deliver_due(session)
+        assert redis.zcard(webhooks._SCHEDULE) == 0
+        dead = client.get("/v1/webhooks/dead").json()["deliveries"]
+        assert [(d["id"], d["job_id"], d["attempts"], d["last_error"]) for d in dead] == [(delivery_id, "j2", 2, "HTTP 500")], dead
+        assert webhooks.stats()["dead"] == 1
+
+        assert client.post("/v1/webhooks/dead/missing/retry").status_code == 404
+        r = client.post(f"/v1/webhooks/dead/{delivery_id}/retry")
+        assert r.status_code == 200 and r.json()["status"] == "scheduled", r.text
+        assert client.get("/v1/webhooks/dead").json()["deliveries"] == []
+        assert json.loads(redis.get(webhooks._delivery_key(delivery_id)))["attempts"] == 0
+        _deliver_due(session)
+        assert len(_Receiver.received) == 3
+        assert webhooks.stats()["delivered"] == 1 and redis.zcard(webhooks._DEAD) == 0
+        print("PASS: exhausted deliveries are dead-lettered and the retry endpoint requeues them")
+    finally:
+        webhooks.WEBHOOK_MAX_ATTEMPTS = attempts
+        server.shutdown()
+
+if __name__ == "__main__":
+    try:
+        test_sign()
+        test_backoff()
+        test_retryable()
+        test_retry_then_deliver()
+        test_dead_letter_and_requeue()
+        print("\nAll webhook tests passed successfully!")
+    except AssertionError as e:
+        print(f"\nTest failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+        sys.exit(1)
@@ -1,6 +1,8 @@
 import os
 import re
+import subprocess
 from pathlib import Path
+from typing import Optional
 
 
 def valid_int_env(key: str, default: int) -> int:
@@ -37,3 +39,63 @@ def storage_dir() -> Path:
 
 def safe_job_id(job_id: str) -> str:
     return re.sub(r"[^a-zA-Z0-9_-]", "", job_id)[:80]
+
+def _read(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+def available_cpus(cgroup: str = "/sys/fs/cgroup") -> int:
+    """CPUs this process may actually use: the affinity mask, capped by a
+    cgroup CPU quota (containers with --cpus / Kubernetes limits)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    quota, _, period = _read(f"{cgroup}/cpu.max").partition(" ")
+    if not period:
+        # cgroup v1
+        quota, period = _read(f"{cgroup}/cpu/cpu.cfs_quota_us"), _read(f"{cgroup}/cpu/cpu.cfs_period_us")
+    try:
+        if quota not in ("", "max", "-1") and int(period) > 0:
+            cpus = min(cpus, max(1, -(-int(quota) // int(period))))
+    except ValueError:
+        pass
+    return max(1, cpus)
+
+def available_memory_mb(cgroup: str = "/sys/fs/cgroup") -> int:
+    """Memory that can still be allocated: MemAvailable, capped by the
+    cgroup memory limit minus current usage."""
+    avail = 0
+    for line in _read("/proc/meminfo").splitlines():
+        if line.startswith("MemAvailable:"):
+            avail = int(line.split()[1]) // 1024
+    limit = _read(f"{cgroup}/memory.max") or _read(f"{cgroup}/memory/memory.limit_in_bytes")
+    usage = _read(f"{cgroup}/memory.current") or _read(f"{cgroup}/memory/memory.usage_in_bytes")
+    # v1 reports "no limit" as a huge number
+    if limit.isdigit() and usage.isdigit() and int(limit) < 1 << 60:
+        cgroup_avail = (int(limit) - int(usage)) // (1024 * 1024)
+        avail = min(avail, cgroup_avail) if avail else cgroup_avail
+    return max(0, avail)
+
+def process_rss_mb(pid: int) -> int:
+    for line in _read(f"/proc/{pid}/status").splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) // 1024
+    return 0
+
+def probe_duration(source: str, timeout: int = 15) -> Optional[float]:
+    """Media duration in seconds from ffprobe (path or URL); None if unknown."""
+    cmd = [
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", source,
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, timeout=timeout, check=True).stdout
+        duration = float(out.strip())
+    except (subprocess.SubprocessError, OSError, ValueError):
+        return None
+    return duration if duration > 0 else None
@@ -0,0 +1,268 @@
+import os
+import hmac
+import json
+import time
+import uuid
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List
+
+import requests
+from redis.exceptions import WatchError
+
+from redis_queue import get_redis
+from utils import valid_int_env
+import metrics
+
+# Webhook delivery queue.
+# Transcription slots only record a delivery (one pipelined write) and go
+# back to work; a separate delivery process POSTs it with a pooled session,
+# retrying with exponential backoff + jitter, and parks it in a dead-letter
+# set once WEBHOOK_MAX_ATTEMPTS is used up.
+WEBHOOK_DELIVERY_ENABLED = os.getenv("WEBHOOK_DELIVERY_ENABLED", "true").lower() == "true"
+WEBHOOK_TIMEOUT = valid_int_env("WEBHOOK_TIMEOUT", 10)
+WEBHOOK_CONCURRENCY = valid_int_env("WEBHOOK_CONCURRENCY", 8)
+WEBHOOK_MAX_ATTEMPTS = valid_int_env("WEBHOOK_MAX_ATTEMPTS", 8)
+WEBHOOK_BACKOFF_BASE = valid_int_env("WEBHOOK_BACKOFF_BASE", 5)
+WEBHOOK_BACKOFF_MAX = valid_int_env("WEBHOOK_BACKOFF_MAX", 3600)
+WEBHOOK_DEAD_TTL = valid_int_env("WEBHOOK_DEAD_TTL", 7 * 86400)
+# payloads are signed when set: X-Webhook-Signature: sha256=HMAC(secret, "<timestamp>.<body>")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# a claimed delivery is retried by another process if not settled within this
+_CLAIM_TTL = WEBHOOK_TIMEOUT + 30
+_POLL_INTERVAL = 0.5
+
+_PREFIX = "transcribe:webhooks"
+_SCHEDULE = f"{_PREFIX}:schedule"  # zset: delivery id -> due timestamp
+_DEAD = f"{_PREFIX}:dead"  # zset: delivery id -> time it was given up on
+_STATS = f"{_PREFIX}:stats"  # hash of counters
+
+
+def _delivery_key(delivery_id: str) -> str:
+    return f"{_PREFIX}:delivery:{delivery_id}"
+
+
+def enqueue(url: str, payload: Dict[str, Any]) -> str:
+    """Schedule a POST of payload to url; returns the delivery id."""
+    delivery_id = uuid.uuid4().hex
+    now = time.time()
+    delivery = {
+        "url": url,
+        "body": json.dumps(payload, ensure_ascii=False),
+        "job_id": payload.get("job_id"),
+        "attempts": 0,
+        "created_at": now,
+        "last_error": None,
+    }
+    pipe = get_redis().pipeline()
+    pipe.set(_delivery_key(delivery_id), json.dumps(delivery))
+    pipe.zadd(_SCHEDULE, {delivery_id: now})
+    pipe.hincrby(_STATS, "enqueued", 1)
+    pipe.execute()
+    return delivery_id
+
+
+def sign(body: bytes, timestamp: str, secret: Optional[str] = None) -> str:
+    secret = WEBHOOK_SECRET if secret is None else secret
+    mac = hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256)
+    return f"sha256={mac.hexdigest()}"
+
+
+def backoff(attempts: int) -> float:
+    """Delay before retry number `attempts`: exponential, capped, with jitter
+    in the upper half so a burst of failures doesn't retry in lockstep."""
+    delay = min(WEBHOOK_BACKOFF_MAX, WEBHOOK_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _claim(limit: int) -> List[str]:
+    """Take up to `limit` due deliveries by pushing their due time out by
+    _CLAIM_TTL (a lease), so concurrent delivery processes never share one
+    and a crashed process's deliveries come back on their own."""
+    redis = get_redis()
+    while True:
+        with redis.pipeline() as pipe:
+            try:
+                pipe.watch(_SCHEDULE)
+                now = time.time()
+                due = pipe.zrangebyscore(_SCHEDULE, 0, now, start=0, num=limit)
+                if not due:
+                    pipe.unwatch()
+                    return []
+                pipe.multi()
+                pipe.zadd(_SCHEDULE, {d: now + _CLAIM_TTL for d in due})
+                pipe.execute()
+                return [d.decode() if isinstance(d, bytes) else d for d in due]
+            except WatchError:
+                continue
+
+
+def _session() -> requests.Session:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=WEBHOOK_CONCURRENCY, pool_maxsize=WEBHOOK_CONCURRENCY)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _retryable(status: Optional[int]) -> bool:
+    # network errors, timeouts, 5xx and throttling are worth retrying; other 4xx are not
+    return status is None or status >= 500 or status in (408, 429)
+
+
+def deliver(session: requests.Session, delivery_id: str):
+    redis = get_redis()
+    key = _delivery_key(delivery_id)
+    raw = redis.get(key)
+    if raw is None:
+        redis.zrem(_SCHEDULE, delivery_id)
+        return
+    delivery = json.loads(raw)
+    delivery["attempts"] += 1
+    body = delivery["body"].encode("utf-8")
+    timestamp = str(int(time.time()))
+    headers = {"Content-Type": "application/json", "X-Webhook-Id": delivery_id, "X-Webhook-Timestamp": timestamp}
+    if WEBHOOK_SECRET:
+        headers["X-Webhook-Signature"] = sign(body, timestamp)
+
+    started = time.monotonic()
+    status, error = None, None
+    try:
+        resp = session.post(delivery["url"], data=body, headers=headers, timeout=WEBHOOK_TIMEOUT)
+        status = resp.status_code
+        if status >= 400:
+            error = f"HTTP {status}"
+    except Exception as e:
+        error = str(e)
+    attempt_ms = int((time.monotonic() - started) * 1000)
+    metrics.STAGE_SECONDS.labels("webhook").observe(attempt_ms / 1000)
+
+    pipe = redis.pipeline()
+    pipe.hincrby(_STATS, "attempts", 1)
+    pipe.hincrby(_STATS, "attempt_ms_total", attempt_ms)
+    if error is None:
+        # delivery latency: from the job finishing to the receiver accepting it
+        latency_ms = int((time.time() - delivery["created_at"]) * 1000)
+        pipe.hincrby(_STATS, "delivered", 1)
+        pipe.hincrby(_STATS, "latency_ms_total", latency_ms)
+        pipe.zrem(_SCHEDULE, delivery_id)
+        pipe.delete(key)
+        print(f"    -> Webhook {delivery_id} ({delivery['job_id']}) delivered: {status} after {delivery['attempts']} attempt(s)")
+    elif _retryable(status) and delivery["attempts"] < WEBHOOK_MAX_ATTEMPTS:
+        delay = backoff(delivery["attempts"])
+        delivery["last_error"] = error
+        pipe.hincrby(_STATS, "retried", 1)
+        pipe.set(key, json.dumps(delivery))
+        pipe.zadd(_SCHEDULE, {delivery_id: time.time() + delay})
+        print(f"    [!] Webhook {delivery_id} ({delivery['job_id']}) failed: {error}, retry in {delay:.0f}s")
+    else:
+        now = time.time()
+        delivery["last_error"] = error
+        pipe.hincrby(_STATS, "dead", 1)
+        pipe.zrem(_SCHEDULE, delivery_id)
+        pipe.set(key, json.dumps(delivery), ex=WEBHOOK_DEAD_TTL)
+        pipe.zadd(_DEAD, {delivery_id: now})
+        pipe.zremrangebyscore(_DEAD, 0, now - WEBHOOK_DEAD_TTL)
+        print(f"    [!] Webhook {delivery_id} ({delivery['job_id']}) dead after {delivery['attempts']} attempt(s): {error}")
+    pipe.execute()
+
+
+def redeliver(delivery_id: str) -> bool:
+    """Move a dead-lettered delivery back onto the schedule with a fresh attempt budget."""
+    redis = get_redis()
+    raw = redis.get(_delivery_key(delivery_id))
+    if raw is None or redis.zscore(_DEAD, delivery_id) is None:
+        return False
+    delivery = json.loads(raw)
+    delivery["attempts"] = 0
+    pipe = redis.pipeline()
+    pipe.set(_delivery_key(delivery_id), json.dumps(delivery))
+    pipe.zrem(_DEAD, delivery_id)
+    pipe.zadd(_SCHEDULE, {delivery_id: time.time()})
+    pipe.execute()
+    return True
+
+
+def dead_letters(limit: int = 100) -> List[Dict[str, Any]]:
+    redis = get_redis()
+    ids = [d.decode() for d in redis.zrevrange(_DEAD, 0, limit - 1)]
+    pipe = redis.pipeline()
+    for d in ids:
+        pipe.get(_delivery_key(d))
+    out = []
+    for d, raw in zip(ids, pipe.execute()):
+        if raw is None:
+            continue
+        delivery = json.loads(raw)
+        out.append({
+            "id": d,
+            "job_id": delivery["job_id"],
+            "url": delivery["url"],
+            "attempts": delivery["attempts"],
+            "last_error": delivery["last_error"],
+        })
+    return out
+
+
+def stats() -> Dict[str, Any]:
+    redis = get_redis()
+    pipe = redis.pipeline()
+    pipe.hgetall(_STATS)
+    pipe.zcard(_SCHEDULE)
+    pipe.zcard(_DEAD)
+    counters, pending, dead = pipe.execute()
+    c = {k.decode(): int(v) for k, v in counters.items()}
+    delivered, attempts = c.get("delivered", 0), c.get("attempts", 0)
+    return {
+        "pending": pending,
+        "dead_letters": dead,
+        "enqueued": c.get("enqueued", 0),
+        "delivered": delivered,
+        "retried": c.get("retried", 0),
+        "dead": c.get("dead", 0),
+        "attempts": attempts,
+        "avg_latency_ms": round(c.get("latency_ms_total", 0) / delivered) if delivered else None,
+        "avg_attempt_ms": round(c.get("attempt_ms_total", 0) / attempts) if attempts else None,
+    }
+
+
+def serve():
+    """Delivery loop: claim due deliveries while sender threads are free."""
+    print(f"[*] Webhook delivery starting (WEBHOOK_CONCURRENCY: {WEBHOOK_CONCURRENCY})...")
+    session = _session()
+    lock = threading.Lock()
+    inflight = 0
+
+    def _run(delivery_id):
+        nonlocal inflight
+        try:
+            deliver(session, delivery_id)
+        except Exception as e:
+            # left on the schedule, the lease brings it back
+            print(f"    [!] Webhook {delivery_id} delivery error: {e}")
+        finally:
+            with lock:
+                inflight -= 1
+
+    with ThreadPoolExecutor(WEBHOOK_CONCURRENCY) as pool:
+        while True:
+            with lock:
+                free = WEBHOOK_CONCURRENCY - inflight
+            try:
+                claimed = _claim(free) if free else []
+            except Exception as e:
+                print(f"[!] Webhook claim failed: {e}")
+                claimed = []
+            if not claimed:
+                time.sleep(_POLL_INTERVAL)
+                continue
+            for delivery_id in claimed:
+                with lock:
+                    inflight += 1
+                pool.submit(_run, delivery_id)
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,151 +1,665 @@
 import os
+import json
+import time
+import hashlib
+import tempfile
+import signal
+import threading
 import subprocess
+from collections import OrderedDict
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any, Optional
-from rq import Worker, Queue, get_current_job
-from faster_whisper import WhisperModel
-import srt
-from redis_queue import get_redis
-from utils import storage_dir, valid_int_env, valid_str_env, sanitize_minio_endpoint
-from minio import Minio
-from minio.error import S3Error
-import requests
+from typing import Dict, Any, Optional, Callable, List, Tuple
+from rq import Worker, SimpleWorker, Retry, get_current_job
+from rq.job import Job, JobStatus, Dependency
+from rq.timeouts import JobTimeoutException
+from faster_whisper import WhisperModel, BatchedInferencePipeline
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+import numpy as np
+import httpx
+from redis_queue import (
+    get_redis, get_queue, parse_queue_name, PRIORITIES, segment_stream_key,
+    IndexedQueue, StatusJob, set_status, queue_index_key, prune_queue_index, utc_now, transcribe_queues, queue_size_class,
+    IndexedStartedJobRegistry, status_key,
+)
+from utils import storage_dir, valid_int_env, valid_str_env, available_cpus, available_memory_mb, process_rss_mb
+import result_cache
+import webhooks
+import segments as segment_store
+import storage
+import metrics
+import lifecycle
+import estimates
+import diarize
 
 
 MODEL_SIZE = valid_str_env("MODEL_SIZE", "small")
+# Models a job may ask for via the `model` field (MODEL_SIZE is always allowed)
+ALLOWED_MODELS = [MODEL_SIZE] + [
+    m.strip() for m in valid_str_env("ALLOWED_MODELS", MODEL_SIZE).split(",")
+    if m.strip() and m.strip() != MODEL_SIZE
+]
+# Loaded models are kept in an LRU bounded by this (estimated) size.
+# 0 = keep only the most recently used model.
+MODEL_MEMORY_BUDGET_MB = valid_int_env("MODEL_MEMORY_BUDGET_MB", 0)
 DEVICE = valid_str_env("WHISPER_DEVICE", "auto")
 COMPUTE_TYPE = valid_str_env("WHISPER_COMPUTE_TYPE", "default")
 # Optimize for CPU
 if DEVICE == "cpu" and COMPUTE_TYPE == "default":
     COMPUTE_TYPE = "int8"
 
+# Decoding engine: "sequential" (model.transcribe) or "batched"
+# (BatchedInferencePipeline, several VAD chunks per forward pass).
+# Clips shorter than BATCH_MIN_DURATION always use the sequential path.
+WHISPER_ENGINE = valid_str_env("WHISPER_ENGINE", "sequential")
+BATCH_SIZE = valid_int_env("BATCH_SIZE", 8)
+BATCH_MIN_DURATION = valid_int_env("BATCH_MIN_DURATION", 60)
+
 MAX_CONCURRENCY = valid_int_env("MAX_CONCURRENCY", 1)
+# Autoscaling: the manager keeps between MIN_CONCURRENCY and MAX_CONCURRENCY
+# slots, adding one while jobs wait and draining slots idle for
+# SCALE_DOWN_IDLE_SECONDS. MIN_CONCURRENCY = MAX_CONCURRENCY is a fixed pool.
+MIN_CONCURRENCY = max(0, min(valid_int_env("MIN_CONCURRENCY", MAX_CONCURRENCY), MAX_CONCURRENCY))
+SCALE_DOWN_IDLE_SECONDS = valid_int_env("SCALE_DOWN_IDLE_SECONDS", 300)
+# total RSS all slots may use (0 = only limited by available memory)
+WORKER_MEMORY_BUDGET_MB = valid_int_env("WORKER_MEMORY_BUDGET_MB", 0)
+# per-slot memory on top of the model until a running slot can be measured
+SLOT_OVERHEAD_MB = valid_int_env("SLOT_OVERHEAD_MB", 400)
+# how often idle workers look for newly created (tenant) queues
+QUEUE_REFRESH_SECONDS = valid_int_env("QUEUE_REFRESH_SECONDS", 5)
+# Warm worker: each slot loads the model when it starts and runs jobs
+# in-process (SimpleWorker) so the loaded model survives between jobs.
+# With WARM_WORKER=false RQ forks a work-horse per job (model reloaded per job).
+WARM_WORKER = os.getenv("WARM_WORKER", "true").lower() == "true"
+# touched once every slot has its model loaded and is taking jobs
+WORKER_READY_FILE = valid_str_env("WORKER_READY_FILE", "/tmp/worker.ready")
 CPU_THREADS = valid_int_env("CPU_THREADS", 0)
 FFMPEG_TIMEOUT = valid_int_env("FFMPEG_TIMEOUT", 300)
 WEBHOOK_ON_ERROR = os.getenv("WEBHOOK_ON_ERROR", "true").lower() == "true"
 
-# MinIO Config
-MINIO_ENDPOINT = sanitize_minio_endpoint(os.getenv("MINIO_ENDPOINT", ""))
-MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY")
-MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY")
-MINIO_BUCKET = valid_str_env("MINIO_BUCKET", "transcribe")
-MINIO_SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
-MINIO_PUBLIC_BASE_URL = os.getenv("MINIO_PUBLIC_BASE_URL")
-
-# cache model in memory (per worker process)
-_model: Optional[WhisperModel] = None
-
-def _get_model() -> WhisperModel:
-    global _model
-    if _model is None:
-        # If CPU threads not specified, we calculate it based on concurrency
-        # to avoid oversubscribing a 6-core machine (typical for user)
-        threads = CPU_THREADS
-        if threads == 0:
-            # Assume 6 cores as baseline if not specified
-            threads = max(1, 6 // MAX_CONCURRENCY)
-            
-        print(f"[*] Initializing WhisperModel ({MODEL_SIZE}) with {threads} threads")
-        _model = WhisperModel(
-            MODEL_SIZE, 
-            device=DEVICE, 
+# Input download (source_type=url) happens here, not in the API
+DOWNLOAD_TIMEOUT = valid_int_env("DOWNLOAD_TIMEOUT", 600)
+INGEST_CHUNK_SIZE = valid_int_env("INGEST_CHUNK_SIZE", 1024 * 1024)
+MAX_INPUT_BYTES = valid_int_env("MAX_INPUT_BYTES", 0)
+# Download the next queued job's input while the current one is transcribing
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_LOCK_TTL = DOWNLOAD_TIMEOUT + 60
+
+# Fan-out: long audio is split at silences into chunk sub-jobs that run on
+# any free worker slot, then a merge job stitches the segments back together
+CHUNKING_ENABLED = os.getenv("CHUNKING_ENABLED", "false").lower() == "true"
+CHUNK_MIN_DURATION = valid_int_env("CHUNK_MIN_DURATION", 1800)
+CHUNK_SECONDS = valid_int_env("CHUNK_SECONDS", 600)
+SAMPLE_RATE = 16000
+# Checkpoints: the segment loop saves finished segments to Redis every
+# CHECKPOINT_SECONDS (0 = off); a retried job (RQ Retry, JOB_RETRIES times)
+# only decodes and transcribes the audio after the last one. Only timeouts
+# and lost slots are retried (see _retryable): a bad input fails every time.
+CHECKPOINT_SECONDS = valid_int_env("CHECKPOINT_SECONDS", 60)
+JOB_RETRIES = valid_int_env("JOB_RETRIES", 2)
+# bytes read from the ffmpeg pipe per call while decoding
+PCM_READ_SIZE = valid_int_env("PCM_READ_SIZE", 4 * 1024 * 1024)
+
+
+def model_queue_name(model: Optional[str]) -> str:
+    """Jobs are routed to one queue per model so workers can prefer the
+    models they already have loaded. MODEL_SIZE keeps the plain queue name."""
+    if not model or model == MODEL_SIZE:
+        return "transcribe"
+    return f"transcribe-{model}"
+
+# approximate parameter counts (millions), used to budget loaded models
+_MODEL_PARAMS_M = {
+    "tiny": 39, "base": 74, "small": 244, "medium": 769,
+    "large": 1550, "turbo": 809, "distil-large": 756, "distil-medium": 394, "distil-small": 166,
+}
+
+def _estimate_model_mb(name: str) -> int:
+    key = name.rstrip("/").split("/")[-1]
+    # longest names first so e.g. "distil-large" wins over "large"
+    params = next(
+        (_MODEL_PARAMS_M[k] for k in sorted(_MODEL_PARAMS_M, key=len, reverse=True) if k in key),
+        _MODEL_PARAMS_M["large"],
+    )
+    bytes_per_param = 1 if "int8" in COMPUTE_TYPE else 4 if COMPUTE_TYPE == "float32" else 2
+    return int(params * bytes_per_param * 1.2)
+
+# cache models in memory (per worker process), least recently used first
+_models: "OrderedDict[str, WhisperModel]" = OrderedDict()
+
+def resident_models() -> List[str]:
+    """Loaded models, most recently used first."""
+    return list(reversed(_models))
+
+def _get_model(name: Optional[str] = None, num_workers: int = 1) -> WhisperModel:
+    # num_workers > 1 lets several threads decode on one model concurrently
+    # (used by the live pool); it only applies when the model is first loaded
+    name = name or MODEL_SIZE
+    if name in _models:
+        _models.move_to_end(name)
+        return _models[name]
+
+    # evict least recently used models until the new one fits the budget
+    need = _estimate_model_mb(name)
+    while _models and sum(_estimate_model_mb(m) for m in _models) + need > MODEL_MEMORY_BUDGET_MB:
+        evicted, _ = _models.popitem(last=False)
+        print(f"[*] Evicting WhisperModel ({evicted}) from cache")
+
+    # If CPU threads not specified, split the usable cores (affinity mask,
+    # cgroup quota) between the slots. MAX_CONCURRENCY, not the current slot
+    # count: the thread pool is fixed at load and the pool may still grow.
+    threads = CPU_THREADS
+    if threads == 0:
+        threads = max(1, available_cpus() // MAX_CONCURRENCY)
+
+    print(f"[*] Initializing WhisperModel ({name}) with {threads} threads")
+    with metrics.stage("model_load"):
+        _models[name] = WhisperModel(
+            name,
+            device=DEVICE,
             compute_type=COMPUTE_TYPE,
-            cpu_threads=threads
+            cpu_threads=threads,
+            num_workers=num_workers
         )
-    return _model
-
-def _to_wav(input_path: str, wav_path: str):
-    # convert anything to 16k mono wav for consistent speed
-    cmd = [
-        "ffmpeg", "-y",
-        "-i", input_path,
-        "-ac", "1",
-        "-ar", "16000",
-        "-vn",
-        wav_path
-    ]
-    subprocess.check_call(cmd, timeout=FFMPEG_TIMEOUT)
-
-def _write_srt(segments, out_path: Path):
-    subs = []
-    for i, seg in enumerate(segments, start=1):
-        subs.append(
-            srt.Subtitle(
-                index=i,
-                start=srt.timedelta(seconds=float(seg.start)),
-                end=srt.timedelta(seconds=float(seg.end)),
-                content=(seg.text or "").strip()
+    return _models[name]
+
+class SchedulingWorker(Worker):
+    """Worker that picks jobs by priority, then duration class, then
+    round-robin across tenants, then preferring models it already has loaded.
+
+    Tenant queues are created on demand by the API, so the queue list is
+    re-discovered from RQ every QUEUE_REFRESH_SECONDS. RQ blocks on the
+    queues in _ordered_queues order (first non-empty wins), so computing
+    that order on access is all the scheduling needed.
+
+    It also keeps the compact status hash (see redis_queue.set_status) in
+    step with the job lifecycle.
+    """
+    queue_class = IndexedQueue
+    job_class = StatusJob
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._bases = {parse_queue_name(q.name)[0] for q in self.queues}
+        self._queues_refreshed = 0.0
+        self._last_tenant: Optional[str] = None
+
+    @property
+    def dequeue_timeout(self) -> int:
+        # wake up regularly so queues of new tenants are picked up
+        return QUEUE_REFRESH_SECONDS
+
+    @property
+    def _ordered_queues(self):
+        self._refresh_queues()
+        resident = [model_queue_name(m) for m in resident_models()]
+        tenants = sorted({parse_queue_name(q.name)[2] or "" for q in self.queues})
+        pos = {t: i for i, t in enumerate(tenants)}
+        last = pos.get(self._last_tenant, -1)
+
+        def rank(q):
+            base, priority, tenant = parse_queue_name(q.name)
+            return (
+                PRIORITIES.index(priority),
+                # shortest-job-first across duration classes (DURATION_BUCKETS)
+                queue_size_class(q.name),
+                # the tenant after the one served last goes first
+                (pos[tenant or ""] - last - 1) % max(1, len(tenants)),
+                resident.index(base) if base in resident else len(resident),
+            )
+        return sorted(self.queues, key=rank)
+
+    @_ordered_queues.setter
+    def _ordered_queues(self, value):
+        # order is derived on access, see the getter
+        pass
+
+    def _refresh_queues(self):
+        now = time.monotonic()
+        if now - getattr(self, "_queues_refreshed", 0.0) < QUEUE_REFRESH_SECONDS:
+            return
+        self._queues_refreshed = now
+        known = {q.name for q in self.queues}
+        for q in IndexedQueue.all(connection=self.connection):
+            if q.name not in known and parse_queue_name(q.name)[0] in self._bases:
+                self.queues.append(q)
+
+    def clean_registries(self):
+        # Jobs abandoned by a dead slot (see IndexedStartedJobRegistry): a
+        # retry is back in the queue with status "queued" already, a failure
+        # is mirrored into the status hash here. RQ's own pass then finds
+        # nothing left to do.
+        for queue in self.queues:
+            if not queue.acquire_maintenance_lock():
+                continue
+            try:
+                registry = IndexedStartedJobRegistry(queue.name, connection=self.connection, job_class=self.job_class)
+                for job in registry.cleanup(exception_handlers=self._exc_handlers):
+                    if job.get_status(refresh=False) == JobStatus.FAILED:
+                        self._set_final_status(job, status="failed", ended_at=utc_now(), error="abandoned: worker slot died")
+                    else:
+                        set_status(job.id, message=f"retrying after worker loss ({job.retries_left} left)")
+                pruned = prune_queue_index(queue.name)
+                if pruned:
+                    print(f"[*] Dropped {pruned} stale queue index entries of {queue.name}")
+            finally:
+                queue.release_maintenance_lock()
+        super().clean_registries()
+
+    def monitor_work_horse(self, job, queue):
+        pid = self.horse_pid
+        try:
+            super().monitor_work_horse(job, queue)
+        finally:
+            metrics.mark_process_dead(pid)
+
+    def reorder_queues(self, reference_queue):
+        self._last_tenant = parse_queue_name(reference_queue.name)[2] or ""
+
+    def prepare_job_execution(self, job, remove_from_intermediate_queue=False):
+        global _current_worker
+        super().prepare_job_execution(job, remove_from_intermediate_queue)
+        # the prefetch looks ahead in this worker's queue order
+        _current_worker = self
+        if job.enqueued_at is not None:
+            enqueued_at = job.enqueued_at
+            if enqueued_at.tzinfo is None:
+                enqueued_at = enqueued_at.replace(tzinfo=timezone.utc)
+            base, priority, _ = parse_queue_name(job.origin)
+            metrics.QUEUE_WAIT_SECONDS.labels(base, priority).observe(
+                max(0.0, (datetime.now(timezone.utc) - enqueued_at).total_seconds())
             )
+        pipe = self.connection.pipeline()
+        pipe.zrem(queue_index_key(job.origin), job.id)
+        set_status(job.id, pipeline=pipe, status="started", started_at=utc_now())
+        pipe.execute()
+
+    def handle_job_success(self, job, queue, started_job_registry):
+        super().handle_job_success(job, queue, started_job_registry)
+        self._record_job_seconds(job)
+        # a fanned-out job only split the audio: its merge job finishes it
+        if not job.meta.get("merge_job_id"):
+            self._set_final_status(job, status="finished", ended_at=utc_now(), error=None)
+
+    @staticmethod
+    def _ends_client_job(job) -> bool:
+        # a fanned-out client job ends with its merge job: its chunks and the
+        # parent that only split the audio don't count as jobs of their own
+        return "chunk" not in job.meta and not job.meta.get("merge_job_id")
+
+    def _record_job_seconds(self, job):
+        # the average is per client job, from the parent starting until its merge is done
+        if not self._ends_client_job(job):
+            return
+        started_at = job.started_at
+        if job.meta.get("parent_job_id"):
+            raw = self.connection.hget(status_key(job.meta["parent_job_id"]), "started_at")
+            started_at = datetime.fromisoformat(raw.decode()) if raw else None
+        if started_at is None:
+            return
+        if started_at.tzinfo is None:
+            started_at = started_at.replace(tzinfo=timezone.utc)
+        estimates.record_job_seconds((datetime.now(timezone.utc) - started_at).total_seconds())
+
+    def handle_job_failure(self, job, queue, started_job_registry=None, exc_string=""):
+        retry = bool(job.retries_left) and self._stopped_job_id != job.id
+        super().handle_job_failure(job, queue, started_job_registry=started_job_registry, exc_string=exc_string)
+        if retry:
+            # requeued (status "queued" is set by IndexedQueue), resumes from its checkpoint
+            set_status(job.id, error=exc_string[:500], message=f"retrying ({job.retries_left} left)")
+            return
+        self._set_final_status(job, status="failed", ended_at=utc_now(), error=exc_string[:500])
+
+    def _set_final_status(self, job, **fields):
+        if self._ends_client_job(job):
+            metrics.JOBS.labels(fields["status"]).inc()
+        pipe = self.connection.pipeline()
+        set_status(job.id, pipeline=pipe, **fields)
+        if job.meta.get("parent_job_id"):
+            # merge job: the parent is what clients poll
+            set_status(job.meta["parent_job_id"], pipeline=pipe, **fields)
+        payload = job.args[0] if job.args and isinstance(job.args[0], dict) else {}
+        # chunk and merge jobs share the directory of the job they belong to
+        lifecycle.track(payload.get("job_id", job.id), pipeline=pipe)
+        # the slot's node may not share the volume: reap its own copy too
+        lifecycle.track_local(payload.get("job_id", job.id), pipeline=pipe)
+        pipe.execute()
+        # a finished job's ingested upload goes in _finish_job; chunks and a
+        # parent that split leave it to their merge, which may still need it
+        if fields["status"] == "failed" and self._ends_client_job(job):
+            _remove_ingested(payload)
+
+class WarmSchedulingWorker(SchedulingWorker, SimpleWorker):
+    """SchedulingWorker that runs jobs in-process (see WARM_WORKER)."""
+
+def scale_target(busy: int, waiting: int, memory_cap: Optional[int] = None) -> int:
+    """Slots the manager should run: one per running or waiting job, within
+    [MIN_CONCURRENCY, MAX_CONCURRENCY] and what fits in memory."""
+    upper = MAX_CONCURRENCY if memory_cap is None else min(MAX_CONCURRENCY, memory_cap)
+    return max(MIN_CONCURRENCY, min(busy + waiting, upper))
+
+def free_slot(running, draining) -> Optional[int]:
+    """Lowest slot index neither running nor still draining, or None if every
+    free index is held by a slot that hasn't exited yet."""
+    free = set(range(MAX_CONCURRENCY)) - set(running) - set(draining)
+    return min(free) if free else None
+
+def _transcribe(
+    audio: np.ndarray,
+    language: Optional[str],
+    task: str,
+    engine: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    model_name: Optional[str] = None,
+):
+    """Run the selected decoding engine. Returns (segments_gen, info, engine_used)."""
+    engine = engine or WHISPER_ENGINE
+    model = _get_model(model_name)
+    if engine == "batched" and len(audio) / SAMPLE_RATE >= BATCH_MIN_DURATION:
+        segments_gen, info = BatchedInferencePipeline(model=model).transcribe(
+            audio,
+            language=language,
+            task=task,
+            vad_filter=True,
+            beam_size=1,
+            batch_size=batch_size or BATCH_SIZE,
         )
-    out_path.write_text(srt.compose(subs), encoding="utf-8")
-
-def _write_txt(segments, out_path: Path):
-    text = "\n".join([(seg.text or "").strip() for seg in segments]).strip() + "\n"
-    out_path.write_text(text, encoding="utf-8")
-
-def _write_vtt(segments, out_path: Path):
-    # simple VTT from srt lib: reuse srt compose then replace commas to dots + header
-    import re
-    tmp = srt.compose([
-        srt.Subtitle(
-            index=i+1,
-            start=srt.timedelta(seconds=float(seg.start)),
-            end=srt.timedelta(seconds=float(seg.end)),
-            content=(seg.text or "").strip()
-        ) for i, seg in enumerate(segments)
-    ])
-    vtt = "WEBVTT\n\n" + re.sub(r"(\d{2}:\d{2}:\d{2}),(\d{3})", r"\1.\2", tmp)
-    out_path.write_text(vtt, encoding="utf-8")
-
-def _upload_to_minio(file_path: Path, object_name: str) -> Optional[str]:
-    if not all([MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY]):
-        print("[!] MinIO configuration incomplete, skipping upload.")
+        return segments_gen, info, "batched"
+    segments_gen, info = model.transcribe(
+        audio,
+        language=language,
+        task=task,
+        vad_filter=True,
+        beam_size=1,
+    )
+    return segments_gen, info, "sequential"
+
+def _log_rtf(job_id: str, engine: str, model_name: str, elapsed: float, duration: float) -> Optional[float]:
+    metrics.STAGE_SECONDS.labels("transcribe").observe(elapsed)
+    if duration <= 0:
         return None
-    
+    rtf = elapsed / duration
+    metrics.AUDIO_SECONDS.labels(model_name).inc(duration)
+    metrics.REALTIME_FACTOR.labels(model_name, COMPUTE_TYPE, engine).observe(rtf)
+    estimates.record_rtf(model_name, rtf)
+    print(f"[{job_id}] RTF engine={engine} model={model_name} compute={COMPUTE_TYPE}: {rtf:.3f} ({elapsed:.1f}s for {duration:.1f}s audio)")
+    return rtf
+
+def _decode_pcm(input_path: str, start: float = 0.0, duration: Optional[float] = None) -> np.ndarray:
+    """Decode anything to 16k mono float32 PCM through an ffmpeg pipe.
+
+    Nothing is written to disk: the samples are read from ffmpeg's stdout
+    into one growing buffer that is handed to WhisperModel.transcribe as is.
+    start/duration (seconds) decode just a window of the input.
+    """
+    cmd = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error"]
+    if start:
+        cmd += ["-ss", f"{start:.3f}"]
+    cmd += ["-i", input_path]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", "pipe:1"]
+
+    timed_out = threading.Event()
+    # stderr goes to a file so a chatty ffmpeg can never block on a full pipe
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err)
+        def _kill():
+            timed_out.set()
+            proc.kill()
+        timer = threading.Timer(FFMPEG_TIMEOUT, _kill)
+        timer.start()
+        try:
+            buf = bytearray()
+            while True:
+                chunk = proc.stdout.read(PCM_READ_SIZE)
+                if not chunk:
+                    break
+                buf += chunk
+            proc.wait()
+        finally:
+            timer.cancel()
+            proc.stdout.close()
+        err.seek(0)
+        stderr = err.read()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, FFMPEG_TIMEOUT, stderr=stderr)
+    if proc.returncode != 0:
+        print(f"[!] ffmpeg failed: {stderr.decode(errors='replace').strip()[-500:]}")
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+    # drop a trailing partial sample, then view the buffer without copying
+    del buf[len(buf) - len(buf) % 4:]
+    return np.frombuffer(buf, dtype=np.float32)
+
+def _download(url: str, dest: Path) -> str:
+    """Stream url to dest in chunks, enforcing MAX_INPUT_BYTES.
+
+    Returns the sha256 hex digest of the downloaded bytes.
+    """
+    started = time.monotonic()
+    written = 0
+    digest = hashlib.sha256()
+    with httpx.stream("GET", url, follow_redirects=True, timeout=DOWNLOAD_TIMEOUT) as r:
+        r.raise_for_status()
+        with open(dest, "wb") as f:
+            for chunk in r.iter_bytes(INGEST_CHUNK_SIZE):
+                written += len(chunk)
+                if MAX_INPUT_BYTES and written > MAX_INPUT_BYTES:
+                    raise ValueError(f"input exceeds MAX_INPUT_BYTES ({MAX_INPUT_BYTES})")
+                digest.update(chunk)
+                f.write(chunk)
+    elapsed = max(time.monotonic() - started, 1e-6)
+    print(f"    -> Downloaded {written} bytes ({written / elapsed / 1024 / 1024:.2f} MB/s)")
+    return digest.hexdigest()
+
+def _digest_path(input_path: Path) -> Path:
+    return input_path.with_name(input_path.name + ".sha256")
+
+def _remote_input(payload: Dict[str, Any]) -> bool:
+    """url and object storage inputs are fetched into local scratch by the worker."""
+    return bool(payload.get("url") or payload.get("s3_key"))
+
+def _fetch(payload: Dict[str, Any]):
+    """Materialize input.bin, downloading url and object storage sources.
+
+    The download is written under a temporary name and renamed at the end so
+    a half-written file is never picked up by another slot.
+    """
+    input_path = Path(payload["input_path"])
+    if _remote_input(payload) and not input_path.exists():
+        # batch and object storage submissions don't create the job directory up front
+        input_path.parent.mkdir(parents=True, exist_ok=True)
+        # a prefetched input may end up run (and finished) on another node
+        lifecycle.track_local(payload["job_id"])
+        part = input_path.with_name(input_path.name + ".part")
+        try:
+            with metrics.stage("download"):
+                if payload.get("s3_key"):
+                    bucket = payload.get("s3_bucket") or storage.MINIO_INPUT_BUCKET
+                    digest = storage.download(bucket, payload["s3_key"], part, MAX_INPUT_BYTES)
+                else:
+                    digest = _download(payload["url"], part)
+            _digest_path(input_path).write_text(digest)
+            os.replace(part, input_path)
+        finally:
+            part.unlink(missing_ok=True)
+
+def _prefetch_key(job_id: str) -> str:
+    return f"transcribe:prefetch:{job_id}"
+
+def _with_input_lock(job_id: str, ready: Callable[[], bool], work: Callable[[], None]):
+    """Run work() unless ready(); if another slot holds the job's prefetch lock,
+    wait for it instead of doing the same download twice."""
+    redis = get_redis()
+    key = _prefetch_key(job_id)
+    deadline = time.monotonic() + PREFETCH_LOCK_TTL
+    while not ready():
+        if redis.set(key, os.getpid(), nx=True, ex=PREFETCH_LOCK_TTL):
+            try:
+                work()
+            finally:
+                redis.delete(key)
+            return
+        if time.monotonic() > deadline:
+            raise TimeoutError("timed out waiting for input prefetch")
+        time.sleep(1)
+
+def _fetch_input(payload: Dict[str, Any]) -> Path:
+    """Make sure input.bin exists locally, reusing a prefetched download."""
+    input_path = Path(payload["input_path"])
+    _with_input_lock(payload["job_id"], input_path.exists, lambda: _fetch(payload))
+    return input_path
+
+def _input_digest(payload: Dict[str, Any]) -> str:
+    """sha256 of the job input: from ingest if known, otherwise hashed once here."""
+    if payload.get("input_sha256"):
+        return payload["input_sha256"]
+    input_path = Path(payload["input_path"])
+    sidecar = _digest_path(input_path)
+    if sidecar.exists():
+        return sidecar.read_text().strip()
+    digest = hashlib.sha256()
+    with open(input_path, "rb") as f:
+        for chunk in iter(lambda: f.read(INGEST_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    sidecar.write_text(digest.hexdigest())
+    return digest.hexdigest()
+
+def prefetch_candidates(queue_names: List[str], current_job_id: str) -> List[str]:
+    """The next few job ids in dequeue order: queues in the order the worker
+    blocks on them (SchedulingWorker._ordered_queues), each from its head.
+    Only as many as there are slots, the ones after will be taken later."""
+    ids = []
+    limit = MAX_CONCURRENCY + 1
+    for name in queue_names:
+        for job_id in get_queue(name).get_job_ids(0, limit - len(ids)):
+            if job_id != current_job_id:
+                ids.append(job_id)
+        if len(ids) >= limit:
+            break
+    return ids[:limit]
+
+def _prefetch_next(current_job_id: str, queue_names: List[str]):
+    """Download the input of the first unclaimed url / s3 job among the next few queued ones."""
     try:
-        client = Minio(
-            MINIO_ENDPOINT,
-            access_key=MINIO_ACCESS_KEY,
-            secret_key=MINIO_SECRET_KEY,
-            secure=MINIO_SECURE
-        )
-        
-        if not client.bucket_exists(MINIO_BUCKET):
-            client.make_bucket(MINIO_BUCKET)
-            
-        client.fput_object(MINIO_BUCKET, object_name, str(file_path))
-        
-        # Construct URL
-        if MINIO_PUBLIC_BASE_URL:
-            # Ensure no trailing slash in base url and join with object name
-            base = MINIO_PUBLIC_BASE_URL.rstrip("/")
-            return f"{base}/{object_name}"
-            
-        protocol = "https" if MINIO_SECURE else "http"
-        return f"{protocol}://{MINIO_ENDPOINT}/{MINIO_BUCKET}/{object_name}"
+        redis = get_redis()
+        for job_id in prefetch_candidates(queue_names, current_job_id):
+            job = Job.fetch(job_id, connection=redis)
+            # chunk / merge sub-jobs have no input of their own
+            if not job.args or "input_path" not in job.args[0]:
+                continue
+            payload = job.args[0]
+            input_path = Path(payload["input_path"])
+            if not _remote_input(payload) or input_path.exists():
+                continue
+            key = _prefetch_key(job_id)
+            if not redis.set(key, os.getpid(), nx=True, ex=PREFETCH_LOCK_TTL):
+                continue
+            try:
+                print(f"[{current_job_id}] Prefetching next job: {job_id}")
+                input_path.parent.mkdir(parents=True, exist_ok=True)
+                _fetch(payload)
+            finally:
+                redis.delete(key)
+            return
     except Exception as e:
-        print(f"[!] MinIO upload failed: {e}")
-        return None
+        # the job itself will redo (and properly report) the work
+        print(f"[{current_job_id}] Prefetch failed: {e}")
+
+_prefetch_thread: Optional[threading.Thread] = None
+_current_worker: Optional["SchedulingWorker"] = None
+
+def _start_prefetch(current_job_id: str, queue_name: str):
+    global _prefetch_thread
+    if not PREFETCH_ENABLED:
+        return
+    # the worker's order (priority, duration class, tenant round-robin) is
+    # what it dequeues next; outside a SchedulingWorker only the job's own queue
+    worker = _current_worker
+    queue_names = [q.name for q in worker._ordered_queues] if worker is not None else [queue_name]
+    _prefetch_thread = threading.Thread(target=_prefetch_next, args=(current_job_id, queue_names), daemon=True)
+    _prefetch_thread.start()
+
+def _join_prefetch():
+    # A forked work-horse exits when the job returns, so let an in-flight
+    # prefetch finish rather than leaving a half-downloaded input (and a held
+    # prefetch lock) behind. Warm workers keep running, no need to wait.
+    global _prefetch_thread
+    if _prefetch_thread is not None and not WARM_WORKER:
+        _prefetch_thread.join()
+        _prefetch_thread = None
+
+def _publish(job_id: str, event: str, **fields):
+    """Append an event to the job's segment stream (read by GET /v1/jobs/{id}/stream)."""
+    _publish_many(job_id, [(event, fields)])
+
+def _publish_many(job_id: str, events: List[Tuple[str, Dict[str, Any]]]):
+    """Append (event, fields) pairs to the segment stream in one round trip."""
+    try:
+        key = segment_stream_key(job_id)
+        pipe = get_redis().pipeline()
+        for event, fields in events:
+            pipe.xadd(key, {"event": event, **{k: json.dumps(v, ensure_ascii=False) for k, v in fields.items()}})
+        pipe.expire(key, valid_int_env("JOB_TTL_SECONDS", 86400))
+        pipe.execute()
+    except Exception as e:
+        # live streaming is best effort, the job itself must not fail on it
+        print(f"[{job_id}] Segment publish failed: {e}")
+
+def _segment_fields(seg, offset: float = 0.0, chunk: Optional[int] = None) -> Dict[str, Any]:
+    fields = {"start": float(seg.start) + offset, "end": float(seg.end) + offset, "text": (seg.text or "").strip()}
+    if chunk is not None:
+        fields["chunk"] = chunk
+    return fields
+
+def _publish_segment(job_id: str, seg, offset: float = 0.0, chunk: Optional[int] = None):
+    _publish(job_id, "segment", **_segment_fields(seg, offset, chunk))
+
+def _publish_segments(job_id: str, segments):
+    """Stream a whole transcript (a cache hit) with one pipeline, not a round trip per segment."""
+    _publish_many(job_id, [("segment", _segment_fields(seg)) for seg in segments])
 
 def _send_webhook(url: str, data: Dict[str, Any]):
-    """Helper untuk mengirim webhook dengan aman"""
-    print(f"    -> Sending webhook to: {url}")
+    """Queue the webhook; the delivery process POSTs (and retries) it so the slot doesn't wait."""
+    print(f"    -> Queueing webhook to: {url}")
     print(f"    -> Webhook payload: {data}")
     try:
-        resp = requests.post(url, json=data, timeout=10)
-        print(f"    -> Webhook status: {resp.status_code}")
+        webhooks.enqueue(url, data)
     except Exception as e:
-        print(f"    [!] Webhook failed: {e}")
+        print(f"    [!] Webhook enqueue failed: {e}")
 
 def process_job(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Wrapper untuk menangani error dan mengirim webhook kegagalan"""
+    return _run_with_error_webhook(_execute_job_logic, payload)
+
+def merge_chunks(payload: Dict[str, Any], chunks: int, duration: float, language: str) -> Dict[str, Any]:
+    """Final job of a fan-out: runs once every chunk sub-job has ended."""
+    return _run_with_error_webhook(
+        lambda p: _merge_chunks_logic(p, chunks, duration, language), payload
+    )
+
+def _retryable(e: Exception) -> bool:
+    # the job or a download timed out; a killed work-horse or a dead slot is
+    # retried by RQ without passing through here
+    return isinstance(e, (JobTimeoutException, httpx.TimeoutException))
+
+def _run_with_error_webhook(fn: Callable[[Dict[str, Any]], Dict[str, Any]], payload: Dict[str, Any]) -> Dict[str, Any]:
     try:
-        return _execute_job_logic(payload)
+        return fn(payload)
     except Exception as e:
         job_id = payload.get("job_id", "unknown")
         callback_url = payload.get("callback_url")
         print(f"[{job_id}] CRITICAL ERROR: {str(e)}")
-        
+        job = get_current_job()
+        if job is not None and job.retries_left:
+            if _retryable(e):
+                print(f"[{job_id}] Will be retried ({job.retries_left} left)")
+                raise
+            # unsupported codec, 404 URL, decode error...: fail now, not JOB_RETRIES times
+            job.retries_left = 0
+        _publish(job_id, "end", status="failed", error=str(e))
+
         if WEBHOOK_ON_ERROR and callback_url:
             error_payload = {
                 "job_id": job_id,
@@ -155,6 +669,67 @@ def process_job(payload: Dict[str, Any]) -> Dict[str, Any]:
             }
             _send_webhook(callback_url, error_payload)
         raise e  # Re-raise agar RQ mencatat job sebagai failed
+    finally:
+        _join_prefetch()
+        if not WARM_WORKER:
+            # the work-horse exits with the job, don't drop an upload (and its webhook)
+            storage.wait_uploads()
+
+def _checkpoint_key(job_id: str) -> str:
+    return f"transcribe:checkpoint:{job_id}"
+
+def _save_checkpoint(job_id: str, segments, saved: int, language: str) -> int:
+    """Append segments[saved:] to the job's checkpoint; returns how many are saved."""
+    if len(segments) == saved:
+        return saved
+    rows = [list(segments[i][:3]) for i in range(saved, len(segments))]
+    key = _checkpoint_key(job_id)
+    redis = get_redis()
+    # the last streamed segment is the last one saved: a resume trims the stream back to it
+    last = redis.xrevrange(segment_stream_key(job_id), count=1)
+    stream_id = last[0][0].decode() if last else None
+    pipe = redis.pipeline()
+    # transcription resumes at the end of the last finished segment
+    pipe.rpush(key, json.dumps(
+        {"offset": segments.ends[-1], "language": language, "segments": rows, "stream_id": stream_id}, ensure_ascii=False
+    ))
+    pipe.expire(key, valid_int_env("JOB_TTL_SECONDS", 86400))
+    pipe.execute()
+    return len(segments)
+
+def _load_checkpoint(job_id: str) -> Optional[Tuple[float, str, Any, Optional[str]]]:
+    """(offset, language, segments, stream id of the last saved segment) saved
+    by an earlier attempt of the job, or None."""
+    parts = get_redis().lrange(_checkpoint_key(job_id), 0, -1)
+    if not parts:
+        return None
+    segments = segment_store.SegmentBuffer()
+    for part in map(json.loads, parts):
+        segments.extend(part["segments"])
+    return part["offset"], part["language"], segments, part.get("stream_id")
+
+def _rewind_stream(job_id: str, after: Optional[str], offset: float) -> int:
+    """Drop the segments an earlier attempt streamed past its last checkpoint
+    (after; None drops the whole stream) and, if there were any, publish a
+    reset event so connected clients discard segments from offset on.
+    Returns how many entries were dropped."""
+    redis = get_redis()
+    key = segment_stream_key(job_id)
+    try:
+        if after is None:
+            dropped = redis.xlen(key)
+            redis.delete(key)
+        else:
+            ids = [i for i, _ in redis.xrange(key, min=after) if i.decode() != after]
+            dropped = redis.xdel(key, *ids) if ids else 0
+    except Exception as e:
+        # live streaming is best effort, the job itself must not fail on it
+        print(f"[{job_id}] Segment stream rewind failed: {e}")
+        return 0
+    if dropped:
+        print(f"[{job_id}] Dropped {dropped} streamed entries of the previous attempt")
+        _publish(job_id, "reset", offset=offset)
+    return dropped
 
 def _execute_job_logic(payload: Dict[str, Any]) -> Dict[str, Any]:
     job = get_current_job()
@@ -164,84 +739,406 @@ def _execute_job_logic(payload: Dict[str, Any]) -> Dict[str, Any]:
 
     job_id = payload["job_id"]
     print(f"[#] Starting job: {job_id}")
-    input_path = payload["input_path"]
     language = payload.get("language")  # "id" etc.
     task = payload.get("task", "transcribe")
     output = payload.get("output", "srt")
+    model_name = payload.get("model") or MODEL_SIZE
+    diarize_job = bool(payload.get("diarize"))
 
     base = storage_dir() / "jobs" / job_id
     base.mkdir(parents=True, exist_ok=True)
 
-    wav_path = str(base / "audio.wav")
-    print(f"[{job_id}] Converting to WAV...")
-    _to_wav(input_path, wav_path)
+    if _remote_input(payload):
+        job.meta["message"] = "downloading"
+        job.save_meta()
+    _fetch_input(payload)
+
+    merge_job_id = _existing_merge(job)
+    if merge_job_id is not None:
+        return _rejoin_fan_out(job, payload, merge_job_id)
+
+    cache_key = result_cache.cache_key(_input_digest(payload), model_name, language, task, diarize_job)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        print(f"[{job_id}] Result cache hit, skipping transcription")
+        if diarize_job:
+            # only results that got speaker labels are cached under a diarize key
+            job.meta["diarized"] = True
+        _publish_segments(job_id, cached["segments"])
+        return _finish_job(job, payload, base, cached["segments"], cached["language"], cached["duration"], cache_hit=True)
+
+    checkpoint = _load_checkpoint(job_id) if CHECKPOINT_SECONDS else None
+    offset = 0.0
+    if checkpoint is not None:
+        # a retry: only the audio after the last checkpoint is decoded, with
+        # the language the first attempt detected; timestamps are shifted back
+        offset, language, segments, stream_id = checkpoint
+        job.meta["resumed_from"] = round(offset, 3)
+        print(f"[{job_id}] Resuming from checkpoint at {offset:.1f}s ({len(segments)} segments)")
+        _rewind_stream(job_id, stream_id, offset)
+    else:
+        segments = segment_store.SegmentBuffer()
+        # a retry without a checkpoint streams everything again
+        _rewind_stream(job_id, None, 0.0)
+
+    print(f"[{job_id}] Decoding audio...")
+    with metrics.stage("decode"):
+        # diarization clusters speakers over the whole recording, even on a resume
+        audio = _decode_pcm(payload["input_path"], start=0.0 if diarize_job else offset)
+
+    if checkpoint is None and CHUNKING_ENABLED and len(audio) / SAMPLE_RATE > CHUNK_MIN_DURATION:
+        return _fan_out(job, payload, audio)
+
+    # speaker turns are computed on their own thread while the model loads and transcribes
+    diarization = diarize.start(audio) if diarize_job else None
+    if diarize_job and offset:
+        audio = audio[int(offset * SAMPLE_RATE):]
 
     job.meta["progress"] = 10
     job.meta["message"] = "loading model"
     job.save_meta()
 
-    print(f"[{job_id}] Loading model ({MODEL_SIZE})...")
-    model = _get_model()
+    print(f"[{job_id}] Loading model ({model_name})...")
+    _get_model(model_name)
 
     job.meta["progress"] = 15
     job.meta["message"] = "transcribing"
     job.save_meta()
 
+    # overlap the next job's network/ffmpeg stage with this job's decoding
+    _start_prefetch(job_id, job.origin)
+
     print(f"[{job_id}] Transcribing...")
-    segments_gen, info = model.transcribe(
-        wav_path,
-        language=language,
-        task=task,
-        vad_filter=True,
-        beam_size=1,
+    started = time.monotonic()
+    segments_gen, info, engine = _transcribe(
+        audio, language, task, payload.get("engine"), payload.get("batch_size"), model_name
     )
+    duration = offset + info.duration
+    job.meta["duration"] = round(duration, 3)
+    print(f"      [Engine: {engine}]")
     print(f"      [Detected language: {info.language}]")
-    print(f"      [Audio duration: {info.duration:.2f}s]")
+    print(f"      [Audio duration: {duration:.2f}s]")
 
-    segments = []
-    last_log_time = 0
+    # only times and text are kept, not faster-whisper's per-segment token data
+    saved = len(segments)
+    last_checkpoint = time.monotonic()
+    last_log_time = offset
     for segment in segments_gen:
-        segments.append(segment)
+        segments.append(segment.start + offset, segment.end + offset, segment.text)
+        _publish_segment(job_id, segment, offset)
         # Log progress every 5 seconds or every 50 segments
-        current_pos = segment.end
+        current_pos = segment.end + offset
         if current_pos - last_log_time > 10: # Log every 10 seconds of audio processed
-            percent = (current_pos / info.duration) * 100 if info.duration > 0 else 0
-            print(f"[{job_id}] Progress: {current_pos:.1f}s / {info.duration:.1f}s ({percent:.1f}%)")
+            percent = (current_pos / duration) * 100 if duration > 0 else 0
+            print(f"[{job_id}] Progress: {current_pos:.1f}s / {duration:.1f}s ({percent:.1f}%)")
             last_log_time = current_pos
             
             # Update job meta for API progress tracking
             job.meta["progress"] = max(1, min(99, 15 + int(percent * 0.75)))
             job.save_meta()
+        if CHECKPOINT_SECONDS and time.monotonic() - last_checkpoint >= CHECKPOINT_SECONDS:
+            saved = _save_checkpoint(job_id, segments, saved, info.language)
+            last_checkpoint = time.monotonic()
 
     print(f"[{job_id}] Transcription finished. Total segments: {len(segments)}")
+    rtf = _log_rtf(job_id, engine, model_name, time.monotonic() - started, info.duration)
+    job.meta["engine"] = engine
+    job.meta["rtf"] = round(rtf, 4) if rtf is not None else None
+    diarized = diarize_job and _apply_diarization(
+        job, segments, diarization.result if diarization is not None else None
+    )
+    job.save_meta()
+    if diarized or not diarize_job:
+        # a diarize request without speaker labels must not be served from cache later
+        result_cache.put(cache_key, info.language, duration, segments)
+    get_redis().delete(_checkpoint_key(job_id))
+
+    return _finish_job(job, payload, base, segments, info.language, duration)
+
+def _apply_diarization(job, segments, result: Optional[Callable[[], Optional[List[diarize.Turn]]]]) -> bool:
+    """Label the segments with the speaker turns (waiting for them if needed).
+
+    result is None when diarization never ran (no DIARIZE_MODEL) and returns
+    None when it failed. Returns whether any speaker turns were applied; if
+    not, job.meta gets diarized=False and a warning saying why.
+    """
+    turns = None
+    if result is not None:
+        job.meta["message"] = "diarizing"
+        job.save_meta()
+        waited = time.monotonic()
+        with metrics.stage("diarize_wait"):
+            turns = result()
+    if not turns:
+        job.meta["diarized"] = False
+        if result is None:
+            job.meta["warning"] = "diarization skipped: speaker model (DIARIZE_MODEL) not available"
+        elif turns is None:
+            job.meta["warning"] = "diarization failed, segments have no speaker labels"
+        else:
+            job.meta["warning"] = "diarization found no speech, segments have no speaker labels"
+        print(f"[{job.id}] [!] {job.meta['warning']}")
+        return False
+    segments.set_speakers(diarize.assign(segments, turns))
+    job.meta["diarized"] = True
+    if job.meta.get("warning"):
+        job.meta["warning"] = None  # left by an earlier attempt
+    job.meta["speakers"] = len({t[2] for t in turns})
+    print(f"[{job.id}] Diarization: {job.meta['speakers']} speakers, {len(turns)} turns, waited {time.monotonic() - waited:.1f}s")
+    return True
+
+def _plan_chunks(gaps: List[float], duration: float, chunk_seconds: float) -> List[Tuple[float, float]]:
+    """Split [0, duration] into ~chunk_seconds pieces, cutting at silence midpoints.
+
+    A cut is placed at the last gap before the target length (but past half
+    of it); without a usable gap we fall back to a hard cut at the target.
+    """
+    bounds = []
+    start = 0.0
+    while duration - start > chunk_seconds:
+        target = start + chunk_seconds
+        usable = [g for g in gaps if start + chunk_seconds / 2 < g <= target]
+        cut = usable[-1] if usable else target
+        bounds.append((start, cut))
+        start = cut
+    bounds.append((start, duration))
+    return bounds
+
+def _chunk_counter_key(job_id: str) -> str:
+    return f"transcribe:chunks_done:{job_id}"
+
+def _chunk_result_key(job_id: str, index: int) -> str:
+    # chunk segments live in Redis so chunk and merge jobs can run on any node
+    return f"transcribe:chunk:{job_id}:{index:04d}"
+
+def _diarization_key(job_id: str) -> str:
+    # speaker turns of a fanned-out job, computed by the parent for the merge
+    return f"transcribe:diarization:{job_id}"
+
+def fanout_progress(done: int, total: int) -> int:
+    """Progress of a fanned-out job derived from finished chunk sub-jobs."""
+    return min(89, 15 + int(75 * done / max(1, total)))
+
+def _fan_out(job, payload: Dict[str, Any], audio: np.ndarray) -> Dict[str, Any]:
+    """Split the audio at VAD silences and enqueue chunk sub-jobs + a merge job.
+
+    Chunks decode their own window of input.bin, so no audio is written out.
+    """
+    job_id = payload["job_id"]
+    job.meta["message"] = "splitting audio"
+    job.save_meta()
+
+    duration = len(audio) / SAMPLE_RATE
+    job.meta["duration"] = round(duration, 3)
+    speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=500))
+    gaps = [
+        (prev["end"] + nxt["start"]) / 2 / SAMPLE_RATE
+        for prev, nxt in zip(speech, speech[1:])
+    ]
+    bounds = _plan_chunks(gaps, duration, CHUNK_SECONDS)
+    # the parent diarizes the whole recording while the chunks are transcribed
+    diarization = diarize.start(audio) if payload.get("diarize") else None
+
+    # detect the language once so every chunk decodes with the same one
+    language = payload.get("language")
+    if not language:
+        job.meta["message"] = "detecting language"
+        job.save_meta()
+        language, _, _ = _get_model(payload.get("model")).detect_language(audio, vad_filter=True)
+        print(f"      [Detected language: {language}]")
+
+    # chunks go to the same (model, priority, tenant) queue as the parent job
+    q = get_queue(job.origin)
+    job_timeout = valid_int_env("JOB_TIMEOUT", 14400)
+    result_ttl = valid_int_env("JOB_TTL_SECONDS", 86400)
+    get_redis().delete(_chunk_counter_key(job_id))
+
+    chunk_jobs = []
+    for i, (start, end) in enumerate(bounds):
+        chunk_jobs.append(q.enqueue(
+            process_chunk,
+            {
+                "job_id": job_id,
+                "index": i,
+                "offset": start,
+                "duration": end - start,
+                "input_path": payload["input_path"],
+                "url": payload.get("url"),
+                "s3_bucket": payload.get("s3_bucket"),
+                "s3_key": payload.get("s3_key"),
+                "language": language,
+                "task": payload.get("task", "transcribe"),
+                "engine": payload.get("engine"),
+                "batch_size": payload.get("batch_size"),
+                "model": payload.get("model"),
+                "chunks": len(bounds),
+            },
+            job_id=f"{job_id}-c{i:04d}",
+            meta={"chunk": i},
+            job_timeout=estimates.job_timeout(end - start, payload.get("model") or MODEL_SIZE),
+            result_ttl=result_ttl,
+            retry=Retry(max=JOB_RETRIES) if JOB_RETRIES else None,
+        ))
+    merge_job = q.enqueue(
+        merge_chunks,
+        # the merge may run where the input was never fetched
+        dict(payload, input_sha256=_input_digest(payload)), len(bounds), duration, language,
+        job_id=f"{job_id}-merge",
+        meta={"parent_job_id": job_id},
+        # with diarization the merge also waits for this job, which stores the turns
+        depends_on=Dependency(
+            jobs=chunk_jobs + ([job] if diarization is not None else []), allow_failure=True, enqueue_at_front=True
+        ),
+        job_timeout=job_timeout,
+        result_ttl=result_ttl,
+    )
+
+    print(f"[{job_id}] Split {duration:.1f}s into {len(bounds)} chunks, merge job: {merge_job.id}")
+    return _split_result(job, payload, len(bounds), merge_job.id, diarization)
+
+def _existing_merge(job) -> Optional[str]:
+    """Id of the merge job if this job already fanned out (i.e. this is a retry)."""
+    merge_job_id = job.meta.get("merge_job_id") or f"{job.id}-merge"
+    return merge_job_id if Job.exists(merge_job_id, connection=get_redis()) else None
+
+def _rejoin_fan_out(job, payload: Dict[str, Any], merge_job_id: str) -> Dict[str, Any]:
+    """Retry of a job that already split: its chunks and merge stay queued
+    (or done) and keep their stream, so nothing is enqueued or rewound again.
+    Only diarization, which the merge waits on, is redone if never stored."""
+    job_id = payload["job_id"]
+    chunks = Job.fetch(merge_job_id, connection=get_redis()).args[1]
+    print(f"[{job_id}] Already split into {chunks} chunks, re-attaching to merge job {merge_job_id}")
+    diarization = None
+    if payload.get("diarize") and not get_redis().exists(_diarization_key(job_id)):
+        with metrics.stage("decode"):
+            audio = _decode_pcm(payload["input_path"])
+        diarization = diarize.start(audio)
+    return _split_result(job, payload, chunks, merge_job_id, diarization)
+
+def _split_result(job, payload: Dict[str, Any], chunks: int, merge_job_id: str, diarization) -> Dict[str, Any]:
+    job_id = payload["job_id"]
+    job.meta["chunks"] = chunks
+    job.meta["merge_job_id"] = merge_job_id
+    job.meta["progress"] = 15
+    job.meta["message"] = f"transcribing {chunks} chunks"
+    job.save_meta()
+
+    if diarization is not None:
+        turns = diarization.result()
+        # stored even when empty or failed (null), so the merge can tell why
+        get_redis().set(_diarization_key(job_id), json.dumps(turns), ex=valid_int_env("JOB_TTL_SECONDS", 86400))
+        print(f"[{job_id}] Diarization: {len({t[2] for t in turns or []})} speakers, {len(turns or [])} turns")
+
+    return {
+        "job_id": job_id,
+        "status": "split",
+        "chunks": chunks,
+        "merge_job_id": merge_job_id,
+        "db_id": payload.get("db_id"),
+    }
+
+def process_chunk(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """Transcribe one chunk of a fanned-out job; segments are shifted by the chunk offset."""
+    try:
+        return _chunk_logic(chunk)
+    except Exception as e:
+        job = get_current_job()
+        if job is not None and not _retryable(e):
+            job.retries_left = 0
+        raise
+
+def _chunk_logic(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    job_id = chunk["job_id"]
+    index = chunk["index"]
+    offset = chunk["offset"]
+    print(f"[{job_id}] Transcribing chunk {index} (offset {offset:.1f}s)...")
+
+    _fetch_input(chunk)
+    with metrics.stage("decode"):
+        audio = _decode_pcm(chunk["input_path"], start=offset, duration=chunk["duration"])
+    started = time.monotonic()
+    model_name = chunk.get("model") or MODEL_SIZE
+    segments_gen, info, engine = _transcribe(
+        audio, chunk["language"], chunk["task"], chunk.get("engine"), chunk.get("batch_size"), model_name
+    )
+    segments = []
+    for seg in segments_gen:
+        # chunks finish out of order; clients order segments by start time
+        _publish_segment(job_id, seg, offset, chunk=index)
+        segments.append([seg.start + offset, seg.end + offset, seg.text or ""])
+    _log_rtf(f"{job_id}-c{index:04d}", engine, model_name, time.monotonic() - started, info.duration)
+
+    get_redis().set(
+        _chunk_result_key(job_id, index), json.dumps(segments, ensure_ascii=False),
+        ex=valid_int_env("JOB_TTL_SECONDS", 86400),
+    )
+    done = get_redis().incr(_chunk_counter_key(job_id))
+    set_status(job_id, progress=fanout_progress(done, chunk["chunks"]))
+    return {"job_id": job_id, "index": index, "segments": len(segments)}
+
+def _merge_chunks_logic(payload: Dict[str, Any], chunks: int, duration: float, language: str) -> Dict[str, Any]:
+    job_id = payload["job_id"]
+    base = storage_dir() / "jobs" / job_id
+    # meta/progress stay on the parent job, which is what clients poll
+    parent = StatusJob.fetch(job_id, connection=get_redis())
+
+    base.mkdir(parents=True, exist_ok=True)
+    pipe = get_redis().pipeline()
+    for i in range(chunks):
+        pipe.get(_chunk_result_key(job_id, i))
+    segments = segment_store.SegmentBuffer()
+    for i, part in enumerate(pipe.execute()):
+        if part is None:
+            raise RuntimeError(f"chunk {i} of {chunks} failed")
+        segments.extend(json.loads(part))
+    print(f"[{job_id}] Merged {chunks} chunks. Total segments: {len(segments)}")
+    diarize_job = bool(payload.get("diarize"))
+    diarized = False
+    if diarize_job:
+        # no key: the parent never diarized (no DIARIZE_MODEL); null: it failed
+        raw = get_redis().get(_diarization_key(job_id))
+        turns = None if raw is None else json.loads(raw)
+        diarized = _apply_diarization(
+            parent, segments, None if raw is None else lambda: turns and [tuple(t) for t in turns]
+        )
+
+    if diarized or not diarize_job:
+        cache_key = result_cache.cache_key(
+            _input_digest(payload), payload.get("model") or MODEL_SIZE, payload.get("language"),
+            payload.get("task", "transcribe"), diarize_job,
+        )
+        result_cache.put(cache_key, language, duration, segments)
+    get_redis().delete(
+        _chunk_counter_key(job_id), _diarization_key(job_id), *(_chunk_result_key(job_id, i) for i in range(chunks))
+    )
+
+    return _finish_job(parent, payload, base, segments, language, duration)
+
+def _finish_job(
+    job,
+    payload: Dict[str, Any],
+    base: Path,
+    segments: List[Any],
+    language: str,
+    duration: float,
+    cache_hit: bool = False,
+) -> Dict[str, Any]:
+    """Store the segments, write the requested output, upload it and fire the webhook.
+
+    Other formats are rendered from the segment store by the API on demand.
+    """
+    job_id = payload["job_id"]
+    output = payload.get("output", "srt")
 
     job.meta["progress"] = 90
     job.meta["message"] = "writing output"
     job.save_meta()
 
     print(f"[{job_id}] Writing {output} output...")
-    out_file = None
-    if output == "srt":
-        out_file = base / "output.srt"
-        _write_srt(segments, out_file)
-    elif output == "vtt":
-        out_file = base / "output.vtt"
-        _write_vtt(segments, out_file)
-    else:
-        out_file = base / "output.txt"
-        _write_txt(segments, out_file)
-
-    # Auto Upload to MinIO
-    minio_url = None
-    if out_file and out_file.exists():
-        job.meta["message"] = "uploading to minio"
-        job.save_meta()
-        print(f"[{job_id}] Uploading to MinIO...")
-        object_name = f"{job_id}{out_file.suffix}"
-        minio_url = _upload_to_minio(out_file, object_name)
-        if minio_url:
-            job.meta["minio_url"] = minio_url
-            print(f"[{job_id}] Uploaded: {minio_url}")
+    out_file = base / f"output.{output}"
+    with metrics.stage("write_output"):
+        segment_store.write_store(segments, base / segment_store.STORE_NAME)
+        segment_store.write_output(segments, output, out_file)
 
     job.meta["progress"] = 100
     job.meta["message"] = "done"
@@ -251,70 +1148,273 @@ def _execute_job_logic(payload: Dict[str, Any]) -> Dict[str, Any]:
     result = {
         "job_id": job_id,
         "status": "finished",
-        "language": info.language,
-        "duration": info.duration,
+        "language": language,
+        "duration": duration,
         "output": output,
-        "minio_url": minio_url,
+        "minio_url": None,
+        "cache_hit": cache_hit,
+        "diarized": job.meta.get("diarized"),
+        "warning": job.meta.get("warning"),
         "db_id": payload.get("db_id")
     }
 
+    _publish(job_id, "end", status="finished", language=language, duration=duration)
+
+    # Auto Upload to MinIO. Runs on the background upload pool so this slot
+    # can take its next job; the webhook goes out once the upload is done.
+    if storage.configured() and out_file.exists():
+        uploads = _upload_list(payload, base, segments, out_file)
+        print(f"[{job_id}] Uploading {len(uploads)} artifact(s) to MinIO...")
+        storage.submit(_upload_and_notify, job, payload, uploads, result)
+    else:
+        lifecycle.release_input(payload)
+        _notify(payload, result)
+
+    _remove_ingested(payload)
+    return result
+
+def _remove_ingested(payload: Dict[str, Any]):
+    if payload.get("s3_delete"):
+        # an upload the API streamed to MinIO, only needed until the job is done
+        storage.submit(storage.remove, payload.get("s3_bucket") or storage.MINIO_INPUT_BUCKET, payload["s3_key"])
+
+def _upload_list(payload: Dict[str, Any], base: Path, segments, out_file: Path) -> List[Tuple[Path, str, str]]:
+    """(path, object name, content type) for each artifact in MINIO_UPLOAD_ARTIFACTS;
+    the requested output always comes first."""
+    job_id = payload["job_id"]
+    output = payload.get("output", "srt")
+    uploads = [(out_file, f"{job_id}{out_file.suffix}", segment_store.MEDIA_TYPES[output])]
+    artifacts = storage.MINIO_UPLOAD_ARTIFACTS
+    if "segments" in artifacts:
+        uploads.append((base / segment_store.STORE_NAME, f"{job_id}.segments.jsonl", "application/x-ndjson"))
+    if "formats" in artifacts:
+        for fmt in segment_store.FORMATS:
+            if fmt == output:
+                continue
+            path = base / f"output.{fmt}"
+            segment_store.write_output(segments, fmt, path)
+            uploads.append((path, f"{job_id}.{fmt}", segment_store.MEDIA_TYPES[fmt]))
+    input_path = Path(payload.get("input_path", ""))
+    if "input" in artifacts and input_path.is_file():
+        uploads.append((input_path, f"{job_id}.input{input_path.suffix}", "application/octet-stream"))
+    return uploads
+
+def _upload_and_notify(job, payload: Dict[str, Any], uploads: List[Tuple[Path, str, str]], result: Dict[str, Any]):
+    job_id = payload["job_id"]
+    try:
+        urls = storage.upload_all(uploads)
+        minio_url = urls[0]
+        if minio_url:
+            result["minio_url"] = minio_url
+            job.meta["minio_url"] = minio_url
+            job.save_meta()
+            print(f"[{job_id}] Uploaded: {minio_url}")
+    except Exception as e:
+        print(f"[{job_id}] Upload error: {e}")
+    # after the upload, which may include the input itself
+    lifecycle.release_input(payload)
+    _notify(payload, result)
+
+def _notify(payload: Dict[str, Any], result: Dict[str, Any]):
     # Webhook Callback
     callback_url = payload.get("callback_url")
     if callback_url:
         _send_webhook(callback_url, result)
 
-    return result
-
 if __name__ == "__main__":
     import multiprocessing
-    import time
 
-    print(f"[*] Worker manager starting (MAX_CONCURRENCY: {MAX_CONCURRENCY})...")
-    
-    def run_worker(worker_id):
+    print(f"[*] Worker manager starting (MIN/MAX_CONCURRENCY: {MIN_CONCURRENCY}/{MAX_CONCURRENCY}, CPUs: {available_cpus()}, WARM_WORKER: {WARM_WORKER})...")
+
+    if WARM_WORKER and not os.path.isdir(MODEL_SIZE):
+        # Resolve/download the model files once here so the slots don't race
+        # each other for the download; they then load from the shared cache.
+        # (The model itself is not loaded before forking: CTranslate2 thread
+        # pools and CUDA contexts don't survive fork.)
+        try:
+            from faster_whisper.utils import download_model
+            download_model(MODEL_SIZE)
+        except Exception as e:
+            print(f"[!] Model pre-download failed, slots will retry: {e}")
+
+    Path(WORKER_READY_FILE).unlink(missing_ok=True)
+
+    def run_worker(worker_id, ready):
         # Increased heartbeat_ttl to 10 minutes (600s) to handle long transcription gaps
         # Increased job_monitoring_interval to 60s
         try:
+            if WARM_WORKER:
+                # load before registering with RQ: a slot only shows up in
+                # Worker.all() (and takes jobs) once its model is warm
+                started = time.monotonic()
+                _get_model()
+                print(f"    [+] Worker {worker_id} model loaded in {time.monotonic() - started:.1f}s")
+
+            if storage.configured():
+                try:
+                    storage.ensure_bucket()
+                except Exception as e:
+                    # retried on the first upload
+                    print(f"    [!] Worker {worker_id} MinIO bucket check failed: {e}")
+
             redis_conn = get_redis()
-            q = Queue("transcribe", connection=redis_conn)
-            
+            queues = [IndexedQueue(model_queue_name(m), connection=redis_conn) for m in ALLOWED_MODELS]
+
             # Using a custom name to identify which slot the worker occupies
             worker_name = f"worker-{os.uname().nodename}-{worker_id}"
-            
-            w = Worker(
-                [q], 
+
+            worker_cls = WarmSchedulingWorker if WARM_WORKER else SchedulingWorker
+            w = worker_cls(
+                queues,
                 connection=redis_conn, 
                 name=worker_name,
                 job_monitoring_interval=60,
                 worker_ttl=3600
             )
             # Ensure we give the worker enough time to heartbeat even under load
-            print(f"    [+] Worker {worker_id} started, listening on: {q.name}")
+            print(f"    [+] Worker {worker_id} started, listening on: {', '.join(q.name for q in queues)}")
+            ready.set()
             w.work(logging_level="INFO")
         except Exception as e:
             print(f"    [!] Worker {worker_id} failed: {e}")
 
     processes = {}
+    ready_events = {}
+    draining = {}
+    idle_since = {}
+    node = os.uname().nodename
 
     def start_process(i):
-        p = multiprocessing.Process(target=run_worker, args=(i,), name=f"WorkerProcess-{i}")
+        ready_events[i] = multiprocessing.Event()
+        p = multiprocessing.Process(target=run_worker, args=(i, ready_events[i]), name=f"WorkerProcess-{i}")
         p.start()
         processes[i] = p
         return p
 
-    for i in range(MAX_CONCURRENCY):
+    def update_readiness():
+        ready_file = Path(WORKER_READY_FILE)
+        ready = sum(1 for i in processes if ready_events[i].is_set())
+        all_ready = ready >= min(len(processes), max(1, MIN_CONCURRENCY))
+        if all_ready and not ready_file.exists():
+            ready_file.touch()
+            print(f"[+] {ready} worker slots ready")
+        elif not all_ready and ready_file.exists():
+            ready_file.unlink(missing_ok=True)
+
+    def slot_states() -> Dict[int, str]:
+        prefix = f"worker-{node}-"
+        return {
+            int(w.name[len(prefix):]): w.get_state()
+            for w in Worker.all(connection=get_redis())
+            if w.name.startswith(prefix) and w.name[len(prefix):].isdigit()
+        }
+
+    def waiting_jobs() -> int:
+        bases = {model_queue_name(m) for m in ALLOWED_MODELS}
+        queues = [q for q in transcribe_queues() if parse_queue_name(q.name)[0] in bases]
+        pipe = get_redis().pipeline()
+        for q in queues:
+            pipe.llen(q.key)
+        return sum(pipe.execute())
+
+    def autoscale():
+        now = time.monotonic()
+        states = slot_states()
+        for i in processes:
+            if states.get(i) == "idle":
+                idle_since.setdefault(i, now)
+            else:
+                idle_since.pop(i, None)
+        busy = sum(1 for i in processes if states.get(i) == "busy")
+
+        # size a slot from the running ones once there are any
+        slot_mb = max(
+            [process_rss_mb(p.pid) for i, p in processes.items() if ready_events[i].is_set()]
+            or [_estimate_model_mb(MODEL_SIZE) + SLOT_OVERHEAD_MB]
+        )
+        memory_cap = len(processes) + available_memory_mb() // max(1, slot_mb)
+        if WORKER_MEMORY_BUDGET_MB:
+            memory_cap = min(memory_cap, WORKER_MEMORY_BUDGET_MB // max(1, slot_mb))
+
+        target = scale_target(busy, waiting_jobs(), memory_cap)
+        if target > len(processes):
+            i = free_slot(processes, draining)
+            if i is None:
+                # retry next tick, once a drained slot has been reaped
+                return
+            print(f"[*] Scaling up: starting slot {i} ({len(processes) + 1}/{MAX_CONCURRENCY}, {busy} busy)")
+            start_process(i)
+        elif target < len(processes):
+            idle = [i for i in processes if now - idle_since.get(i, now) >= SCALE_DOWN_IDLE_SECONDS]
+            if idle:
+                # warm shutdown: RQ stops the slot between jobs, never mid-job
+                i = max(idle)
+                print(f"[*] Scaling down: draining idle slot {i} ({len(processes) - 1}/{MAX_CONCURRENCY})")
+                draining[i] = processes.pop(i)
+                idle_since.pop(i, None)
+                os.kill(draining[i].pid, signal.SIGTERM)
+
+    def reap_drained():
+        for i, p in list(draining.items()):
+            if not p.is_alive():
+                p.join()
+                metrics.mark_process_dead(p.pid)
+                p.close()
+                del draining[i]
+                ready_events.pop(i, None)
+
+    def start_delivery():
+        # webhooks go out from their own process, never from a transcription slot
+        p = multiprocessing.Process(target=webhooks.serve, name="WebhookDelivery")
+        p.start()
+        return p
+
+    if metrics.MULTIPROC_DIR and not WARM_WORKER:
+        print("[!] WARM_WORKER=false: every job leaves its metrics files in PROMETHEUS_MULTIPROC_DIR until the manager restarts")
+    try:
+        metrics.serve_worker_exporter()
+    except Exception as e:
+        print(f"[!] Metrics exporter failed to start: {e}")
+
+    for i in range(MIN_CONCURRENCY):
         start_process(i)
+    delivery = start_delivery() if webhooks.WEBHOOK_DELIVERY_ENABLED else None
+    next_lifecycle = 0.0
     
-    # Manager loop: check for dead processes and restart them
+    # Manager loop: check for dead processes and restart them, scale the pool,
+    # delete expired job directories
     try:
         while True:
+            reap_drained()
             for i, p in list(processes.items()):
                 if not p.is_alive():
                     print(f"[!] Worker process {i} died. Restarting...")
+                    metrics.mark_process_dead(p.pid)
                     p.close()
                     start_process(i)
-            time.sleep(10)
+            if delivery is not None and not delivery.is_alive():
+                print("[!] Webhook delivery process died. Restarting...")
+                delivery.close()
+                delivery = start_delivery()
+            if MIN_CONCURRENCY < MAX_CONCURRENCY:
+                try:
+                    autoscale()
+                except Exception as e:
+                    print(f"[!] Autoscaling failed: {e}")
+            if lifecycle.LIFECYCLE_INTERVAL and time.monotonic() >= next_lifecycle:
+                next_lifecycle = time.monotonic() + lifecycle.LIFECYCLE_INTERVAL
+                try:
+                    lifecycle.run_once()
+                except Exception as e:
+                    print(f"[!] Lifecycle pass failed: {e}")
+            # poll readiness more often than liveness so startup is signalled promptly
+            for _ in range(10):
+                update_readiness()
+                time.sleep(1)
     except KeyboardInterrupt:
         print("[*] Manager shutting down...")
-        for p in processes.values():
+        Path(WORKER_READY_FILE).unlink(missing_ok=True)
+        for p in list(processes.values()) + list(draining.values()):
             p.terminate()
+        if delivery is not None:
+            delivery.terminate()